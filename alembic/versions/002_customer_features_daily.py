@@ -0,0 +1,43 @@
+"""Add daily customer features snapshot.
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-16
+
+Creates customer_features_daily, refreshed nightly from order_line so
+recommendation runs read per-customer aggregates by primary key.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create customer_features_daily."""
+    op.create_table(
+        'customer_features_daily',
+        sa.Column('customer_code', sa.String(255), nullable=False),
+        sa.Column('purchase_count', sa.Integer(), nullable=False),
+        sa.Column('total_spent', sa.Float(), nullable=True),
+        sa.Column('avg_order_value', sa.Float(), nullable=True),
+        sa.Column('last_purchase_date', sa.Date(), nullable=True),
+        sa.Column('first_purchase_date', sa.Date(), nullable=True),
+        sa.Column('computed_date', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['customer_code'], ['customer.customer_code']),
+        sa.PrimaryKeyConstraint('customer_code'),
+    )
+    op.create_index(
+        'ix_customer_features_daily_computed_date',
+        'customer_features_daily',
+        ['computed_date'],
+    )
+
+
+def downgrade() -> None:
+    """Drop customer_features_daily."""
+    op.drop_table('customer_features_daily')
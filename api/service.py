@@ -76,15 +76,15 @@ class RecommendationService:
                         final_score=item.score.final_score,
                     ),
                     explanation=ExplanationDetail(
-                        title=item.explanation['title'],
-                        reason=item.explanation['reason'],
-                        components=item.explanation['components'],
+                        title=item.explanation.title,
+                        reason=item.explanation.reason,
+                        components=item.explanation.components,
                     ),
                 )
                 recommendations.append(reco)
             
             return RecommendationResponse(
-                run_id=result.run_id,
+                run_id=str(result.run_id),
                 customer_code=customer_code,
                 recommendations=recommendations,
                 generated_at=result.generated_at,
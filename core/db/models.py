@@ -221,6 +221,19 @@ class ClientMasterProfile(Base):
     customer = relationship("Customer", back_populates="profiles")
 
 
+class CustomerFeaturesDaily(Base):
+    """Daily snapshot of per-customer order aggregates used for RFM features."""
+    __tablename__ = "customer_features_daily"
+
+    customer_code = Column(String(255), ForeignKey("customer.customer_code"), primary_key=True)
+    purchase_count = Column(Integer, nullable=False, default=0)
+    total_spent = Column(Float, nullable=True)
+    avg_order_value = Column(Float, nullable=True)
+    last_purchase_date = Column(Date, nullable=True)
+    first_purchase_date = Column(Date, nullable=True)
+    computed_date = Column(Date, nullable=False, index=True)
+
+
 class RecoRun(Base):
     """Metadata for each recommendation run."""
     __tablename__ = "reco_run"
@@ -3,15 +3,14 @@
 import logging
 import uuid
 from pathlib import Path
-from typing import List, Optional, Dict, Tuple
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Set, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 
 from core.ingestion.schemas import FileType, IngestionReport, IngestionError
 from core.ingestion.readers import CustomerReader, SalesLineReader, ContactReader
 from core.ingestion.validators import (
-    CustomerValidator, SalesLineValidator, ContactValidator,
-    DependencyValidator
+    CustomerValidator, SalesLineValidator, ContactValidator, RowResult
 )
 from core.ingestion.loaders import (
     RawDataLoader, IngestionErrorLoader, IngestionReportLoader
@@ -19,6 +18,53 @@ from core.ingestion.loaders import (
 
 logger = logging.getLogger(__name__)
 
+LOAD_CHUNK_SIZE = 1000  # Valid rows handed to RawDataLoader per call
+MAX_REPORTED_ERRORS = 1000  # Errors kept for the report and ingestion_errors
+
+RawLoader = Callable[[Session, List[dict], str], Tuple[int, List[str]]]
+
+
+def _check_customers(
+    results: Iterable[RowResult],
+    customer_codes: Set[Optional[str]],
+    file_type: str,
+) -> Iterator[RowResult]:
+    """Turn valid rows whose customer is not in ``customer_codes`` into errors.
+    
+    ``results`` holds one entry per CSV row, as yielded by ``iter_validate``.
+    """
+    for row_idx, (row, error) in enumerate(results, start=2):  # Header is row 1
+        if row is not None and row.get('customer_code') not in customer_codes:
+            customer_code = row.get('customer_code')
+            yield None, IngestionError.model_construct(
+                row_number=row_idx,
+                file_type=file_type,
+                error_code="CUSTOMER_NOT_FOUND",
+                error_message=f"Customer not found: {customer_code}",
+                raw_row=row,
+            )
+            continue
+        yield row, error
+
+
+def _check_products(
+    results: Iterable[RowResult],
+    product_aliases: Dict[str, str],
+) -> Iterator[RowResult]:
+    """Turn valid sales lines whose label has no alias into errors."""
+    for row_idx, (row, error) in enumerate(results, start=2):  # Header is row 1
+        if row is not None and row.get('product_label_norm') not in product_aliases:
+            product_label_norm = row.get('product_label_norm')
+            yield None, IngestionError.model_construct(
+                row_number=row_idx,
+                file_type="sales_lines",
+                error_code="PRODUCT_NOT_FOUND",
+                error_message=f"Product not in alias mapping: {product_label_norm}",
+                raw_row=row,
+            )
+            continue
+        yield row, error
+
 
 class IngestionService:
     """Service to orchestrate ingestion of CSV files."""
@@ -33,6 +79,49 @@ class IngestionService:
         self.batch_id = str(uuid.uuid4())
         self.reports: Dict[str, IngestionReport] = {}
 
+    def _load_validated(
+        self,
+        results: Iterable[RowResult],
+        load_rows: RawLoader,
+    ) -> Tuple[int, List[IngestionError], int]:
+        """Load streamed validation results into a raw table.
+        
+        Valid rows are handed to ``load_rows`` every LOAD_CHUNK_SIZE rows,
+        and at most MAX_REPORTED_ERRORS errors are kept, so memory does not
+        grow with the file beyond what the reader holds.
+        
+        Args:
+            results: (validated_row, error) pairs, one per CSV row
+            load_rows: One of the RawDataLoader.load_raw_* methods
+            
+        Returns:
+            Tuple of (loaded_count, errors, error_count) where error_count
+            also includes errors dropped past MAX_REPORTED_ERRORS
+        """
+        loaded_count = 0
+        chunk: List[dict] = []
+        errors: List[IngestionError] = []
+        error_count = 0
+        
+        for validated_row, error in results:
+            if error is not None:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(error)
+                continue
+            if validated_row is None:
+                continue
+            
+            chunk.append(validated_row)
+            if len(chunk) >= LOAD_CHUNK_SIZE:
+                loaded_count += load_rows(self.db, chunk, self.batch_id)[0]
+                chunk = []
+        
+        if chunk:
+            loaded_count += load_rows(self.db, chunk, self.batch_id)[0]
+        
+        return loaded_count, errors, error_count
+
     def ingest_customers(
         self,
         file_path: Path,
@@ -71,18 +160,13 @@ class IngestionService:
         total_rows = len(rows)
         logger.info(f"Read {total_rows} customer rows")
         
-        # Step 2: Validate
-        valid_rows, validation_errors = CustomerValidator.validate_batch(rows)
-        valid_count = len(valid_rows)
-        error_count = len(validation_errors)
-        
-        logger.info(f"Validation: {valid_count} valid, {error_count} errors")
-        
-        # Step 3: Load
-        loaded_count, load_errors = RawDataLoader.load_raw_customers(
-            self.db, valid_rows, self.batch_id
+        # Steps 2-3: Validate and load in chunks
+        loaded_count, validation_errors, error_count = self._load_validated(
+            CustomerValidator.iter_validate(rows), RawDataLoader.load_raw_customers
         )
         
+        logger.info(f"Validation: {total_rows - error_count} valid, {error_count} errors")
+        
         # Load errors
         if validation_errors:
             error_dicts = [
@@ -164,61 +248,24 @@ class IngestionService:
         logger.info(f"Read {total_rows} sales line rows")
         
         # Step 2: Validate
-        valid_rows, validation_errors = SalesLineValidator.validate_batch(rows)
+        results = SalesLineValidator.iter_validate(rows)
         
         # Step 3: Check dependencies
         if valid_customers:
             customer_codes = {c.get('customer_code') for c in valid_customers}
-            dependency_errors = []
-            
-            for row in valid_rows[:]:
-                if row.get('customer_code') not in customer_codes:
-                    error = IngestionError(
-                        row_number=rows.index(next(
-                            r for r in rows 
-                            if r.get('customer_code') == row.get('customer_code')
-                        )) + 2,
-                        file_type="sales_lines",
-                        error_code="CUSTOMER_NOT_FOUND",
-                        error_message=f"Customer not found: {row.get('customer_code')}",
-                        raw_row=row,
-                    )
-                    dependency_errors.append(error)
-                    valid_rows.remove(row)
-            
-            validation_errors.extend(dependency_errors)
+            results = _check_customers(results, customer_codes, "sales_lines")
         
         # Step 4: Check product mappings
         if product_aliases:
-            mapping_errors = []
-            for row in valid_rows[:]:
-                product_label_norm = row.get('product_label_norm')
-                if product_label_norm not in product_aliases:
-                    error = IngestionError(
-                        row_number=rows.index(next(
-                            r for r in rows 
-                            if r.get('product_label') == row.get('product_label')
-                        )) + 2,
-                        file_type="sales_lines",
-                        error_code="PRODUCT_NOT_FOUND",
-                        error_message=f"Product not in alias mapping: {product_label_norm}",
-                        raw_row=row,
-                    )
-                    mapping_errors.append(error)
-                    valid_rows.remove(row)
-            
-            validation_errors.extend(mapping_errors)
+            results = _check_products(results, product_aliases)
         
-        valid_count = len(valid_rows)
-        error_count = len(validation_errors)
-        
-        logger.info(f"Validation: {valid_count} valid, {error_count} errors")
-        
-        # Step 5: Load
-        loaded_count, load_errors = RawDataLoader.load_raw_sales_lines(
-            self.db, valid_rows, self.batch_id
+        # Step 5: Load in chunks
+        loaded_count, validation_errors, error_count = self._load_validated(
+            results, RawDataLoader.load_raw_sales_lines
         )
         
+        logger.info(f"Validation: {total_rows - error_count} valid, {error_count} errors")
+        
         # Load errors
         if validation_errors:
             error_dicts = [
@@ -289,40 +336,20 @@ class IngestionService:
         logger.info(f"Read {total_rows} contact rows")
         
         # Step 2: Validate
-        valid_rows, validation_errors = ContactValidator.validate_batch(rows)
+        results = ContactValidator.iter_validate(rows)
         
         # Step 3: Check dependencies
         if valid_customers:
             customer_codes = {c.get('customer_code') for c in valid_customers}
-            dependency_errors = []
-            
-            for row in valid_rows[:]:
-                if row.get('customer_code') not in customer_codes:
-                    error = IngestionError(
-                        row_number=rows.index(next(
-                            r for r in rows 
-                            if r.get('customer_code') == row.get('customer_code')
-                        )) + 2,
-                        file_type="contacts",
-                        error_code="CUSTOMER_NOT_FOUND",
-                        error_message=f"Customer not found: {row.get('customer_code')}",
-                        raw_row=row,
-                    )
-                    dependency_errors.append(error)
-                    valid_rows.remove(row)
-            
-            validation_errors.extend(dependency_errors)
-        
-        valid_count = len(valid_rows)
-        error_count = len(validation_errors)
+            results = _check_customers(results, customer_codes, "contacts")
         
-        logger.info(f"Validation: {valid_count} valid, {error_count} errors")
-        
-        # Step 4: Load
-        loaded_count, load_errors = RawDataLoader.load_raw_contacts(
-            self.db, valid_rows, self.batch_id
+        # Step 4: Load in chunks
+        loaded_count, validation_errors, error_count = self._load_validated(
+            results, RawDataLoader.load_raw_contacts
         )
         
+        logger.info(f"Validation: {total_rows - error_count} valid, {error_count} errors")
+        
         # Load errors
         if validation_errors:
             error_dicts = [
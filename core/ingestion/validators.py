@@ -1,26 +1,38 @@
 """Row-level validation for ingestion data."""
 
 import logging
-from typing import List, Optional, Tuple
-from pydantic import ValidationError
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
+from pydantic import BaseModel, ValidationError
 from core.ingestion.schemas import (
     CustomerSchema, SalesLineSchema, ContactSchema, IngestionError
 )
 
 logger = logging.getLogger(__name__)
 
+Row = Dict[str, Any]
+RowResult = Tuple[Optional[Row], Optional[IngestionError]]
+
 
 class BaseValidator:
     """Base validator for row-level validation."""
 
     @staticmethod
-    def validate_row(row: dict, schema_class, row_number: int) -> Tuple[Optional[dict], Optional[IngestionError]]:
+    def validate_row(
+        row: Row,
+        schema_class: Type[BaseModel],
+        row_number: int,
+        file_type: str = "unknown",
+    ) -> RowResult:
         """Validate a single row against schema.
         
+        Errors are built with ``model_construct`` since every field is
+        produced here and needs no re-validation.
+        
         Args:
             row: Raw row data
             schema_class: Pydantic schema class
             row_number: Row number for error reporting
+            file_type: File type recorded on errors
             
         Returns:
             Tuple of (validated_row, error)
@@ -35,18 +47,18 @@ class BaseValidator:
                 msg = error['msg']
                 error_messages.append(f"{field}: {msg}")
             
-            ingestion_error = IngestionError(
+            ingestion_error = IngestionError.model_construct(
                 row_number=row_number,
-                file_type="unknown",
+                file_type=file_type,
                 error_code="VALIDATION_ERROR",
                 error_message=" | ".join(error_messages),
                 raw_row=row,
             )
             return None, ingestion_error
         except Exception as e:
-            ingestion_error = IngestionError(
+            ingestion_error = IngestionError.model_construct(
                 row_number=row_number,
-                file_type="unknown",
+                file_type=file_type,
                 error_code="UNEXPECTED_ERROR",
                 error_message=f"Unexpected error: {str(e)}",
                 raw_row=row,
@@ -54,48 +66,82 @@ class BaseValidator:
             return None, ingestion_error
 
 
+def collect_results(
+    results: Iterable[RowResult],
+    max_errors: Optional[int] = None,
+) -> Tuple[List[Row], List[IngestionError], int]:
+    """Materialize streamed validation results.
+    
+    Args:
+        results: Iterator of (validated_row, error) pairs
+        max_errors: Keep at most this many errors (None keeps all)
+        
+    Returns:
+        Tuple of (valid_rows, errors, error_count) where error_count also
+        includes errors dropped past ``max_errors``
+    """
+    valid_rows: List[Row] = []
+    errors: List[IngestionError] = []
+    error_count: int = 0
+    
+    for validated_row, error in results:
+        if error is not None:
+            error_count += 1
+            if max_errors is None or len(errors) < max_errors:
+                errors.append(error)
+        elif validated_row is not None:
+            valid_rows.append(validated_row)
+    
+    return valid_rows, errors, error_count
+
+
 class CustomerValidator:
     """Validator for customer data."""
 
     @staticmethod
-    def validate_batch(rows: List[dict]) -> Tuple[List[dict], List[IngestionError]]:
-        """Validate batch of customer rows.
+    def iter_validate(
+        rows: Iterable[Row]
+    ) -> Iterator[RowResult]:
+        """Lazily validate customer rows.
         
-        Returns:
-            Tuple of (valid_rows, errors)
+        Yields:
+            Tuple of (validated_row, error) per input row
         """
-        valid_rows = []
-        errors = []
-        
-        # Check for duplicates
-        seen_codes = set()
+        # Check for duplicates. str hashes are cached on the object, so a
+        # single add() probe with a size check is the cheapest membership test.
+        seen_codes: Set[str] = set()
+        mark_seen = seen_codes.add
         
         for row_idx, row in enumerate(rows, start=2):  # Start at 2 (header is row 1)
             # Check for duplicate customer codes
-            customer_code = row.get('customer_code', '').strip()
-            if customer_code in seen_codes:
-                errors.append(IngestionError(
+            customer_code: str = row.get('customer_code', '').strip()
+            seen_before: int = len(seen_codes)
+            mark_seen(customer_code)
+            if len(seen_codes) == seen_before:
+                yield None, IngestionError.model_construct(
                     row_number=row_idx,
                     file_type="customers",
                     error_code="DUPLICATE_CUSTOMER",
                     error_message=f"Duplicate customer_code: {customer_code}",
                     raw_row=row,
-                ))
+                )
                 continue
             
-            seen_codes.add(customer_code)
-            
             # Validate against schema
             validated_row, error = BaseValidator.validate_row(
-                row, CustomerSchema, row_idx
+                row, CustomerSchema, row_idx, "customers"
             )
             
-            if error:
-                error.file_type = "customers"
-                errors.append(error)
-            else:
-                valid_rows.append(validated_row)
+            yield validated_row, error
+
+    @staticmethod
+    def validate_batch(rows: Iterable[Row]) -> Tuple[List[Row], List[IngestionError]]:
+        """Validate batch of customer rows.
         
+        Returns:
+            Tuple of (valid_rows, errors)
+        """
+        valid_rows, errors, _ = collect_results(CustomerValidator.iter_validate(rows))
         return valid_rows, errors
 
 
@@ -103,37 +149,42 @@ class SalesLineValidator:
     """Validator for sales line data."""
 
     @staticmethod
-    def validate_batch(rows: List[dict]) -> Tuple[List[dict], List[IngestionError]]:
-        """Validate batch of sales line rows.
+    def iter_validate(
+        rows: Iterable[Row]
+    ) -> Iterator[RowResult]:
+        """Lazily validate sales line rows.
         
-        Returns:
-            Tuple of (valid_rows, errors)
+        Yields:
+            Tuple of (validated_row, error) per input row
         """
-        valid_rows = []
-        errors = []
-        
         for row_idx, row in enumerate(rows, start=2):
             # Validate against schema
             validated_row, error = BaseValidator.validate_row(
-                row, SalesLineSchema, row_idx
+                row, SalesLineSchema, row_idx, "sales_lines"
             )
             
             if error:
-                error.file_type = "sales_lines"
-                errors.append(error)
+                yield None, error
+            # Check for missing product_label_norm (normalization failed)
+            elif validated_row is None or not validated_row.get('product_label_norm'):
+                yield None, IngestionError.model_construct(
+                    row_number=row_idx,
+                    file_type="sales_lines",
+                    error_code="INVALID_PRODUCT_LABEL",
+                    error_message=f"Product label could not be normalized: {row.get('product_label')}",
+                    raw_row=row,
+                )
             else:
-                # Check for missing product_label_norm (normalization failed)
-                if not validated_row.get('product_label_norm'):
-                    errors.append(IngestionError(
-                        row_number=row_idx,
-                        file_type="sales_lines",
-                        error_code="INVALID_PRODUCT_LABEL",
-                        error_message=f"Product label could not be normalized: {row.get('product_label')}",
-                        raw_row=row,
-                    ))
-                else:
-                    valid_rows.append(validated_row)
+                yield validated_row, None
+
+    @staticmethod
+    def validate_batch(rows: Iterable[Row]) -> Tuple[List[Row], List[IngestionError]]:
+        """Validate batch of sales line rows.
         
+        Returns:
+            Tuple of (valid_rows, errors)
+        """
+        valid_rows, errors, _ = collect_results(SalesLineValidator.iter_validate(rows))
         return valid_rows, errors
 
 
@@ -141,69 +192,76 @@ class ContactValidator:
     """Validator for contact data."""
 
     @staticmethod
-    def validate_batch(rows: List[dict]) -> Tuple[List[dict], List[IngestionError]]:
-        """Validate batch of contact rows.
+    def iter_validate(
+        rows: Iterable[Row]
+    ) -> Iterator[RowResult]:
+        """Lazily validate contact rows.
         
-        Returns:
-            Tuple of (valid_rows, errors)
+        Yields:
+            Tuple of (validated_row, error) per input row
         """
-        valid_rows = []
-        errors = []
-        
         for row_idx, row in enumerate(rows, start=2):
             # Validate against schema
             validated_row, error = BaseValidator.validate_row(
-                row, ContactSchema, row_idx
+                row, ContactSchema, row_idx, "contacts"
             )
             
-            if error:
-                error.file_type = "contacts"
-                errors.append(error)
-            else:
-                valid_rows.append(validated_row)
-        
-        return valid_rows, errors
-
-
-class DependencyValidator:
-    """Cross-table dependency validation."""
+            yield validated_row, error
 
     @staticmethod
-    def check_customer_exists(
-        customer_code: str, 
-        valid_customers: dict, 
-        context: str = "sales_line"
-    ) -> Optional[str]:
-        """Check if customer exists in valid customers.
+    def validate_batch(rows: Iterable[Row]) -> Tuple[List[Row], List[IngestionError]]:
+        """Validate batch of contact rows.
         
-        Args:
-            customer_code: Customer code to check
-            valid_customers: Dict of valid {customer_code: row}
-            context: Context for error message
-            
         Returns:
-            Error message if not found, None if valid
+            Tuple of (valid_rows, errors)
         """
-        if customer_code not in valid_customers:
-            return f"Customer not found in customers batch: {customer_code} ({context})"
-        return None
+        valid_rows, errors, _ = collect_results(ContactValidator.iter_validate(rows))
+        return valid_rows, errors
 
-    @staticmethod
-    def check_product_mapping(
-        product_label_norm: str,
-        product_aliases: dict,
-        context: str = "sales_line"
-    ) -> Optional[Tuple[str, str]]:
-        """Check if product label maps to a product.
+
+def check_customer_exists(
+    customer_code: str,
+    valid_customers: Dict[str, Any],
+    context: str = "sales_line"
+) -> Optional[str]:
+    """Check if customer exists in valid customers.
+    
+    Args:
+        customer_code: Customer code to check
+        valid_customers: Dict of valid {customer_code: row}
+        context: Context for error message
         
-        Args:
-            product_label_norm: Normalized product label
-            product_aliases: Dict of {label_norm: product_key}
-            context: Context for error message
-            
-        Returns:
-            Tuple of (product_key, error) or (None, error_msg) if not found
-        """
-        if product_label_norm not in product_aliases:
-            return None, f"Product not found in alias mapping: {product_label_norm} ({context})"
-        return product_aliases[product_label_norm], None
+    Returns:
+        Error message if not found, None if valid
+    """
+    if customer_code not in valid_customers:
+        return f"Customer not found in customers batch: {customer_code} ({context})"
+    return None
+
+
+def check_product_mapping(
+    product_label_norm: str,
+    product_aliases: Dict[str, str],
+    context: str = "sales_line"
+) -> Tuple[Optional[str], Optional[str]]:
+    """Check if product label maps to a product.
+    
+    Args:
+        product_label_norm: Normalized product label
+        product_aliases: Dict of {label_norm: product_key}
+        context: Context for error message
+        
+    Returns:
+        Tuple of (product_key, error) or (None, error_msg) if not found
+    """
+    product_key = product_aliases.get(product_label_norm)
+    if product_key is None:
+        return None, f"Product not found in alias mapping: {product_label_norm} ({context})"
+    return product_key, None
+
+
+class DependencyValidator:
+    """Cross-table dependency validation."""
+
+    check_customer_exists = staticmethod(check_customer_exists)
+    check_product_mapping = staticmethod(check_product_mapping)
@@ -1,18 +1,45 @@
 """Outcomes Service - Tracks recommendation outcomes and feedback"""
 
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from math import erf, sqrt
+from typing import List, Optional, Dict, Any, Set, Iterable, Callable, Tuple, Protocol, runtime_checkable
 from .models import (
     OutcomeStatus, OutcomeReason, FeedbackType,
     OutcomeRecord, FeedbackRecord, OutcomeMetrics,
     ModelPerformanceMetrics, RetrainingTrigger, ABTestResult
 )
 
+_SQRT2 = sqrt(2.0)
+MIN_SAMPLE_SIZE = 30  # Minimum outcomes for a statistical comparison
+_SENTIMENT_BY_SCORE = ("negative", "negative", "neutral", "positive", "positive")
+BULK_BATCH_SIZE = 1000  # Records per bulk insert round-trip
+
+
+@runtime_checkable
+class AggregatingOutcomesBackend(Protocol):
+    """Backend that computes outcome/feedback aggregates in the database
+
+    Both methods are required; a backend with only one of them is treated
+    as a plain row-returning backend.
+    """
+
+    def aggregate_outcomes(
+        self, since: datetime, customer_code: Optional[str] = None
+    ) -> Tuple[int, int, int, int, Optional[float]]:
+        """(total, accepted, purchased, returned, revenue) for outcomes since ``since``"""
+        ...
+
+    def aggregate_feedback(
+        self, since: datetime
+    ) -> Tuple[Optional[float], Optional[int]]:
+        """(average score, distinct products with feedback) since ``since``"""
+        ...
+
 
 class OutcomesService:
     """Service for managing recommendation outcomes"""
 
-    def __init__(self, db=None):
+    def __init__(self, db: Any = None) -> None:
         self.db = db
 
     def record_outcome(
@@ -27,7 +54,28 @@ class OutcomesService:
         purchase_amount: Optional[float] = None,
     ) -> OutcomeRecord:
         """Record a recommendation outcome"""
-        outcome = OutcomeRecord(
+        outcome = self._build_outcome(
+            audit_id, customer_code, product_key, recommendation_score,
+            status, reason, purchased, purchase_amount,
+        )
+        # Save to database
+        if self.db:
+            self.db.save_outcome(outcome)
+        return outcome
+
+    @staticmethod
+    def _build_outcome(
+        audit_id: str,
+        customer_code: str,
+        product_key: str,
+        recommendation_score: float,
+        status: OutcomeStatus,
+        reason: Optional[OutcomeReason] = None,
+        purchased: bool = False,
+        purchase_amount: Optional[float] = None,
+    ) -> OutcomeRecord:
+        """Build an outcome record (arguments of ``record_outcome``)"""
+        return OutcomeRecord(
             audit_id=audit_id,
             customer_code=customer_code,
             product_key=product_key,
@@ -38,10 +86,6 @@ class OutcomesService:
             purchase_amount=purchase_amount,
             purchase_date=datetime.utcnow() if purchased else None,
         )
-        # Save to database
-        if self.db:
-            self.db.save_outcome(outcome)
-        return outcome
 
     def record_feedback(
         self,
@@ -52,15 +96,27 @@ class OutcomesService:
         comment: Optional[str] = None,
     ) -> FeedbackRecord:
         """Record customer feedback on recommendation"""
-        # Determine sentiment from score
-        if score >= 4:
-            sentiment = "positive"
-        elif score >= 3:
-            sentiment = "neutral"
-        else:
-            sentiment = "negative"
-
-        feedback = FeedbackRecord(
+        feedback = self._build_feedback(
+            customer_code, product_key, feedback_type, score, comment
+        )
+        # Save to database
+        if self.db:
+            self.db.save_feedback(feedback)
+        return feedback
+
+    @staticmethod
+    def _build_feedback(
+        customer_code: str,
+        product_key: str,
+        feedback_type: FeedbackType,
+        score: int,
+        comment: Optional[str] = None,
+    ) -> FeedbackRecord:
+        """Build a feedback record (arguments of ``record_feedback``)"""
+        # Determine sentiment from score (clamped onto the 1-5 scale)
+        sentiment = _SENTIMENT_BY_SCORE[max(0, min(4, score - 1))]
+
+        return FeedbackRecord(
             customer_code=customer_code,
             product_key=product_key,
             feedback_type=feedback_type,
@@ -68,38 +124,100 @@ class OutcomesService:
             comment=comment,
             sentiment=sentiment,
         )
-        # Save to database
-        if self.db:
-            self.db.save_feedback(feedback)
+
+    def bulk_record_outcomes(
+        self,
+        records: Iterable[Dict[str, Any]],
+    ) -> List[OutcomeRecord]:
+        """Record many outcomes (kwargs of ``record_outcome``) in batches"""
+        outcomes = [self._build_outcome(**record) for record in records]
+        self._save_in_batches(outcomes, "save_outcomes_bulk", "save_outcome")
+        return outcomes
+
+    def bulk_record_feedback(
+        self,
+        records: Iterable[Dict[str, Any]],
+    ) -> List[FeedbackRecord]:
+        """Record many feedback entries (kwargs of ``record_feedback``) in batches"""
+        feedback = [self._build_feedback(**record) for record in records]
+        self._save_in_batches(feedback, "save_feedback_bulk", "save_feedback")
         return feedback
 
+    def bulk_track_model_performance(
+        self,
+        records: Iterable[Dict[str, Any]],
+    ) -> List[ModelPerformanceMetrics]:
+        """Track many predictions (kwargs of ``track_model_performance``) in batches"""
+        metrics = [self._build_performance_metric(**record) for record in records]
+        self._save_in_batches(
+            metrics, "save_performance_metrics_bulk", "save_performance_metric"
+        )
+        return metrics
+
+    def _save_in_batches(
+        self,
+        items: List[Any],
+        bulk_method: str,
+        single_method: str,
+    ) -> None:
+        """Persist items through the backend's bulk API when it has one"""
+        if not self.db or not items:
+            return
+        save_bulk: Optional[Callable[[List[Any]], Any]] = getattr(
+            self.db, bulk_method, None
+        )
+        if save_bulk is None:
+            save_one = getattr(self.db, single_method)
+            for item in items:
+                save_one(item)
+            return
+        for start in range(0, len(items), BULK_BATCH_SIZE):
+            save_bulk(items[start:start + BULK_BATCH_SIZE])
+
     def compute_outcome_metrics(
         self,
         days: int = 7,
         customer_code: Optional[str] = None,
     ) -> OutcomeMetrics:
-        """Compute outcome metrics for time period"""
+        """Compute outcome metrics for time period
+
+        Backends implementing AggregatingOutcomesBackend compute the counts
+        in SQL, e.g.
+        ``SELECT COUNT(*), COUNT(*) FILTER (WHERE status != 'REJECTED'),
+        COUNT(*) FILTER (WHERE purchased), COUNT(*) FILTER (WHERE status =
+        'RETURNED'), SUM(purchase_amount) FILTER (WHERE purchased)`` and
+        ``SELECT AVG(score), COUNT(DISTINCT product_key)``; otherwise rows
+        are fetched and aggregated here.
+        """
         cutoff_date = datetime.utcnow() - timedelta(days=days)
 
+        if not self.db:
+            return self._empty_metrics()
+
+        # Let the database aggregate when the backend supports it
+        if isinstance(self.db, AggregatingOutcomesBackend):
+            total, accepted, purchased, returned, revenue = self.db.aggregate_outcomes(
+                since=cutoff_date,
+                customer_code=customer_code
+            )
+            if not total:
+                return self._empty_metrics()
+            avg_satisfaction, products_with_feedback = self.db.aggregate_feedback(
+                since=cutoff_date
+            )
+            return self._build_metrics(
+                total, accepted, purchased, returned, revenue or 0.0,
+                avg_satisfaction or 0.0, products_with_feedback or 0,
+            )
+
         # Fetch outcomes from database
         outcomes = self.db.get_outcomes(
             since=cutoff_date,
             customer_code=customer_code
-        ) if self.db else []
+        )
 
         if not outcomes:
-            return OutcomeMetrics(
-                total_recommendations=0,
-                total_outcomes=0,
-                acceptance_rate=0.0,
-                purchase_rate=0.0,
-                return_rate=0.0,
-                average_satisfaction=0.0,
-                revenue_impact=0.0,
-                roi=0.0,
-                recommendations_with_feedback=0,
-                recommendations_with_outcomes=0,
-            )
+            return self._empty_metrics()
 
         total = len(outcomes)
         accepted = len([o for o in outcomes if o.status != OutcomeStatus.REJECTED])
@@ -108,12 +226,50 @@ class OutcomesService:
         revenue = sum(o.purchase_amount or 0 for o in outcomes if o.purchased)
 
         # Fetch feedback
-        feedback = self.db.get_feedback(since=cutoff_date) if self.db else []
+        feedback = self.db.get_feedback(since=cutoff_date)
+        total_score: int = 0
+        feedback_count: int = 0
+        feedback_products: Set[str] = set()
+        for f in feedback:
+            total_score += f.score
+            feedback_count += 1
+            feedback_products.add(f.product_key)
         avg_satisfaction = (
-            sum(f.score for f in feedback) / len(feedback)
-            if feedback else 0.0
+            total_score / feedback_count if feedback_count else 0.0
+        )
+
+        return self._build_metrics(
+            total, accepted, purchased, returned, revenue,
+            avg_satisfaction, len(feedback_products),
         )
 
+    @staticmethod
+    def _empty_metrics() -> OutcomeMetrics:
+        """Metrics for a window without any outcomes"""
+        return OutcomeMetrics(
+            total_recommendations=0,
+            total_outcomes=0,
+            acceptance_rate=0.0,
+            purchase_rate=0.0,
+            return_rate=0.0,
+            average_satisfaction=0.0,
+            revenue_impact=0.0,
+            roi=0.0,
+            recommendations_with_feedback=0,
+            recommendations_with_outcomes=0,
+        )
+
+    @staticmethod
+    def _build_metrics(
+        total: int,
+        accepted: int,
+        purchased: int,
+        returned: int,
+        revenue: float,
+        avg_satisfaction: float,
+        recommendations_with_feedback: int,
+    ) -> OutcomeMetrics:
+        """Derive outcome metrics from aggregated counts"""
         return OutcomeMetrics(
             total_recommendations=total,
             total_outcomes=total,
@@ -123,7 +279,7 @@ class OutcomesService:
             average_satisfaction=avg_satisfaction,
             revenue_impact=revenue,
             roi=(revenue - (total * 100)) / (total * 100) if total > 0 else 0.0,
-            recommendations_with_feedback=len(set(f.product_key for f in feedback)),
+            recommendations_with_feedback=recommendations_with_feedback,
             recommendations_with_outcomes=total,
         )
 
@@ -133,9 +289,14 @@ class OutcomesService:
         previous_metrics: Optional[OutcomeMetrics] = None,
     ) -> List[RetrainingTrigger]:
         """Check if retraining should be triggered based on metrics"""
+        # An empty window carries no signal
+        if current_metrics.total_outcomes == 0:
+            return []
+
         triggers = []
 
-        if previous_metrics:
+        if (previous_metrics
+                and previous_metrics.total_outcomes >= MIN_SAMPLE_SIZE):
             # Check for performance drop
             if current_metrics.purchase_rate < previous_metrics.purchase_rate * 0.9:
                 triggers.append(
@@ -207,12 +368,27 @@ class OutcomesService:
         confidence: float,
     ) -> ModelPerformanceMetrics:
         """Track individual model prediction performance"""
+        metric = self._build_performance_metric(
+            recommendation_id, actual_outcome, predicted_score, confidence
+        )
+        if self.db:
+            self.db.save_performance_metric(metric)
+        return metric
+
+    @staticmethod
+    def _build_performance_metric(
+        recommendation_id: str,
+        actual_outcome: OutcomeStatus,
+        predicted_score: float,
+        confidence: float,
+    ) -> ModelPerformanceMetrics:
+        """Build a performance metric (arguments of ``track_model_performance``)"""
         # Calculate error margin
         actual_score = 1.0 if actual_outcome == OutcomeStatus.PURCHASED else 0.0
         error_margin = abs(actual_score - predicted_score)
         is_accurate = error_margin < 0.2  # 20% threshold
 
-        metric = ModelPerformanceMetrics(
+        return ModelPerformanceMetrics(
             recommendation_id=recommendation_id,
             actual_outcome=actual_outcome,
             predicted_score=predicted_score,
@@ -221,10 +397,6 @@ class OutcomesService:
             is_accurate=is_accurate,
         )
 
-        if self.db:
-            self.db.save_performance_metric(metric)
-        return metric
-
     def create_ab_test(
         self,
         test_id: str,
@@ -296,11 +468,11 @@ class OutcomesService:
         p1: float, p2: float, n1: int, n2: int
     ) -> float:
         """Calculate statistical confidence between two proportions"""
-        if n1 < 30 or n2 < 30:  # Minimum sample size
+        if n1 < MIN_SAMPLE_SIZE or n2 < MIN_SAMPLE_SIZE:
             return 0.0
         # Simplified Z-test confidence
         pooled = (p1 * n1 + p2 * n2) / (n1 + n2)
         se = (pooled * (1 - pooled) * (1/n1 + 1/n2)) ** 0.5
         z = abs(p1 - p2) / se if se > 0 else 0
-        # Approximate confidence from Z score
-        return min(0.99, z / 1.96)  # 95% confidence threshold
+        # Two-sided confidence level from the normal CDF: 2 * Phi(z) - 1
+        return erf(z / _SQRT2)
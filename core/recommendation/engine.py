@@ -1,37 +1,64 @@
 """Main recommendation engine orchestrator."""
 
+import json
 import logging
 import uuid
-from typing import List, Dict, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from psycopg2.extras import execute_values
 
 from core.recommendation.feature_computer import FeatureComputer
 from core.recommendation.scenario_matcher import ScenarioMatcher, RecoScenario
 from core.recommendation.scorer import RecommendationScorer, RecoScore
-from core.recommendation.explanation_generator import ExplanationGenerator
+from core.recommendation.explanation_generator import Explanation, ExplanationGenerator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+BATCH_CHUNK_SIZE = 1000  # Customers preloaded per batch query
+
+_SCENARIO_BASE_SCORES: Dict[RecoScenario, float] = {
+    RecoScenario.REBUY: 85.0,
+    RecoScenario.CROSS_SELL: 75.0,
+    RecoScenario.UPSELL: 80.0,
+    RecoScenario.WINBACK: 70.0,
+    RecoScenario.NURTURE: 65.0,
+}
+
+_SELECT_CUSTOMER_CODES = text("""
+    SELECT DISTINCT customer_code FROM customer LIMIT :limit
+""")
+
+_RECO_ITEM_COLUMNS = (
+    'reco_run_id', 'customer_code', 'rank', 'scenario', 'product_key', 'product_name',
+    'score_total', 'score_affinity', 'score_popularity', 'score_profit',
+    'explanation', 'created_at',
+)
+_INSERT_RECO_ITEM = text(
+    f"INSERT INTO reco_item ({', '.join(_RECO_ITEM_COLUMNS)}) "
+    f"VALUES ({', '.join(':' + c for c in _RECO_ITEM_COLUMNS)})"
+)
+
 
+@dataclass(slots=True)
 class RecommendationItem:
     """A single recommendation for a customer."""
-
-    def __init__(
-        self,
-        rank: int,
-        product_key: str,
-        scenario: str,
-        score: RecoScore,
-        explanation: Dict,
-    ):
-        self.rank = rank
-        self.product_key = product_key
-        self.scenario = scenario
-        self.score = score
-        self.explanation = explanation
-        self.created_at = datetime.utcnow()
+    rank: int
+    product_key: str
+    scenario: str
+    score: RecoScore
+    explanation: Explanation
+    created_at: datetime = field(default_factory=datetime.utcnow)
 
     def to_dict(self) -> Dict:
         """Convert to dict for serialization."""
@@ -40,21 +67,20 @@ class RecommendationItem:
             'product_key': self.product_key,
             'scenario': self.scenario,
             'score': self.score.to_dict(),
-            'explanation': self.explanation,
+            'explanation': self.explanation.to_dict(),
             'created_at': self.created_at.isoformat(),
         }
 
 
+@dataclass(slots=True)
 class RecommendationResult:
     """Result of recommendation generation."""
-
-    def __init__(self, customer_code: str, run_id: str):
-        self.customer_code = customer_code
-        self.run_id = run_id
-        self.recommendations: List[RecommendationItem] = []
-        self.features: Dict = {}
-        self.scenarios_matched: Dict = {}
-        self.generated_at = datetime.utcnow()
+    customer_code: str
+    run_id: uuid.UUID
+    recommendations: List[RecommendationItem] = field(default_factory=list)
+    features: Dict = field(default_factory=dict)
+    scenarios_matched: Dict = field(default_factory=dict)
+    generated_at: datetime = field(default_factory=datetime.utcnow)
 
     def add_recommendation(self, item: RecommendationItem):
         """Add a recommendation."""
@@ -63,26 +89,36 @@ class RecommendationResult:
     def to_dict(self) -> Dict:
         """Convert to dict for serialization."""
         return {
-            'run_id': self.run_id,
+            'run_id': str(self.run_id),
             'customer_code': self.customer_code,
             'generated_at': self.generated_at.isoformat(),
             'recommendations': [r.to_dict() for r in self.recommendations],
             'scenario_count': len(self.scenarios_matched),
         }
 
+    def to_bytes(self) -> bytes:
+        """Serialize to JSON bytes for API/queue output.
+        
+        Uses orjson when installed, falling back to the standard json module.
+        """
+        if orjson is not None:
+            return orjson.dumps(self.to_dict())
+        return json.dumps(self.to_dict()).encode('utf-8')
+
 
 class RecommendationEngine:
     """Main recommendation engine."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, use_daily_snapshot: bool = False):
         """Initialize engine with database session.
         
         Args:
             db: SQLAlchemy session
+            use_daily_snapshot: Read RFM aggregates from customer_features_daily
         """
         self.db = db
-        self.feature_computer = FeatureComputer(db)
-        self.scenario_matcher = ScenarioMatcher(db)
+        self.feature_computer = FeatureComputer(db, use_daily_snapshot=use_daily_snapshot)
+        self.scenario_matcher = ScenarioMatcher(db, use_daily_snapshot=use_daily_snapshot)
         self.scorer = RecommendationScorer(db)
         self.explanation_generator = ExplanationGenerator(db)
 
@@ -91,6 +127,7 @@ class RecommendationEngine:
         customer_code: str,
         max_recommendations: int = 3,
         enable_silence_check: bool = True,
+        prefetched: Optional[Dict] = None,
     ) -> Tuple[RecommendationResult, bool]:
         """Generate recommendations for a customer.
         
@@ -106,30 +143,46 @@ class RecommendationEngine:
             customer_code: Customer code
             max_recommendations: Max recommendations to return
             enable_silence_check: Check contact silence window
+            prefetched: Preloaded {'features': dict, 'in_silence': bool,
+                'scenarios': dict} from a batch run, used instead of
+                per-customer queries
             
         Returns:
             Tuple of (result, success)
         """
-        run_id = str(uuid.uuid4())
+        run_id = uuid.uuid4()
         logger.info(f"Starting recommendation generation for {customer_code} (run_id={run_id})")
         
         result = RecommendationResult(customer_code, run_id)
         
+        # Per-customer caches only need to live for this customer
+        self.scorer.clear_customer_cache()
+        self.explanation_generator.clear_customer_cache()
+        
         try:
-            # Step 1: Compute features
-            logger.debug("Step 1: Computing customer features...")
-            result.features = self.feature_computer.compute_customer_features(customer_code)
-            
-            # Check silence window
+            # Check silence window first so silent customers skip feature work
             if enable_silence_check:
-                in_silence = self.feature_computer.get_silence_window(customer_code, days=30)
+                if prefetched is not None:
+                    in_silence = prefetched['in_silence']
+                else:
+                    in_silence = self.feature_computer.get_silence_window(customer_code, days=30)
                 if in_silence:
                     logger.info(f"Customer {customer_code} in silence window, skipping")
                     return result, False
             
+            # Step 1: Compute features
+            logger.debug("Step 1: Computing customer features...")
+            if prefetched is not None:
+                result.features = prefetched['features']
+            else:
+                result.features = self.feature_computer.compute_customer_features(customer_code)
+            
             # Step 2: Match scenarios
             logger.debug("Step 2: Matching scenarios...")
-            scenarios_match = self.scenario_matcher.match_scenarios(customer_code)
+            if prefetched is not None:
+                scenarios_match = prefetched['scenarios']
+            else:
+                scenarios_match = self.scenario_matcher.match_scenarios(customer_code)
             
             if not scenarios_match:
                 logger.warning(f"No scenarios matched for {customer_code}")
@@ -139,30 +192,21 @@ class RecommendationEngine:
             
             # Step 3: Score all products
             logger.debug("Step 3: Scoring recommendations...")
-            all_scores: List[RecoScore] = []
+            candidates: List[Tuple[str, str, float]] = []
             
             for scenario, products in scenarios_match.items():
                 if not products:
                     continue
                 
-                for product_key in products:
-                    # Scenario-specific base score
-                    scenario_base_scores = {
-                        RecoScenario.REBUY: 85.0,
-                        RecoScenario.CROSS_SELL: 75.0,
-                        RecoScenario.UPSELL: 80.0,
-                        RecoScenario.WINBACK: 70.0,
-                        RecoScenario.NURTURE: 65.0,
-                    }
-                    base_score = scenario_base_scores.get(scenario, 70.0)
-                    
-                    score = self.scorer.score_recommendation(
-                        customer_code,
-                        product_key,
-                        scenario.value,
-                        base_score=base_score,
-                    )
-                    all_scores.append(score)
+                # Scenario-specific base score
+                base_score = _SCENARIO_BASE_SCORES.get(scenario, 70.0)
+                candidates.extend(
+                    (product_key, scenario.value, base_score) for product_key in products
+                )
+            
+            all_scores: List[RecoScore] = self.scorer.score_recommendations_batch(
+                customer_code, candidates, top_n=max_recommendations
+            )
             
             if not all_scores:
                 logger.warning(f"No products scored for {customer_code}")
@@ -175,6 +219,7 @@ class RecommendationEngine:
             
             # Step 5: Generate explanations
             logger.debug("Step 5: Generating explanations...")
+            self.explanation_generator.prime([score.product_key for score in diversified])
             for rank, score in enumerate(diversified, start=1):
                 explanation = self.explanation_generator.generate_explanation(
                     customer_code,
@@ -187,7 +232,7 @@ class RecommendationEngine:
                     product_key=score.product_key,
                     scenario=score.scenario,
                     score=score,
-                    explanation=explanation.to_dict(),
+                    explanation=explanation,
                 )
                 result.add_recommendation(item)
             
@@ -211,39 +256,41 @@ class RecommendationEngine:
         Args:
             result: RecommendationResult object
         """
+        if not result.recommendations:
+            return
+        
         try:
-            for item in result.recommendations:
-                # Get product name
-                prod_result = self.db.execute(text("""
-                    SELECT product_name FROM product WHERE product_key = :pk
-                """), {'pk': item.product_key})
-                prod_row = prod_result.fetchone()
-                product_name = prod_row[0] if prod_row else item.product_key
-                
-                # Save to reco_item table
-                self.db.execute(text("""
-                    INSERT INTO reco_item
-                    (reco_run_id, customer_code, rank, scenario, product_key, product_name,
-                     score_total, score_affinity, score_popularity, score_profit,
-                     explanation, created_at)
-                    VALUES
-                    (:run_id, :customer_code, :rank, :scenario, :product_key, :product_name,
-                     :score_total, :score_affinity, :score_popularity, :score_profit,
-                     :explanation, :created_at)
-                """), {
-                    'run_id': result.run_id,
-                    'customer_code': result.customer_code,
-                    'rank': item.rank,
-                    'scenario': item.scenario,
-                    'product_key': item.product_key,
-                    'product_name': product_name,
-                    'score_total': item.score.final_score,
-                    'score_affinity': item.score.affinity_score,
-                    'score_popularity': item.score.popularity_score,
-                    'score_profit': item.score.profit_score,
-                    'explanation': item.explanation['reason'],
-                    'created_at': item.created_at,
-                })
+            # Get product names in one round trip
+            prod_result = self.db.execute(
+                text("""
+                    SELECT product_key, product_name FROM product
+                    WHERE product_key IN :keys
+                """).bindparams(bindparam('keys', expanding=True)),
+                {'keys': [item.product_key for item in result.recommendations]},
+            )
+            product_names = {row[0]: row[1] for row in prod_result}
+            
+            # reco_item.reco_run_id is a text column shared with audit run ids,
+            # so the UUID is only formatted once per run, here.
+            run_id = str(result.run_id)
+            rows = [
+                (
+                    run_id,
+                    result.customer_code,
+                    item.rank,
+                    item.scenario,
+                    item.product_key,
+                    product_names.get(item.product_key, item.product_key),
+                    item.score.final_score,
+                    item.score.affinity_score,
+                    item.score.popularity_score,
+                    item.score.profit_score,
+                    item.explanation.reason,
+                    item.created_at,
+                )
+                for item in result.recommendations
+            ]
+            self._insert_reco_items(rows)
             
             self.db.commit()
             logger.debug(f"Saved {len(result.recommendations)} recommendations")
@@ -252,41 +299,194 @@ class RecommendationEngine:
             logger.warning(f"Failed to save recommendations: {str(e)}")
             self.db.rollback()
 
-    def generate_batch_recommendations(
+    def _insert_reco_items(self, rows: List[Tuple]) -> None:
+        """Insert reco_item rows in a single statement where possible.
+        
+        On PostgreSQL the rows are shipped with psycopg2's execute_values
+        (multi-row VALUES pages); other dialects use executemany.
+        
+        Args:
+            rows: Tuples ordered as _RECO_ITEM_COLUMNS
+        """
+        if self.db.get_bind().dialect.name == 'postgresql':
+            cursor = self.db.connection().connection.cursor()
+            try:
+                execute_values(
+                    cursor,
+                    f"INSERT INTO reco_item ({', '.join(_RECO_ITEM_COLUMNS)}) VALUES %s",
+                    rows,
+                    page_size=500,
+                )
+            finally:
+                cursor.close()
+        else:
+            self.db.execute(
+                _INSERT_RECO_ITEM,
+                [dict(zip(_RECO_ITEM_COLUMNS, row)) for row in rows],
+            )
+
+    def _generate_chunk(
+        self,
+        customer_codes: List[str],
+    ) -> List[Tuple[str, RecommendationResult, bool]]:
+        """Generate recommendations for one chunk of customers.
+        
+        Args:
+            customer_codes: Customer codes in the chunk
+            
+        Returns:
+            List of (customer_code, result, success)
+        """
+        # Preload per-customer inputs with grouped queries
+        silent = self.feature_computer.get_silence_window_batch(customer_codes, days=30)
+        active_codes = [code for code in customer_codes if code not in silent]
+        features = self.feature_computer.compute_customer_features_batch(active_codes)
+        scenarios = self.scenario_matcher.match_scenarios_batch(active_codes)
+        
+        chunk_results = []
+        for customer_code in customer_codes:
+            reco_result, success = self.generate_recommendations(
+                customer_code,
+                prefetched={
+                    'features': features.get(customer_code, {}),
+                    'in_silence': customer_code in silent,
+                    'scenarios': scenarios.get(customer_code, {}),
+                },
+            )
+            chunk_results.append((customer_code, reco_result, success))
+        return chunk_results
+
+    def iter_batch_recommendations(
         self,
         customer_codes: Optional[List[str]] = None,
         limit: Optional[int] = None,
-    ) -> Dict[str, Tuple[RecommendationResult, bool]]:
-        """Generate recommendations for batch of customers.
+        session_factory: Optional[Callable[[], Session]] = None,
+        max_workers: int = 1,
+    ) -> Iterator[Tuple[str, RecommendationResult, bool]]:
+        """Generate recommendations for batch of customers, one at a time.
+        
+        Results are yielded as each chunk completes so callers can write
+        them out without holding the whole batch in memory.
         
         Args:
             customer_codes: Specific customer codes, or None for all
             limit: Maximum customers to process
+            session_factory: Session factory (e.g. a sessionmaker) used to
+                give each worker thread its own session
+            max_workers: Worker threads; chunks run in parallel when > 1
+                and a session_factory is provided
             
-        Returns:
-            Dict of {customer_code: (result, success)}
+        Yields:
+            Tuple of (customer_code, result, success)
         """
         logger.info("Starting batch recommendation generation")
         
         # Get customer list
         if customer_codes:
-            codes = customer_codes
+            logger.info(f"Processing {len(customer_codes)} customers")
+            chunks: Iterable[List[str]] = (
+                customer_codes[start:start + BATCH_CHUNK_SIZE]
+                for start in range(0, len(customer_codes), BATCH_CHUNK_SIZE)
+            )
         else:
-            result = self.db.execute(text("""
-                SELECT DISTINCT customer_code FROM customer LIMIT :limit
-            """), {'limit': limit or 100000})
-            codes = [row[0] for row in result]
-        
-        logger.info(f"Processing {len(codes)} customers")
+            chunks = self._stream_customer_code_chunks(limit or 100000)
         
-        results = {}
+        processed = 0
         successes = 0
         
-        for customer_code in codes:
-            reco_result, success = self.generate_recommendations(customer_code)
-            results[customer_code] = (reco_result, success)
+        for customer_code, reco_result, success in self._iter_chunk_results(
+            chunks, session_factory, max_workers
+        ):
+            processed += 1
             if success:
                 successes += 1
+            yield customer_code, reco_result, success
+        
+        logger.info(f"Batch complete: {successes}/{processed} successful")
+
+    def _stream_customer_code_chunks(
+        self,
+        limit: int,
+    ) -> Iterator[List[str]]:
+        """Stream customer codes in chunks with a server-side cursor.
         
-        logger.info(f"Batch complete: {successes}/{len(codes)} successful")
-        return results
+        Runs on its own connection: the per-customer work commits on
+        self.db, which would close a cursor opened on the same connection.
+        
+        Args:
+            limit: Maximum customers to return
+            
+        Yields:
+            Lists of up to BATCH_CHUNK_SIZE customer codes
+        """
+        with self.db.get_bind().connect() as conn:
+            result = conn.execution_options(
+                stream_results=True,
+                yield_per=BATCH_CHUNK_SIZE,
+            ).execute(_SELECT_CUSTOMER_CODES, {'limit': limit})
+            for partition in result.partitions():
+                yield [row[0] for row in partition]
+
+    def _iter_chunk_results(
+        self,
+        chunks: Iterable[List[str]],
+        session_factory: Optional[Callable[[], Session]],
+        max_workers: int,
+    ) -> Iterator[Tuple[str, RecommendationResult, bool]]:
+        """Run chunks sequentially or on worker threads, in input order."""
+        if session_factory is None or max_workers <= 1:
+            for chunk in chunks:
+                yield from self._generate_chunk(chunk)
+            return
+        
+        # Per-customer work is dominated by database round trips, so threads
+        # with one session each overlap the waits. Only a few chunks are kept
+        # in flight so finished results do not pile up ahead of the consumer.
+        run_chunk = partial(
+            _generate_chunk_in_session,
+            session_factory,
+            self.feature_computer.use_daily_snapshot,
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(run_chunk, chunk))
+                if len(pending) >= 2 * max_workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def generate_batch_recommendations(
+        self,
+        customer_codes: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+        max_workers: int = 1,
+    ) -> Dict[str, Tuple[RecommendationResult, bool]]:
+        """Generate recommendations for batch of customers.
+        
+        Materializing wrapper around iter_batch_recommendations.
+        
+        Returns:
+            Dict of {customer_code: (result, success)}
+        """
+        return {
+            customer_code: (reco_result, success)
+            for customer_code, reco_result, success in self.iter_batch_recommendations(
+                customer_codes, limit, session_factory, max_workers
+            )
+        }
+
+
+def _generate_chunk_in_session(
+    session_factory: Callable[[], Session],
+    use_daily_snapshot: bool,
+    customer_codes: List[str],
+) -> List[Tuple[str, RecommendationResult, bool]]:
+    """Run one chunk on a dedicated session (worker thread entry point)."""
+    session = session_factory()
+    try:
+        engine = RecommendationEngine(session, use_daily_snapshot=use_daily_snapshot)
+        return engine._generate_chunk(customer_codes)
+    finally:
+        session.close()
@@ -1,13 +1,84 @@
 """Generate human-readable explanations for recommendations."""
 
 import logging
+from datetime import datetime
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
 
+_SENTINEL = object()
+
+
+# SQL statements are built once at import and reused on every call
+_SELECT_PRODUCT = text("""
+    SELECT 
+        product_key, product_name, family, 
+        aroma_axes, premium_tier, vintage
+    FROM product
+    WHERE product_key = :pk
+""")
+
+_SELECT_PRODUCTS = text("""
+    SELECT 
+        product_key, product_name, family, 
+        aroma_axes, premium_tier, vintage
+    FROM product
+    WHERE product_key IN :keys
+""").bindparams(bindparam('keys', expanding=True))
+
+_SELECT_PRODUCT_WITH_PURCHASES = text("""
+    SELECT 
+        p.product_key, p.product_name, p.family, 
+        p.aroma_axes, p.premium_tier, p.vintage,
+        MAX(ol.order_date)
+    FROM product p
+    LEFT JOIN order_line ol
+        ON ol.product_key = p.product_key
+        AND ol.customer_code = :customer_code
+    WHERE p.product_key = :product_key
+    GROUP BY
+        p.product_key, p.product_name, p.family,
+        p.aroma_axes, p.premium_tier, p.vintage
+""")
+
+_SELECT_PURCHASE_HISTORY = text("""
+    SELECT MAX(order_date)
+    FROM order_line
+    WHERE customer_code = :customer_code
+    AND product_key = :product_key
+""")
+
+_SELECT_PRODUCT_WITH_FAV_FAMILY = text("""
+    SELECT 
+        p.product_key, p.product_name, p.family, 
+        p.aroma_axes, p.premium_tier, p.vintage,
+        (
+            SELECT fp.family
+            FROM order_line ol
+            JOIN product fp ON ol.product_key = fp.product_key
+            WHERE ol.customer_code = :customer_code
+            GROUP BY fp.family
+            ORDER BY COUNT(*) DESC
+            LIMIT 1
+        ) AS fav_family
+    FROM product p
+    WHERE p.product_key = :product_key
+""")
+
+_SELECT_FAV_FAMILY = text("""
+    SELECT p.family
+    FROM order_line ol
+    JOIN product p ON ol.product_key = p.product_key
+    WHERE ol.customer_code = :customer_code
+    GROUP BY p.family
+    ORDER BY COUNT(*) DESC
+    LIMIT 1
+""")
+
 
 @dataclass
 class Explanation:
@@ -35,6 +106,24 @@ class ExplanationGenerator:
             db: SQLAlchemy session
         """
         self.db = db
+        self._product_cache: Dict[str, Dict] = {}
+        self._fav_family_cache: Dict[str, Optional[str]] = {}
+
+    def clear_customer_cache(self) -> None:
+        """Drop per-customer lookups cached during a recommendation run."""
+        self._fav_family_cache.clear()
+
+    @staticmethod
+    def _product_row_to_dict(row) -> Dict:
+        """Map a product query row to a product info dict."""
+        return {
+            'product_key': row[0],
+            'product_name': row[1],
+            'family': row[2],
+            'aroma_axes': row[3],
+            'premium_tier': row[4],
+            'vintage': row[5],
+        }
 
     def get_product_info(
         self,
@@ -42,38 +131,56 @@ class ExplanationGenerator:
     ) -> Dict:
         """Fetch product information.
         
+        Results are cached per product for the generator's lifetime.
+        
         Args:
             product_key: Product key
             
         Returns:
             Dict with product details
         """
+        cached = self._product_cache.get(product_key)
+        if cached is not None:
+            return cached
+        
         try:
-            result = self.db.execute(text("""
-                SELECT 
-                    product_key, product_name, family, 
-                    aroma_axes, premium_tier, vintage
-                FROM product
-                WHERE product_key = :pk
-            """), {'pk': product_key})
+            result = self.db.execute(_SELECT_PRODUCT, {'pk': product_key})
             
             row = result.fetchone()
-            if not row:
-                return {}
-            
-            return {
-                'product_key': row[0],
-                'product_name': row[1],
-                'family': row[2],
-                'aroma_axes': row[3],
-                'premium_tier': row[4],
-                'vintage': row[5],
-            }
+            product = self._product_row_to_dict(row) if row else {}
+            self._product_cache[product_key] = product
+            return product
         
-        except Exception as e:
+        except SQLAlchemyError as e:
             logger.warning(f"Failed to get product info: {str(e)}")
             return {}
 
+    def prime(
+        self,
+        product_keys: List[str],
+    ) -> None:
+        """Load several products into the cache with one query.
+        
+        Args:
+            product_keys: Product keys to preload
+        """
+        missing = [pk for pk in set(product_keys) if pk not in self._product_cache]
+        if not missing:
+            return
+        
+        try:
+            result = self.db.execute(
+                _SELECT_PRODUCTS,
+                {'keys': missing},
+            )
+            for row in result:
+                self._product_cache[row[0]] = self._product_row_to_dict(row)
+            for pk in missing:
+                self._product_cache.setdefault(pk, {})
+        
+        except SQLAlchemyError as e:
+            logger.warning(f"Failed to preload product info: {str(e)}")
+
     def generate_rebuy_explanation(
         self,
         customer_code: str,
@@ -88,26 +195,40 @@ class ExplanationGenerator:
         Returns:
             Explanation object
         """
-        product = self.get_product_info(product_key)
+        product = self._product_cache.get(product_key)
         components = []
         
         try:
-            # Check last purchase of this product
-            result = self.db.execute(text("""
-                SELECT MAX(order_date), COUNT(*)
-                FROM order_line
-                WHERE customer_code = :customer_code
-                AND product_key = :product_key
-            """), {'customer_code': customer_code, 'product_key': product_key})
+            if product is None:
+                # Product details and purchase history in one round trip
+                result = self.db.execute(
+                    _SELECT_PRODUCT_WITH_PURCHASES,
+                    {'customer_code': customer_code, 'product_key': product_key},
+                )
+                
+                row = result.fetchone()
+                product = self._product_row_to_dict(row) if row else {}
+                self._product_cache[product_key] = product
+                last_date = row[6] if row else None
+            else:
+                # Check last purchase of this product
+                result = self.db.execute(
+                    _SELECT_PURCHASE_HISTORY,
+                    {'customer_code': customer_code, 'product_key': product_key},
+                )
+                
+                last_date = result.scalar()
             
-            last_date, count = result.fetchone()
             if last_date:
                 components.append(f"You previously bought {product.get('product_name', product_key)}")
-                components.append(f"Last purchase was {(pd.Timestamp.now() - pd.Timestamp(last_date)).days} days ago")
+                components.append(f"Last purchase was {(datetime.now().date() - last_date).days} days ago")
         
         except Exception as e:
             logger.debug(f"Failed to get purchase history: {str(e)}")
         
+        if product is None:
+            product = self.get_product_info(product_key)
+        
         if not components:
             components.append("You loved this wine before")
         
@@ -131,28 +252,46 @@ class ExplanationGenerator:
         Returns:
             Explanation object
         """
-        product = self.get_product_info(product_key)
+        product = self._product_cache.get(product_key)
+        fav_family = self._fav_family_cache.get(customer_code, _SENTINEL)
         components = []
         
         try:
-            # Get customer's favorite family
-            result = self.db.execute(text("""
-                SELECT p.family
-                FROM order_line ol
-                JOIN product p ON ol.product_key = p.product_key
-                WHERE ol.customer_code = :customer_code
-                GROUP BY p.family
-                ORDER BY COUNT(*) DESC
-                LIMIT 1
-            """), {'customer_code': customer_code})
+            if product is None and fav_family is _SENTINEL:
+                # Product details and customer's favorite family in one round trip
+                result = self.db.execute(
+                    _SELECT_PRODUCT_WITH_FAV_FAMILY,
+                    {'customer_code': customer_code, 'product_key': product_key},
+                )
+                
+                row = result.fetchone()
+                product = self._product_row_to_dict(row) if row else {}
+                self._product_cache[product_key] = product
+                if row:
+                    fav_family = row[6]
+                    self._fav_family_cache[customer_code] = fav_family
+                else:
+                    fav_family = None
+            else:
+                if product is None:
+                    product = self.get_product_info(product_key)
+                if fav_family is _SENTINEL:
+                    # Get customer's favorite family
+                    result = self.db.execute(_SELECT_FAV_FAMILY, {'customer_code': customer_code})
+                    
+                    row = result.fetchone()
+                    fav_family = row[0] if row else None
+                    self._fav_family_cache[customer_code] = fav_family
             
-            fav_family = result.fetchone()
             if fav_family:
-                components.append(f"Expand from {fav_family[0]} to explore {product.get('family', 'new varieties')}")
+                components.append(f"Expand from {fav_family} to explore {product.get('family', 'new varieties')}")
         
         except Exception as e:
             logger.debug(f"Failed to get customer families: {str(e)}")
         
+        if product is None:
+            product = self.get_product_info(product_key)
+        
         if not components:
             components.append(f"Discover {product.get('family', 'a new style')}")
         
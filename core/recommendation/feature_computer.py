@@ -1,24 +1,115 @@
 """Compute features for recommendation scoring."""
 
 import logging
-from typing import Dict, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
 
+# Aggregate row for a customer without any order_line
+_EMPTY_RFM_ROW = (0, None, None, None, None)
+
+# RFM score thresholds, looked up with bisect instead of if/elif ladders
+_RECENCY_DAYS = (30, 90, 180, 365)  # Upper bounds for scores 5..2, else 1
+_FREQUENCY_COUNTS = (1, 2, 5, 10)  # Lower bounds for scores 2..5
+_FREQUENCY_SCORES = (0, 2, 3, 4, 5)
+_MONETARY_AMOUNTS = (100, 500, 2000, 5000)  # Lower bounds for scores 2..5
+
+
+# SQL statements are built once at import and reused on every call
+_SELECT_SNAPSHOT_FEATURES = text("""
+    SELECT
+        purchase_count, total_spent, avg_order_value,
+        last_purchase_date, first_purchase_date
+    FROM customer_features_daily
+    WHERE customer_code = :customer_code
+    AND computed_date = CURRENT_DATE
+""")
+
+_SELECT_RFM = text("""
+    SELECT
+        COUNT(*) as purchase_count,
+        SUM(amount_ht) as total_spent,
+        AVG(amount_ht) as avg_order_value,
+        MAX(order_date) as last_purchase_date,
+        MIN(order_date) as first_purchase_date
+    FROM order_line
+    WHERE customer_code = :customer_code
+""")
+
+_SELECT_SNAPSHOT_FEATURES_BATCH = text("""
+    SELECT
+        customer_code, purchase_count, total_spent, avg_order_value,
+        last_purchase_date, first_purchase_date
+    FROM customer_features_daily
+    WHERE customer_code IN :customer_codes
+    AND computed_date = CURRENT_DATE
+""").bindparams(bindparam('customer_codes', expanding=True))
+
+_SELECT_RFM_BATCH = text("""
+    SELECT
+        customer_code,
+        COUNT(*) as purchase_count,
+        SUM(amount_ht) as total_spent,
+        AVG(amount_ht) as avg_order_value,
+        MAX(order_date) as last_purchase_date,
+        MIN(order_date) as first_purchase_date
+    FROM order_line
+    WHERE customer_code IN :customer_codes
+    GROUP BY customer_code
+""").bindparams(bindparam('customer_codes', expanding=True))
+
+_SELECT_FAMILY_AFFINITY = text("""
+    SELECT 
+        p.family,
+        COUNT(*) as purchase_count,
+        SUM(ol.amount_ht) as total_spent
+    FROM order_line ol
+    JOIN product p ON ol.product_key = p.product_key
+    WHERE ol.customer_code = :customer_code
+    GROUP BY p.family
+    ORDER BY total_spent DESC
+""")
+
+_SELECT_AVG_ORDER_VALUE = text("""
+    SELECT AVG(amount_ht)
+    FROM order_line
+    WHERE customer_code = :customer_code
+""")
+
+_SELECT_LAST_CONTACT = text("""
+    SELECT contact_date
+    FROM contact_event
+    WHERE customer_code = :customer_code
+    ORDER BY contact_date DESC
+    LIMIT 1
+""")
+
+_SELECT_LAST_CONTACT_BATCH = text("""
+    SELECT customer_code, MAX(contact_date)
+    FROM contact_event
+    WHERE customer_code IN :customer_codes
+    GROUP BY customer_code
+""").bindparams(bindparam('customer_codes', expanding=True))
+
 
 class FeatureComputer:
     """Compute features for recommendations."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, use_daily_snapshot: bool = False):
         """Initialize with database session.
         
         Args:
             db: SQLAlchemy session
+            use_daily_snapshot: Read today's customer_features_daily rows
+                before falling back to live aggregation over order_line
         """
         self.db = db
+        self.use_daily_snapshot = use_daily_snapshot
 
     def compute_customer_features(
         self,
@@ -49,74 +140,150 @@ class FeatureComputer:
         }
         
         try:
-            # Fetch RFM data
-            result = self.db.execute(text("""
-                SELECT
-                    COUNT(*) as purchase_count,
-                    SUM(amount_ht) as total_spent,
-                    AVG(amount_ht) as avg_order_value,
-                    MAX(order_date) as last_purchase_date,
-                    MIN(order_date) as first_purchase_date
-                FROM order_line
-                WHERE customer_code = :customer_code
-            """), {'customer_code': customer_code})
+            row = None
+            if self.use_daily_snapshot:
+                result = self.db.execute(_SELECT_SNAPSHOT_FEATURES, {'customer_code': customer_code})
+                row = result.fetchone()
+            
+            if row is None:
+                # Fetch RFM data
+                result = self.db.execute(_SELECT_RFM, {'customer_code': customer_code})
+                row = result.fetchone()
             
-            row = result.fetchone()
             if row:
-                features['purchase_count'] = row[0] or 0
-                features['total_spent'] = float(row[1]) if row[1] else 0.0
-                features['avg_order_value'] = float(row[2]) if row[2] else 0.0
-                features['last_purchase_date'] = row[3].isoformat() if row[3] else None
-                features['first_purchase_date'] = row[4].isoformat() if row[4] else None
-                
-                # Calculate days since last purchase
-                if row[3]:
-                    days_since = (datetime.now().date() - row[3]).days
-                    features['days_since_purchase'] = max(0, days_since)
-                    
-                    # Recency score: lower is better
-                    if days_since <= 30:
-                        features['recency_score'] = 5
-                    elif days_since <= 90:
-                        features['recency_score'] = 4
-                    elif days_since <= 180:
-                        features['recency_score'] = 3
-                    elif days_since <= 365:
-                        features['recency_score'] = 2
-                    else:
-                        features['recency_score'] = 1
-                else:
-                    features['recency_score'] = 0
-                
-                # Frequency score
-                if features['purchase_count'] >= 10:
-                    features['frequency_score'] = 5
-                elif features['purchase_count'] >= 5:
-                    features['frequency_score'] = 4
-                elif features['purchase_count'] >= 2:
-                    features['frequency_score'] = 3
-                elif features['purchase_count'] == 1:
-                    features['frequency_score'] = 2
-                else:
-                    features['frequency_score'] = 0
-                
-                # Monetary score
-                if features['total_spent'] >= 5000:
-                    features['monetary_score'] = 5
-                elif features['total_spent'] >= 2000:
-                    features['monetary_score'] = 4
-                elif features['total_spent'] >= 500:
-                    features['monetary_score'] = 3
-                elif features['total_spent'] >= 100:
-                    features['monetary_score'] = 2
-                else:
-                    features['monetary_score'] = 1 if features['total_spent'] > 0 else 0
+                self._apply_rfm_row(features, row)
         
         except Exception as e:
             logger.warning(f"Failed to compute RFM features for {customer_code}: {str(e)}")
         
         return features
 
+    @staticmethod
+    def _apply_rfm_row(features: Dict, row) -> None:
+        """Fill RFM features from an aggregate order_line row.
+        
+        Args:
+            features: Feature dict to update in place
+            row: (purchase_count, total_spent, avg_order_value,
+                  last_purchase_date, first_purchase_date)
+        """
+        features['purchase_count'] = row[0] or 0
+        features['total_spent'] = float(row[1]) if row[1] else 0.0
+        features['avg_order_value'] = float(row[2]) if row[2] else 0.0
+        features['last_purchase_date'] = row[3].isoformat() if row[3] else None
+        features['first_purchase_date'] = row[4].isoformat() if row[4] else None
+        
+        # Calculate days since last purchase
+        if row[3]:
+            days_since = (datetime.now().date() - row[3]).days
+            features['days_since_purchase'] = max(0, days_since)
+            
+            # Recency score: lower is better
+            features['recency_score'] = 5 - bisect_left(_RECENCY_DAYS, days_since)
+        else:
+            features['recency_score'] = 0
+        
+        # Frequency score
+        features['frequency_score'] = _FREQUENCY_SCORES[
+            bisect_right(_FREQUENCY_COUNTS, features['purchase_count'])
+        ]
+        
+        # Monetary score
+        total_spent = features['total_spent']
+        features['monetary_score'] = (
+            bisect_right(_MONETARY_AMOUNTS, total_spent) + 1 if total_spent > 0 else 0
+        )
+
+    def compute_customer_features_batch(
+        self,
+        customer_codes: List[str],
+    ) -> Dict[str, Dict]:
+        """Compute RFM features for many customers with one grouped query.
+        
+        Args:
+            customer_codes: Customer codes
+            
+        Returns:
+            Dict of {customer_code: features}, same shape as
+            compute_customer_features
+        """
+        computed_at = datetime.utcnow().isoformat()
+        all_features = {
+            code: {'customer_code': code, 'computed_at': computed_at}
+            for code in customer_codes
+        }
+        if not customer_codes:
+            return all_features
+        
+        try:
+            rows = {}
+            if self.use_daily_snapshot:
+                result = self.db.execute(
+                    _SELECT_SNAPSHOT_FEATURES_BATCH,
+                    {'customer_codes': list(customer_codes)},
+                )
+                rows = {row[0]: row[1:] for row in result}
+            
+            missing = [code for code in customer_codes if code not in rows]
+            if missing:
+                rows.update(self._aggregate_rfm_rows(missing))
+            
+            # Customers without orders get the same zeroed scores as the
+            # single-customer aggregate would return
+            for code, features in all_features.items():
+                self._apply_rfm_row(features, rows.get(code, _EMPTY_RFM_ROW))
+        
+        except Exception as e:
+            logger.warning(f"Failed to compute batch RFM features: {str(e)}")
+        
+        return all_features
+
+    def _aggregate_rfm_rows(
+        self,
+        customer_codes: List[str],
+    ) -> Dict[str, Tuple]:
+        """Aggregate order_line RFM rows for several customers.
+        
+        Args:
+            customer_codes: Customer codes
+            
+        Returns:
+            Dict of {customer_code: aggregate row}, only for customers with orders
+        """
+        result = self.db.execute(
+            _SELECT_RFM_BATCH,
+            {'customer_codes': list(customer_codes)},
+        )
+        return {row[0]: row[1:] for row in result}
+
+    def refresh_daily_snapshot(self) -> int:
+        """Rebuild customer_features_daily from order_line (nightly job).
+        
+        Returns:
+            Number of customers snapshotted
+        """
+        self.db.execute(text("DELETE FROM customer_features_daily"))
+        result = self.db.execute(text("""
+            INSERT INTO customer_features_daily
+            (customer_code, purchase_count, total_spent, avg_order_value,
+             last_purchase_date, first_purchase_date, computed_date)
+            SELECT
+                c.customer_code,
+                COUNT(ol.customer_code),
+                SUM(ol.amount_ht),
+                AVG(ol.amount_ht),
+                MAX(ol.order_date),
+                MIN(ol.order_date),
+                CURRENT_DATE
+            FROM customer c
+            LEFT JOIN order_line ol ON ol.customer_code = c.customer_code
+            GROUP BY c.customer_code
+        """))
+        self.db.commit()
+        
+        logger.info(f"Refreshed daily features for {result.rowcount} customers")
+        return result.rowcount
+
     def compute_product_affinity(
         self,
         customer_code: str,
@@ -132,17 +299,7 @@ class FeatureComputer:
             Dict of {family: affinity_score (0-1)}
         """
         try:
-            result = self.db.execute(text("""
-                SELECT 
-                    p.family,
-                    COUNT(*) as purchase_count,
-                    SUM(ol.amount_ht) as total_spent
-                FROM order_line ol
-                JOIN product p ON ol.product_key = p.product_key
-                WHERE ol.customer_code = :customer_code
-                GROUP BY p.family
-                ORDER BY total_spent DESC
-            """), {'customer_code': customer_code})
+            result = self.db.execute(_SELECT_FAMILY_AFFINITY, {'customer_code': customer_code})
             
             rows = result.fetchall()
             if not rows:
@@ -176,11 +333,7 @@ class FeatureComputer:
             Budget level: BUDGET, STANDARD, PREMIUM, LUXURY
         """
         try:
-            result = self.db.execute(text("""
-                SELECT AVG(amount_ht)
-                FROM order_line
-                WHERE customer_code = :customer_code
-            """), {'customer_code': customer_code})
+            result = self.db.execute(_SELECT_AVG_ORDER_VALUE, {'customer_code': customer_code})
             
             row = result.fetchone()
             if not row or not row[0]:
@@ -197,7 +350,7 @@ class FeatureComputer:
             else:
                 return 'BUDGET'
         
-        except Exception as e:
+        except SQLAlchemyError as e:
             logger.warning(f"Failed to determine budget level for {customer_code}: {str(e)}")
             return 'STANDARD'
 
@@ -216,11 +369,8 @@ class FeatureComputer:
             True if in silence window, False otherwise
         """
         try:
-            result = self.db.execute(text("""
-                SELECT MAX(contact_date)
-                FROM contact_event
-                WHERE customer_code = :customer_code
-            """), {'customer_code': customer_code})
+            # Served by ix_contact_customer_date (customer_code, contact_date)
+            result = self.db.execute(_SELECT_LAST_CONTACT, {'customer_code': customer_code})
             
             row = result.fetchone()
             if not row or not row[0]:
@@ -234,3 +384,36 @@ class FeatureComputer:
         except Exception as e:
             logger.warning(f"Failed to check silence window for {customer_code}: {str(e)}")
             return False
+
+    def get_silence_window_batch(
+        self,
+        customer_codes: List[str],
+        days: int = 30,
+    ) -> Set[str]:
+        """Find which customers are in their contact silence window.
+        
+        Args:
+            customer_codes: Customer codes
+            days: Silence window in days
+            
+        Returns:
+            Set of customer codes in silence window
+        """
+        if not customer_codes:
+            return set()
+        
+        try:
+            result = self.db.execute(
+                _SELECT_LAST_CONTACT_BATCH,
+                {'customer_codes': list(customer_codes)},
+            )
+            
+            today = datetime.now().date()
+            return {
+                code for code, last_contact in result
+                if last_contact and (today - last_contact).days < days
+            }
+        
+        except Exception as e:
+            logger.warning(f"Failed to check batch silence window: {str(e)}")
+            return set()
@@ -1,11 +1,12 @@
 """Match customers to recommendation scenarios."""
 
 import logging
-from typing import List, Optional, Dict
+import random
+from typing import List, Optional, Dict, FrozenSet, Tuple
 from enum import Enum
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
 logger = logging.getLogger(__name__)
 
@@ -19,22 +20,304 @@ class RecoScenario(str, Enum):
     NURTURE = "NURTURE"  # Build relationship
 
 
+# Per-customer stats aggregated from order_line (one row)
+_LIVE_CUSTOMER_STATS = """
+        SELECT
+            COUNT(*) AS order_count,
+            SUM(amount_ht) AS total_spent,
+            MAX(order_date) AS last_purchase
+        FROM order_line
+        WHERE customer_code = :customer_code
+"""
+
+# customer_stats from today's customer_features_daily row (primary-key
+# lookup), aggregating order_line only when it is missing. The fallback is
+# grouped so it yields no row at all when the snapshot exists: the CTE holds
+# at most one row.
+_SNAPSHOT_CUSTOMER_STATS = """
+        SELECT
+            purchase_count AS order_count,
+            total_spent,
+            last_purchase_date AS last_purchase
+        FROM customer_features_daily
+        WHERE customer_code = :customer_code
+        AND computed_date = CURRENT_DATE
+        UNION ALL
+        SELECT
+            COUNT(*) AS order_count,
+            SUM(amount_ht) AS total_spent,
+            MAX(order_date) AS last_purchase
+        FROM order_line
+        WHERE customer_code = :customer_code
+        AND NOT EXISTS (
+            SELECT 1 FROM customer_features_daily
+            WHERE customer_code = :customer_code
+            AND computed_date = CURRENT_DATE
+        )
+        GROUP BY customer_code
+"""
+
+# Everything after the customer_stats CTE. Each scenario's candidates come
+# back as an array, NULL when the customer does not qualify for it.
+_MATCH_SCENARIOS_TAIL = """
+    customer_families AS (
+        SELECT p.family
+        FROM order_line ol
+        JOIN product p ON ol.product_key = p.product_key
+        WHERE ol.customer_code = :customer_code
+        GROUP BY p.family
+        ORDER BY COUNT(*) DESC, p.family
+        LIMIT 2
+    )
+    SELECT
+        ARRAY(
+            SELECT ol.product_key
+            FROM order_line ol
+            JOIN product p ON ol.product_key = p.product_key
+            WHERE ol.customer_code = :customer_code
+            AND ol.order_date <= CURRENT_DATE - :rebuy_days
+            AND p.popularity_score >= 0.5
+            GROUP BY ol.product_key
+            ORDER BY MAX(ol.order_date) DESC
+            LIMIT 3
+        ) AS rebuy,
+        CASE WHEN EXISTS (SELECT 1 FROM customer_families) THEN ARRAY(
+            SELECT p.product_key
+            FROM product p
+            WHERE p.family NOT IN (SELECT family FROM customer_families)
+            AND p.popularity_score >= 0.4
+            ORDER BY p.popularity_score DESC
+            LIMIT 3
+        ) END AS cross_sell,
+        CASE WHEN s.total_spent >= :upsell_spent_threshold THEN ARRAY(
+            SELECT p.product_key
+            FROM product p
+            WHERE p.is_premium = TRUE
+            AND p.popularity_score >= 0.6
+            ORDER BY p.popularity_score DESC
+            LIMIT 3
+        ) END AS upsell,
+        CASE WHEN s.last_purchase <= CURRENT_DATE - :winback_days THEN ARRAY(
+            SELECT p.product_key
+            FROM product p
+            WHERE p.popularity_score >= 0.7
+            ORDER BY p.popularity_score DESC
+            LIMIT 3
+        ) END AS winback,
+        s.order_count BETWEEN 1 AND 3 AS nurture
+    FROM customer_stats s
+"""
+
+# All five scenarios in one round trip (PostgreSQL): per-customer stats are
+# computed once, from order_line or from today's snapshot row
+_MATCH_SCENARIOS = text(
+    "WITH customer_stats AS (" + _LIVE_CUSTOMER_STATS + "), "
+    + _MATCH_SCENARIOS_TAIL
+)
+_MATCH_SCENARIOS_SNAPSHOT = text(
+    "WITH customer_stats AS (" + _SNAPSHOT_CUSTOMER_STATS + "), "
+    + _MATCH_SCENARIOS_TAIL
+)
+
+# Per-customer stats shared by UPSELL, WINBACK and NURTURE
+_SELECT_CUSTOMER_STATS = text("""
+    SELECT
+        COUNT(*) AS order_count,
+        SUM(amount_ht) AS total_spent,
+        MAX(order_date) AS last_purchase
+    FROM order_line
+    WHERE customer_code = :customer_code
+""")
+
+_SELECT_CUSTOMER_STATS_SNAPSHOT = text("""
+    SELECT purchase_count, total_spent, last_purchase_date
+    FROM customer_features_daily
+    WHERE customer_code = :customer_code
+    AND computed_date = CURRENT_DATE
+""")
+
+# Column order of the _MATCH_SCENARIOS arrays; the trailing nurture column is
+# a flag, products are sampled from the cached NURTURE pool
+_FUSED_SCENARIOS = (
+    RecoScenario.REBUY,
+    RecoScenario.CROSS_SELL,
+    RecoScenario.UPSELL,
+    RecoScenario.WINBACK,
+)
+
+
+# Batch matching: one grouped statement per scenario for a whole chunk of
+# customers. Date thresholds are bound as cutoff dates so the statements
+# stay portable.
+_BATCH_CUSTOMER_STATS = text("""
+    SELECT
+        customer_code,
+        COUNT(*) AS order_count,
+        SUM(amount_ht) AS total_spent,
+        MAX(order_date) <= :winback_cutoff AS inactive
+    FROM order_line
+    WHERE customer_code IN :customer_codes
+    GROUP BY customer_code
+""").bindparams(bindparam('customer_codes', expanding=True))
+
+_BATCH_CUSTOMER_STATS_SNAPSHOT = text("""
+    SELECT
+        customer_code,
+        purchase_count AS order_count,
+        total_spent,
+        last_purchase_date <= :winback_cutoff AS inactive
+    FROM customer_features_daily
+    WHERE customer_code IN :customer_codes
+    AND computed_date = CURRENT_DATE
+    UNION ALL
+    SELECT
+        ol.customer_code,
+        COUNT(*) AS order_count,
+        SUM(ol.amount_ht) AS total_spent,
+        MAX(ol.order_date) <= :winback_cutoff AS inactive
+    FROM order_line ol
+    WHERE ol.customer_code IN :customer_codes
+    AND NOT EXISTS (
+        SELECT 1 FROM customer_features_daily f
+        WHERE f.customer_code = ol.customer_code
+        AND f.computed_date = CURRENT_DATE
+    )
+    GROUP BY ol.customer_code
+""").bindparams(bindparam('customer_codes', expanding=True))
+
+_BATCH_REBUY = text("""
+    SELECT customer_code, product_key
+    FROM (
+        SELECT
+            ol.customer_code,
+            ol.product_key,
+            ROW_NUMBER() OVER (
+                PARTITION BY ol.customer_code
+                ORDER BY MAX(ol.order_date) DESC
+            ) AS rn
+        FROM order_line ol
+        JOIN product p ON ol.product_key = p.product_key
+        WHERE ol.customer_code IN :customer_codes
+        AND ol.order_date <= :rebuy_cutoff
+        AND p.popularity_score >= 0.5
+        GROUP BY ol.customer_code, ol.product_key
+    ) ranked
+    WHERE rn <= 3
+    ORDER BY customer_code, rn
+""").bindparams(bindparam('customer_codes', expanding=True))
+
+_BATCH_CUSTOMER_FAMILIES = text("""
+    SELECT ol.customer_code, p.family
+    FROM order_line ol
+    JOIN product p ON ol.product_key = p.product_key
+    WHERE ol.customer_code IN :customer_codes
+    GROUP BY ol.customer_code, p.family
+    ORDER BY ol.customer_code, COUNT(*) DESC, p.family
+""").bindparams(bindparam('customer_codes', expanding=True))
+
+# A customer's two most purchased families, ties broken by name
+_SELECT_TOP_FAMILIES = text("""
+    SELECT p.family
+    FROM order_line ol
+    JOIN product p ON ol.product_key = p.product_key
+    WHERE ol.customer_code = :customer_code
+    GROUP BY p.family
+    ORDER BY COUNT(*) DESC, p.family
+    LIMIT 2
+""")
+
+_CROSS_SELL_PRODUCTS = text("""
+    SELECT p.product_key
+    FROM product p
+    WHERE p.family NOT IN :families
+    AND p.product_key NOT IN :exclude
+    AND p.popularity_score >= 0.4
+    ORDER BY p.popularity_score DESC
+    LIMIT 3
+""").bindparams(
+    bindparam('families', expanding=True),
+    bindparam('exclude', expanding=True),
+)
+
+_UPSELL_PRODUCTS = text("""
+    SELECT p.product_key
+    FROM product p
+    WHERE p.is_premium = TRUE
+    AND p.popularity_score >= 0.6
+    ORDER BY p.popularity_score DESC
+    LIMIT 3
+""")
+
+_WINBACK_PRODUCTS = text("""
+    SELECT p.product_key
+    FROM product p
+    WHERE p.popularity_score >= 0.7
+    ORDER BY p.popularity_score DESC
+    LIMIT 3
+""")
+
+_NURTURE_POOL = text("""
+    SELECT p.product_key
+    FROM product p
+    WHERE p.popularity_score >= 0.3
+    AND p.family IS NOT NULL
+""")
+
+
 class ScenarioMatcher:
     """Match customers to recommendation scenarios."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, use_daily_snapshot: bool = False):
         """Initialize with database session.
         
         Args:
             db: SQLAlchemy session
+            use_daily_snapshot: Read per-customer order stats from today's
+                customer_features_daily rows before aggregating order_line
         """
         self.db = db
+        self.use_daily_snapshot = use_daily_snapshot
         self.config = {
             'rebuy_days': 90,  # Rebuy if purchased 90+ days ago
             'winback_days': 365,  # Winback if inactive 1+ year
             'cross_sell_spent_threshold': 100,  # Suggest cross-sell if spent $100+
             'upsell_spent_threshold': 500,  # Suggest upsell if spent $500+
         }
+        self._nurture_pool: Optional[List[str]] = None
+
+    def _sample_nurture_products(self) -> List[str]:
+        """Pick up to 3 random NURTURE products.
+        
+        The eligible products are loaded once per matcher and sampled in
+        Python instead of sorting the product table with ORDER BY RANDOM()
+        on every call.
+        
+        Returns:
+            List of product_keys
+        """
+        if self._nurture_pool is None:
+            self._nurture_pool = [row[0] for row in self.db.execute(_NURTURE_POOL)]
+        return random.sample(self._nurture_pool, min(3, len(self._nurture_pool)))
+
+    def _customer_stats(self, customer_code: str) -> Tuple:
+        """Fetch order count, total spent and last purchase date.
+        
+        Args:
+            customer_code: Customer code
+            
+        Returns:
+            (order_count, total_spent, last_purchase)
+        """
+        if self.use_daily_snapshot:
+            row = self.db.execute(
+                _SELECT_CUSTOMER_STATS_SNAPSHOT, {'customer_code': customer_code}
+            ).fetchone()
+            if row is not None:
+                return tuple(row)
+        
+        return tuple(self.db.execute(
+            _SELECT_CUSTOMER_STATS, {'customer_code': customer_code}
+        ).fetchone())
 
     def match_rebuy(
         self,
@@ -54,16 +337,23 @@ class ScenarioMatcher:
             List of product_keys to recommend, or None
         """
         try:
+            # One row per product ordered by its latest purchase; DISTINCT
+            # with ORDER BY on a non-selected column is rejected by PostgreSQL.
+            # Served by ix_orderline_customer_date (customer_code, order_date)
             result = self.db.execute(text("""
-                SELECT DISTINCT p.product_key
+                SELECT ol.product_key
                 FROM order_line ol
                 JOIN product p ON ol.product_key = p.product_key
                 WHERE ol.customer_code = :customer_code
-                AND ol.order_date <= CURRENT_DATE - INTERVAL '90 days'
+                AND ol.order_date <= :cutoff
                 AND p.popularity_score >= 0.5
-                ORDER BY ol.order_date DESC
+                GROUP BY ol.product_key
+                ORDER BY MAX(ol.order_date) DESC
                 LIMIT 3
-            """), {'customer_code': customer_code})
+            """), {
+                'customer_code': customer_code,
+                'cutoff': datetime.now().date() - timedelta(days=self.config['rebuy_days']),
+            })
             
             products = [row[0] for row in result]
             return products if products else None
@@ -93,37 +383,17 @@ class ScenarioMatcher:
         """
         try:
             # Get customer's top families
-            result = self.db.execute(text("""
-                SELECT DISTINCT p.family
-                FROM order_line ol
-                JOIN product p ON ol.product_key = p.product_key
-                WHERE ol.customer_code = :customer_code
-                LIMIT 2
-            """), {'customer_code': customer_code})
+            result = self.db.execute(_SELECT_TOP_FAMILIES, {'customer_code': customer_code})
             
             customer_families = [row[0] for row in result]
             if not customer_families:
                 return None
             
             # Find products from different families
-            query = """
-                SELECT DISTINCT p.product_key
-                FROM product p
-                WHERE p.family NOT IN ({families})
-                AND p.popularity_score >= 0.4
-                {exclude_clause}
-                ORDER BY p.popularity_score DESC
-                LIMIT 3
-            """
-            
-            families_str = ','.join([f"'{f}'" for f in customer_families])
-            exclude_clause = ""
-            if exclude_products:
-                exclude_str = ','.join([f"'{p}'" for p in exclude_products])
-                exclude_clause = f"AND p.product_key NOT IN ({exclude_str})"
-            
-            query = query.format(families=families_str, exclude_clause=exclude_clause)
-            result = self.db.execute(text(query))
+            result = self.db.execute(_CROSS_SELL_PRODUCTS, {
+                'families': customer_families,
+                'exclude': list(exclude_products or []),
+            })
             
             products = [row[0] for row in result]
             return products if products else None
@@ -151,25 +421,12 @@ class ScenarioMatcher:
         """
         try:
             # Check if customer meets spending threshold
-            result = self.db.execute(text("""
-                SELECT SUM(amount_ht)
-                FROM order_line
-                WHERE customer_code = :customer_code
-            """), {'customer_code': customer_code})
-            
-            total_spent = result.fetchone()[0]
+            _, total_spent, _ = self._customer_stats(customer_code)
             if not total_spent or total_spent < self.config['upsell_spent_threshold']:
                 return None
             
             # Find premium products
-            result = self.db.execute(text("""
-                SELECT p.product_key
-                FROM product p
-                WHERE p.is_premium = TRUE
-                AND p.popularity_score >= 0.6
-                ORDER BY p.popularity_score DESC
-                LIMIT 3
-            """))
+            result = self.db.execute(_UPSELL_PRODUCTS)
             
             products = [row[0] for row in result]
             return products if products else None
@@ -197,13 +454,7 @@ class ScenarioMatcher:
         """
         try:
             # Check if customer is inactive
-            result = self.db.execute(text("""
-                SELECT MAX(order_date)
-                FROM order_line
-                WHERE customer_code = :customer_code
-            """), {'customer_code': customer_code})
-            
-            last_purchase = result.fetchone()[0]
+            _, _, last_purchase = self._customer_stats(customer_code)
             if not last_purchase:
                 return None
             
@@ -212,13 +463,7 @@ class ScenarioMatcher:
                 return None
             
             # Find globally popular products
-            result = self.db.execute(text("""
-                SELECT p.product_key
-                FROM product p
-                WHERE p.popularity_score >= 0.7
-                ORDER BY p.popularity_score DESC
-                LIMIT 3
-            """))
+            result = self.db.execute(_WINBACK_PRODUCTS)
             
             products = [row[0] for row in result]
             return products if products else None
@@ -245,27 +490,12 @@ class ScenarioMatcher:
             List of product_keys to recommend, or None
         """
         try:
-            result = self.db.execute(text("""
-                SELECT COUNT(*), SUM(amount_ht)
-                FROM order_line
-                WHERE customer_code = :customer_code
-            """), {'customer_code': customer_code})
-            
-            count, total_spent = result.fetchone()
+            count, _, _ = self._customer_stats(customer_code)
             if not count or count > 3:  # Too established
                 return None
             
             # Find products with diverse profiles
-            result = self.db.execute(text("""
-                SELECT p.product_key
-                FROM product p
-                WHERE p.popularity_score >= 0.3
-                AND p.family IS NOT NULL
-                ORDER BY RANDOM()
-                LIMIT 3
-            """))
-            
-            products = [row[0] for row in result]
+            products = self._sample_nurture_products()
             return products if products else None
         
         except Exception as e:
@@ -284,6 +514,9 @@ class ScenarioMatcher:
         Returns:
             Dict of {scenario: products}
         """
+        if self.db.get_bind().dialect.name == 'postgresql':
+            return self._match_scenarios_fused(customer_code)
+        
         results = {
             RecoScenario.REBUY: self.match_rebuy(customer_code),
             RecoScenario.CROSS_SELL: self.match_cross_sell(customer_code),
@@ -294,3 +527,152 @@ class ScenarioMatcher:
         
         # Remove empty results
         return {k: v for k, v in results.items() if v}
+
+    def _match_scenarios_fused(
+        self,
+        customer_code: str,
+    ) -> Dict[RecoScenario, Optional[List[str]]]:
+        """Match all scenarios with a single query (PostgreSQL only).
+        
+        Same criteria as the match_* methods.
+        
+        Args:
+            customer_code: Customer code
+            
+        Returns:
+            Dict of {scenario: products}, without empty results
+        """
+        try:
+            statement = (
+                _MATCH_SCENARIOS_SNAPSHOT if self.use_daily_snapshot else _MATCH_SCENARIOS
+            )
+            row = self.db.execute(statement, {
+                'customer_code': customer_code,
+                'rebuy_days': self.config['rebuy_days'],
+                'upsell_spent_threshold': self.config['upsell_spent_threshold'],
+                'winback_days': self.config['winback_days'],
+            }).fetchone()
+        
+        except Exception as e:
+            logger.warning(f"Failed to match scenarios for {customer_code}: {str(e)}")
+            return {}
+        
+        if row is None:  # Snapshot statement: no snapshot row and no orders
+            return {}
+        
+        matches = {
+            scenario: list(products)
+            for scenario, products in zip(_FUSED_SCENARIOS, row)
+            if products
+        }
+        if row[len(_FUSED_SCENARIOS)]:
+            nurture = self._sample_nurture_products()
+            if nurture:
+                matches[RecoScenario.NURTURE] = nurture
+        return matches
+
+    def match_scenarios_batch(
+        self,
+        customer_codes: List[str],
+    ) -> Dict[str, Dict[RecoScenario, List[str]]]:
+        """Match many customers to scenarios with grouped queries.
+        
+        Same criteria as match_scenarios, but each scenario costs one query
+        for the whole batch. Candidate lists that do not depend on the
+        customer (UPSELL, WINBACK, NURTURE pool) are fetched once, and
+        CROSS_SELL runs once per distinct set of customer families.
+        
+        Args:
+            customer_codes: Customer codes
+            
+        Returns:
+            Dict of {customer_code: {scenario: products}}, without empty
+            results
+        """
+        matches: Dict[str, Dict[RecoScenario, List[str]]] = {
+            code: {} for code in customer_codes
+        }
+        if not customer_codes:
+            return matches
+        
+        today = datetime.now().date()
+        codes = list(customer_codes)
+        
+        stats_statement = (
+            _BATCH_CUSTOMER_STATS_SNAPSHOT if self.use_daily_snapshot else _BATCH_CUSTOMER_STATS
+        )
+        
+        try:
+            # Savepoint: a failed batch query must not leave the transaction
+            # aborted for the per-customer fallback below (PostgreSQL)
+            with self.db.begin_nested():
+                stats = {
+                    row[0]: row[1:]
+                    for row in self.db.execute(stats_statement, {
+                        'customer_codes': codes,
+                        'winback_cutoff': today - timedelta(days=self.config['winback_days']),
+                    })
+                }
+            
+                # REBUY
+                result = self.db.execute(_BATCH_REBUY, {
+                    'customer_codes': codes,
+                    'rebuy_cutoff': today - timedelta(days=self.config['rebuy_days']),
+                })
+                for customer_code, product_key in result:
+                    matches[customer_code].setdefault(RecoScenario.REBUY, []).append(product_key)
+            
+                # CROSS_SELL: two most purchased families per customer, as in match_cross_sell
+                customer_families: Dict[str, List[str]] = {}
+                for customer_code, family in self.db.execute(
+                    _BATCH_CUSTOMER_FAMILIES, {'customer_codes': codes}
+                ):
+                    families = customer_families.setdefault(customer_code, [])
+                    if len(families) < 2:
+                        families.append(family)
+            
+                cross_sell_by_families: Dict[FrozenSet, List[str]] = {}
+                for customer_code, families in customer_families.items():
+                    key = frozenset(families)
+                    if key not in cross_sell_by_families:
+                        result = self.db.execute(_CROSS_SELL_PRODUCTS, {
+                            'families': families,
+                            'exclude': [],
+                        })
+                        cross_sell_by_families[key] = [row[0] for row in result]
+                    if cross_sell_by_families[key]:
+                        matches[customer_code][RecoScenario.CROSS_SELL] = list(cross_sell_by_families[key])
+            
+                # UPSELL, WINBACK, NURTURE: customer-independent candidates
+                upsell: Optional[List[str]] = None
+                winback: Optional[List[str]] = None
+            
+                for customer_code, (order_count, total_spent, inactive) in stats.items():
+                    customer_matches = matches[customer_code]
+                
+                    if total_spent and total_spent >= self.config['upsell_spent_threshold']:
+                        if upsell is None:
+                            upsell = [row[0] for row in self.db.execute(_UPSELL_PRODUCTS)]
+                        if upsell:
+                            customer_matches[RecoScenario.UPSELL] = list(upsell)
+                
+                    if inactive:
+                        if winback is None:
+                            winback = [row[0] for row in self.db.execute(_WINBACK_PRODUCTS)]
+                        if winback:
+                            customer_matches[RecoScenario.WINBACK] = list(winback)
+                
+                    if order_count and order_count <= 3:
+                        nurture = self._sample_nurture_products()
+                        if nurture:
+                            customer_matches[RecoScenario.NURTURE] = nurture
+        
+        except Exception as e:
+            logger.warning(f"Failed to batch match scenarios: {str(e)}")
+            return {code: self.match_scenarios(code) for code in customer_codes}
+        
+        # Same scenario order as match_scenarios
+        return {
+            code: {scenario: found[scenario] for scenario in RecoScenario if scenario in found}
+            for code, found in matches.items()
+        }
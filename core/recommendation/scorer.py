@@ -1,16 +1,58 @@
 """Score and rank recommendations."""
 
+import heapq
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import Iterable, List, Dict, Tuple, Optional
 from dataclasses import dataclass
+from types import MappingProxyType
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 import math
 
 logger = logging.getLogger(__name__)
 
+_SELECT_PREFERRED_FAMILY = text("""
+    SELECT p.family
+    FROM order_line ol
+    JOIN product p ON ol.product_key = p.product_key
+    WHERE ol.customer_code = :customer_code
+    GROUP BY p.family
+    ORDER BY COUNT(*) DESC
+    LIMIT 1
+""")
 
-@dataclass
+_SELECT_PRODUCT_ROW = text("""
+    SELECT family, popularity_score
+    FROM product
+    WHERE product_key = :product_key
+""")
+
+_SELECT_PRODUCT_ROWS = text("""
+    SELECT product_key, family, popularity_score
+    FROM product
+    WHERE product_key IN :keys
+""").bindparams(bindparam('keys', expanding=True))
+
+# Preferred family, product family and popularity in one round trip
+_SELECT_SCORING_INPUTS = text("""
+    SELECT
+        (
+            SELECT fp.family
+            FROM order_line ol
+            JOIN product fp ON ol.product_key = fp.product_key
+            WHERE ol.customer_code = :customer_code
+            GROUP BY fp.family
+            ORDER BY COUNT(*) DESC
+            LIMIT 1
+        ) AS preferred_family,
+        p.family,
+        p.popularity_score
+    FROM product p
+    WHERE p.product_key = :product_key
+""")
+
+
+@dataclass(slots=True, frozen=True)
 class RecoScore:
     """Score breakdown for a recommendation."""
     product_key: str
@@ -44,13 +86,95 @@ class RecommendationScorer:
             db: SQLAlchemy session
         """
         self.db = db
-        # Weights for final score calculation
-        self.weights = {
+        # Weights for final score calculation (read-only, so the unpacked
+        # tuple used by the scoring loops cannot go stale)
+        self.weights = MappingProxyType({
             'affinity': 0.40,  # Customer preference match
             'popularity': 0.30,  # Product popularity
             'profit': 0.20,  # Margin/profitability
             'base': 0.10,  # Base scenario fit
-        }
+        })
+        self._weights = (
+            self.weights['affinity'],
+            self.weights['popularity'],
+            self.weights['profit'],
+            self.weights['base'],
+        )
+        # (family, popularity_score) per product, None if not found
+        self._product_cache: Dict[str, Optional[Tuple]] = {}
+        # Most purchased family per customer, None if no purchases
+        self._pref_family_cache: Dict[str, Optional[str]] = {}
+
+    def clear_cache(self) -> None:
+        """Forget cached product rows (e.g. after a catalog refresh)."""
+        self._product_cache.clear()
+        self._pref_family_cache.clear()
+
+    def clear_customer_cache(self) -> None:
+        """Drop per-customer lookups cached during a recommendation run."""
+        self._pref_family_cache.clear()
+
+    def _preferred_family(
+        self,
+        customer_code: str,
+    ) -> Optional[str]:
+        """Fetch the customer's most purchased family, cached per customer.
+        
+        Args:
+            customer_code: Customer code
+            
+        Returns:
+            Family name, or None if the customer has no purchases
+        """
+        if customer_code in self._pref_family_cache:
+            return self._pref_family_cache[customer_code]
+        
+        result = self.db.execute(_SELECT_PREFERRED_FAMILY, {'customer_code': customer_code})
+        row = result.fetchone()
+        preferred_family = row[0] if row else None
+        self._pref_family_cache[customer_code] = preferred_family
+        return preferred_family
+
+    def _product_row(
+        self,
+        product_key: str,
+    ) -> Optional[Tuple]:
+        """Fetch (family, popularity_score) for a product, cached per scorer.
+        
+        Args:
+            product_key: Product key
+            
+        Returns:
+            Tuple of (family, popularity_score), or None if not found
+        """
+        if product_key in self._product_cache:
+            return self._product_cache[product_key]
+        
+        result = self.db.execute(_SELECT_PRODUCT_ROW, {'product_key': product_key})
+        
+        row = result.fetchone()
+        product = (row[0], row[1]) if row else None
+        self._product_cache[product_key] = product
+        return product
+
+    def _load_products(
+        self,
+        product_keys: Iterable[str],
+    ) -> None:
+        """Load uncached products into the cache with one query.
+        
+        Args:
+            product_keys: Product keys to make available in the cache
+        """
+        missing = list({pk for pk in product_keys if pk not in self._product_cache})
+        if not missing:
+            return
+        
+        result = self.db.execute(_SELECT_PRODUCT_ROWS, {'keys': missing})
+        for row in result:
+            self._product_cache[row[0]] = (row[1], row[2])
+        for pk in missing:
+            self._product_cache.setdefault(pk, None)
 
     def compute_affinity_score(
         self,
@@ -72,34 +196,18 @@ class RecommendationScorer:
             Score 0-100
         """
         try:
-            # Get customer's preferred families from purchases
-            result = self.db.execute(text("""
-                SELECT p.family
-                FROM order_line ol
-                JOIN product p ON ol.product_key = p.product_key
-                WHERE ol.customer_code = :customer_code
-                GROUP BY p.family
-                ORDER BY COUNT(*) DESC
-                LIMIT 1
-            """), {'customer_code': customer_code})
-            
-            preferred_family = result.fetchone()
+            # Get customer's preferred family from purchases
+            preferred_family = self._preferred_family(customer_code)
             
             # Get product info
-            result = self.db.execute(text("""
-                SELECT family, aroma_axes, price_level
-                FROM product
-                WHERE product_key = :product_key
-            """), {'product_key': product_key})
-            
-            product = result.fetchone()
+            product = self._product_row(product_key)
             if not product:
                 return 50.0  # Neutral score
             
             score = 50.0  # Base
             
             # Family match bonus
-            if preferred_family and product[0] == preferred_family[0]:
+            if preferred_family is not None and product[0] == preferred_family:
                 score += 25.0
             elif product[0]:  # Different family - slight boost
                 score += 10.0
@@ -123,18 +231,12 @@ class RecommendationScorer:
             Score 0-100
         """
         try:
-            result = self.db.execute(text("""
-                SELECT popularity_score
-                FROM product
-                WHERE product_key = :product_key
-            """), {'product_key': product_key})
-            
-            row = result.fetchone()
+            row = self._product_row(product_key)
             if not row:
                 return 50.0
             
             # Scale 0-1 to 0-100
-            return float(row[0]) * 100.0 if row[0] else 50.0
+            return float(row[1]) * 100.0 if row[1] else 50.0
         
         except Exception as e:
             logger.warning(f"Failed to get popularity score: {str(e)}")
@@ -155,18 +257,12 @@ class RecommendationScorer:
         try:
             # In real system, would fetch margin from product table
             # For now, use popularity as proxy
-            result = self.db.execute(text("""
-                SELECT popularity_score
-                FROM product
-                WHERE product_key = :product_key
-            """), {'product_key': product_key})
-            
-            row = result.fetchone()
+            row = self._product_row(product_key)
             if not row:
                 return 50.0
             
             # Premium products have higher margins
-            return float(row[0]) * 100.0 if row[0] else 50.0
+            return float(row[1]) * 100.0 if row[1] else 50.0
         
         except Exception as e:
             logger.warning(f"Failed to compute profit score: {str(e)}")
@@ -190,16 +286,16 @@ class RecommendationScorer:
         Returns:
             RecoScore with all components
         """
-        affinity = self.compute_affinity_score(customer_code, product_key)
-        popularity = self.compute_popularity_score(product_key)
-        profit = self.compute_profit_score(product_key)
+        preferred_family, product = self._fetch_scoring_inputs(customer_code, product_key)
+        affinity, popularity, profit = self._component_scores(preferred_family, product)
         
         # Weighted final score
+        w_affinity, w_popularity, w_profit, w_base = self._weights
         final_score = (
-            self.weights['affinity'] * affinity +
-            self.weights['popularity'] * popularity +
-            self.weights['profit'] * profit +
-            self.weights['base'] * base_score
+            w_affinity * affinity +
+            w_popularity * popularity +
+            w_profit * profit +
+            w_base * base_score
         )
         
         return RecoScore(
@@ -212,6 +308,168 @@ class RecommendationScorer:
             final_score=final_score,
         )
 
+    def _fetch_scoring_inputs(
+        self,
+        customer_code: str,
+        product_key: str,
+    ) -> Tuple[Optional[str], Optional[Tuple]]:
+        """Load everything score_recommendation needs in one query.
+        
+        Args:
+            customer_code: Customer code
+            product_key: Product key
+            
+        Returns:
+            Tuple of (preferred_family, (family, popularity_score)), with
+            None for the product when it does not exist
+        """
+        try:
+            if customer_code in self._pref_family_cache:
+                return self._pref_family_cache[customer_code], self._product_row(product_key)
+            
+            result = self.db.execute(_SELECT_SCORING_INPUTS, {
+                'customer_code': customer_code,
+                'product_key': product_key,
+            })
+            row = result.fetchone()
+            if not row:
+                return None, None
+            self._pref_family_cache[customer_code] = row[0]
+            self._product_cache[product_key] = (row[1], row[2])
+            return row[0], (row[1], row[2])
+        
+        except Exception as e:
+            logger.warning(f"Failed to fetch scoring inputs: {str(e)}")
+            return None, None
+
+    @staticmethod
+    def _component_scores(
+        preferred_family: Optional[str],
+        product: Optional[Tuple],
+    ) -> Tuple[float, float, float]:
+        """Compute affinity, popularity and profit scores from loaded inputs.
+        
+        Mirrors compute_affinity_score, compute_popularity_score and
+        compute_profit_score.
+        
+        Args:
+            preferred_family: Customer's most purchased family, if any
+            product: (family, popularity_score), or None if unknown
+            
+        Returns:
+            Tuple of (affinity, popularity, profit), each 0-100
+        """
+        if product is None:
+            return 50.0, 50.0, 50.0
+        
+        family, raw_popularity = product
+        if preferred_family is not None and family == preferred_family:
+            affinity = 75.0
+        elif family:
+            affinity = 60.0
+        else:
+            affinity = 50.0
+        
+        popularity = float(raw_popularity) * 100.0 if raw_popularity else 50.0
+        # Profit uses popularity as a margin proxy (see compute_profit_score)
+        return affinity, popularity, popularity
+
+    def score_recommendations_batch(
+        self,
+        customer_code: str,
+        candidates: List[Tuple[str, str, float]],
+        top_n: Optional[int] = None,
+    ) -> List[RecoScore]:
+        """Score all candidate products for a customer in one pass.
+        
+        Same scoring as score_recommendation, but the preferred family and
+        every candidate's family/popularity are loaded with two queries
+        instead of several per product.
+        
+        Args:
+            customer_code: Customer code
+            candidates: List of (product_key, scenario, base_score)
+            top_n: Only return the N best-scored candidates
+        
+        Returns:
+            RecoScore per candidate, in input order, or the top_n
+            candidates by final score (highest first)
+        """
+        if not candidates:
+            return []
+        
+        try:
+            preferred_family = self._preferred_family(customer_code)
+            self._load_products(product_key for product_key, _, _ in candidates)
+            products = self._product_cache
+        
+        except Exception as e:
+            logger.warning(f"Failed to batch score recommendations: {str(e)}")
+            return [
+                self.score_recommendation(customer_code, product_key, scenario, base_score)
+                for product_key, scenario, base_score in candidates
+            ]
+        
+        w_affinity, w_popularity, w_profit, w_base = self._weights
+        
+        components = []
+        for product_key, scenario, base_score in candidates:
+            affinity, popularity, profit = self._component_scores(
+                preferred_family, products.get(product_key)
+            )
+            final_score = (
+                w_affinity * affinity +
+                w_popularity * popularity +
+                w_profit * profit +
+                w_base * base_score
+            )
+            components.append((final_score, affinity, popularity, profit))
+        
+        # Only the top candidates become RecoScore objects when a limit is
+        # given; nlargest keeps input order for ties, like a stable sort.
+        indices: Iterable[int] = range(len(candidates))
+        if top_n is not None:
+            indices = heapq.nlargest(top_n, indices, key=lambda i: components[i][0])
+        
+        scores = []
+        for i in indices:
+            product_key, scenario, base_score = candidates[i]
+            final_score, affinity, popularity, profit = components[i]
+            scores.append(RecoScore(
+                product_key=product_key,
+                scenario=scenario,
+                base_score=base_score,
+                affinity_score=affinity,
+                popularity_score=popularity,
+                profit_score=profit,
+                final_score=final_score,
+            ))
+        
+        return scores
+
+    def score_batch(
+        self,
+        customer_code: str,
+        product_keys: List[str],
+        scenario: str,
+        base_score: float = 80.0,
+    ) -> List[RecoScore]:
+        """Score several products for one scenario in one pass.
+        
+        Args:
+            customer_code: Customer code
+            product_keys: Product keys to score
+            scenario: Recommendation scenario
+            base_score: Base score from scenario match
+            
+        Returns:
+            RecoScore per product, in input order
+        """
+        return self.score_recommendations_batch(
+            customer_code,
+            [(product_key, scenario, base_score) for product_key in product_keys],
+        )
+
     def rank_recommendations(
         self,
         scores: List[RecoScore],
@@ -226,11 +484,9 @@ class RecommendationScorer:
         Returns:
             Top N recommendations sorted by score
         """
-        # Sort by final_score descending
-        ranked = sorted(scores, key=lambda x: x.final_score, reverse=True)
-        
-        # Return top N
-        return ranked[:max_recommendations]
+        # Partial selection of the top N by final_score (O(K log N));
+        # equivalent to a stable descending sort truncated to N
+        return heapq.nlargest(max_recommendations, scores, key=lambda x: x.final_score)
 
     def diversify_recommendations(
         self,
@@ -251,20 +507,16 @@ class RecommendationScorer:
                 return []
             
             # Fetch product families
-            families = {}
-            for score in ranked_scores:
-                result = self.db.execute(text("""
-                    SELECT family FROM product WHERE product_key = :pk
-                """), {'pk': score.product_key})
-                row = result.fetchone()
-                families[score.product_key] = row[0] if row else None
+            self._load_products(score.product_key for score in ranked_scores)
+            products = self._product_cache
             
             # Select diverse recommendations
             selected = []
             used_families = set()
             
             for score in ranked_scores:
-                family = families.get(score.product_key)
+                product = products.get(score.product_key)
+                family = product[0] if product else None
                 
                 # Always include first recommendation
                 if not selected:
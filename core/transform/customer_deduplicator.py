@@ -1,13 +1,54 @@
 """Customer deduplication and master record creation."""
 
 import logging
-from typing import Dict, List, Optional, Set, Tuple
+from collections import defaultdict
+from typing import DefaultDict, Dict, List, Optional, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 logger = logging.getLogger(__name__)
 
+RAW_FETCH_SIZE = 10000  # raw_customers rows fetched per round trip
+
+_SELECT_RAW_CUSTOMERS = text("""
+    SELECT id, row_data, 1 AS may_have_duplicate
+    FROM raw_customers
+    WHERE batch_id = :batch_id
+""")
+
+# Rows whose email and phone are each unique (or empty) in the batch cannot
+# join a duplicate group, so they skip union-find entirely
+_SELECT_RAW_CUSTOMERS_FLAGGED = text("""
+    SELECT
+        id,
+        row_data,
+        (
+            COUNT(NULLIF(row_data->>'email', '')) OVER (
+                PARTITION BY NULLIF(row_data->>'email', '')
+            ) > 1
+            OR COUNT(NULLIF(row_data->>'phone', '')) OVER (
+                PARTITION BY NULLIF(row_data->>'phone', '')
+            ) > 1
+        ) AS may_have_duplicate
+    FROM raw_customers
+    WHERE batch_id = :batch_id
+    ORDER BY id
+""")
+
+
+def _group_rows(rows: List[Dict], field: str) -> Dict[str, List[Dict]]:
+    """Group rows by a non-empty field value in one pass."""
+    groups: DefaultDict[str, List[Dict]] = defaultdict(list)
+    for row in rows:
+        value = row.get(field)
+        if value:
+            groups[value].append(row)
+    
+    # Behave like a plain dict for callers (no implicit inserts)
+    groups.default_factory = None
+    return groups
+
 
 class CustomerDeduplicator:
     """Deduplicate customer records and create master record."""
@@ -32,16 +73,7 @@ class CustomerDeduplicator:
         Returns:
             Dict of {email: [rows]} for deduplication
         """
-        groups = {}
-        
-        for row in rows:
-            email = row.get('email')
-            if email:
-                if email not in groups:
-                    groups[email] = []
-                groups[email].append(row)
-        
-        return groups
+        return _group_rows(rows, 'email')
 
     @staticmethod
     def get_phone_groups(
@@ -55,16 +87,56 @@ class CustomerDeduplicator:
         Returns:
             Dict of {phone: [rows]} for deduplication
         """
-        groups = {}
+        return _group_rows(rows, 'phone')
+
+    @staticmethod
+    def group_duplicates(
+        rows: List[Dict],
+    ) -> List[List[Dict]]:
+        """Group rows that share an email or phone, transitively.
         
-        for row in rows:
-            phone = row.get('phone')
-            if phone:
-                if phone not in groups:
-                    groups[phone] = []
-                groups[phone].append(row)
+        Union-find over row indices: rows A and B sharing an email and
+        B and C sharing a phone end up in one group. Each group keeps input
+        order and groups are ordered by their first row.
         
-        return groups
+        Args:
+            rows: List of customer rows from raw_customers
+            
+        Returns:
+            List of groups (single-row groups for unique customers)
+        """
+        parent = list(range(len(rows)))
+        
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        first_seen: Dict[Tuple[str, str], int] = {}
+        for i, row in enumerate(rows):
+            for field in ('email', 'phone'):
+                value = row.get(field)
+                if not value:
+                    continue
+                j = first_seen.setdefault((field, value), i)
+                if j != i:
+                    root_i, root_j = find(i), find(j)
+                    # Keep the earliest row as root so groups stay ordered
+                    if root_i < root_j:
+                        parent[root_j] = root_i
+                    elif root_j < root_i:
+                        parent[root_i] = root_j
+        
+        groups: Dict[int, List[Dict]] = {}
+        for i, row in enumerate(rows):
+            root = find(i)
+            if root == i:
+                groups[i] = [row]
+            else:
+                groups[root].append(row)
+        
+        return list(groups.values())
 
     @staticmethod
     def merge_customer_records(
@@ -97,12 +169,13 @@ class CustomerDeduplicator:
         
         # Merge remaining records
         for row in duplicates[1:]:
+            if 'customer_code' in row:
+                customer_codes.append(row['customer_code'])
+            
+            # Use first non-null value; empty values and fields merged already
+            # are the common case, so test those before customer_code
             for field, value in row.items():
-                # Skip customer_code (will merge separately)
-                if field == 'customer_code':
-                    customer_codes.append(value)
-                # Use first non-null value
-                elif value and not merged.get(field):
+                if value and not merged.get(field) and field != 'customer_code':
                     merged[field] = value
         
         # Merge customer codes
@@ -130,57 +203,49 @@ class CustomerDeduplicator:
         
         # Fetch raw customers for batch
         try:
-            result = self.db.execute(text("""
-                SELECT id, row_data
-                FROM raw_customers
-                WHERE batch_id = :batch_id
-            """), {'batch_id': batch_id})
+            # On PostgreSQL the database flags rows whose email or phone
+            # occurs more than once in the batch; only those need grouping
+            if self.db.get_bind().dialect.name == 'postgresql':
+                query = _SELECT_RAW_CUSTOMERS_FLAGGED
+            else:
+                query = _SELECT_RAW_CUSTOMERS
+            
+            # Server-side cursor: rows arrive in chunks instead of one
+            # fully buffered result set alongside the decoded dicts
+            result = self.db.execute(
+                query.execution_options(stream_results=True, yield_per=RAW_FETCH_SIZE),
+                {'batch_id': batch_id},
+            )
             
-            rows_with_id = [
-                {'_id': row[0], **row[1]} 
-                for row in result
-            ]
+            # row_data is decoded into a fresh dict per row, so tag it in
+            # place rather than copying it into a new one
+            candidate_rows = []
+            unique_rows = []
+            for row_id, row_data, may_have_duplicate in result:
+                row_data['_id'] = row_id
+                if may_have_duplicate:
+                    candidate_rows.append(row_data)
+                else:
+                    unique_rows.append(row_data)
             
-            logger.info(f"Fetched {len(rows_with_id)} raw customer rows")
+            logger.info(f"Fetched {len(candidate_rows) + len(unique_rows)} raw customer rows")
             
         except Exception as e:
             logger.error(f"Failed to fetch raw customers: {str(e)}")
             return [], {}
         
-        if not rows_with_id:
-            return [], {}
-        
-        # Dedup by email
-        email_groups = self.get_email_groups(rows_with_id)
-        phone_groups = self.get_phone_groups(rows_with_id)
-        
-        dedup_customers = []
+        dedup_customers = unique_rows
         duplicates_map = {}
         
-        processed_ids: Set[int] = set()
-        
-        # Process email groups
-        for email, group in email_groups.items():
+        for group in self.group_duplicates(candidate_rows):
             if len(group) > 1:
-                # Multiple records with same email
+                # Multiple records sharing an email or phone
                 merged = self.merge_customer_records(group)
                 primary_id = group[0]['_id']
-                duplicate_ids = [str(r['_id']) for r in group[1:]]
-                
-                duplicates_map[primary_id] = duplicate_ids
+                duplicates_map[primary_id] = [str(r['_id']) for r in group[1:]]
                 dedup_customers.append(merged)
-                
-                processed_ids.update(r['_id'] for r in group)
-            elif len(group) == 1 and group[0]['_id'] not in processed_ids:
-                # Single record, not yet processed
+            else:
                 dedup_customers.append(group[0])
-                processed_ids.add(group[0]['_id'])
-        
-        # Add unprocessed records (no email)
-        for row in rows_with_id:
-            if row['_id'] not in processed_ids:
-                dedup_customers.append(row)
-                processed_ids.add(row['_id'])
         
         logger.info(
             f"Deduplication complete: {len(dedup_customers)} unique, "
@@ -2,9 +2,11 @@
 
 import logging
 import uuid
-from typing import Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Optional, Tuple
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
 
 from core.transform.product_resolver import ProductResolver
 from core.transform.customer_deduplicator import CustomerDeduplicator
@@ -12,6 +14,21 @@ from core.transform.transform_loaders import TransformLoader, ClientMasterProfil
 
 logger = logging.getLogger(__name__)
 
+# Staging rows fetched per server-side cursor round trip
+RAW_FETCH_SIZE = 1000
+
+_SELECT_RAW_SALES_LINES = text("""
+    SELECT row_data
+    FROM raw_sales_lines
+    WHERE batch_id = :batch_id
+""")
+
+_SELECT_RAW_CONTACTS = text("""
+    SELECT row_data
+    FROM raw_contacts
+    WHERE batch_id = :batch_id
+""")
+
 
 class TransformPipelineStatus:
     """Status tracking for transform pipeline."""
@@ -48,13 +65,16 @@ class TransformPipelineStatus:
 class TransformOrchestrator:
     """Orchestrate transformation from raw to clean tables."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, enable_parallel: bool = False):
         """Initialize orchestrator.
         
         Args:
             db: SQLAlchemy session
+            enable_parallel: Load order lines and contact events concurrently,
+                each on its own session from db's engine
         """
         self.db = db
+        self.enable_parallel = enable_parallel
         self.batch_id = str(uuid.uuid4())
         self.status = TransformPipelineStatus()
 
@@ -79,6 +99,17 @@ class TransformOrchestrator:
         Returns:
             Tuple of (status, success)
         """
+        # Loads go through Core inserts; incidental reads should not flush
+        # the session first
+        with self.db.no_autoflush:
+            return self._run_steps(ingestion_batch_id, skip_master_profiles)
+
+    def _run_steps(
+        self,
+        ingestion_batch_id: str,
+        skip_master_profiles: bool,
+    ) -> Tuple[TransformPipelineStatus, bool]:
+        """Run the pipeline steps (see run_full_pipeline)."""
         self.status.start_time = datetime.utcnow()
         logger.info(f"Starting transform pipeline for ingestion batch {ingestion_batch_id}")
         
@@ -102,48 +133,22 @@ class TransformOrchestrator:
             loader = TransformLoader(self.db)
             self.status.customers_loaded = loader.load_customers(dedup_customers)
             
-            # Step 3: Load order lines
-            logger.info("Step 3: Loading order lines...")
-            try:
-                # Fetch raw order lines
-                from sqlalchemy import text
-                result = self.db.execute(text("""
-                    SELECT row_data
-                    FROM raw_sales_lines
-                    WHERE batch_id = :batch_id
-                """), {'batch_id': ingestion_batch_id})
-                
-                order_lines = [row[0] for row in result]
-                
-                # Resolve products
-                product_resolver = ProductResolver(self.db)
-                product_resolver.load_aliases()
-                
-                self.status.order_lines_loaded = loader.load_order_lines(
-                    order_lines,
-                    product_resolver
-                )
-                
-            except Exception as e:
-                logger.error(f"Failed to load order lines: {str(e)}")
-                self.status.errors.append(f"Order lines: {str(e)}")
-            
-            # Step 4: Load contact events
-            logger.info("Step 4: Loading contact events...")
-            try:
-                from sqlalchemy import text
-                result = self.db.execute(text("""
-                    SELECT row_data
-                    FROM raw_contacts
-                    WHERE batch_id = :batch_id
-                """), {'batch_id': ingestion_batch_id})
-                
-                contacts = [row[0] for row in result]
-                self.status.contact_events_loaded = loader.load_contact_events(contacts)
+            # Steps 3 and 4: order lines and contact events
+            if self.enable_parallel:
+                logger.info("Steps 3-4: Loading order lines and contact events in parallel...")
+                self._load_facts_parallel(ingestion_batch_id)
+            else:
+                logger.info("Step 3: Loading order lines...")
+                try:
+                    self.status.order_lines_loaded = _load_order_lines(self.db, ingestion_batch_id)
+                except Exception as e:
+                    self._record_step_error("Order lines", e)
                 
-            except Exception as e:
-                logger.error(f"Failed to load contact events: {str(e)}")
-                self.status.errors.append(f"Contact events: {str(e)}")
+                logger.info("Step 4: Loading contact events...")
+                try:
+                    self.status.contact_events_loaded = _load_contact_events(self.db, ingestion_batch_id)
+                except Exception as e:
+                    self._record_step_error("Contact events", e)
             
             # Step 5: Build client master profiles
             if not skip_master_profiles:
@@ -173,6 +178,100 @@ class TransformOrchestrator:
             self.status.end_time = datetime.utcnow()
             return self.status, False
 
+    def _load_facts_parallel(self, ingestion_batch_id: str) -> None:
+        """Run steps 3 and 4 on two threads, each with its own session.
+        
+        Both steps read their own staging table and write their own clean
+        table, so neither waits on the other's output.
+        
+        Args:
+            ingestion_batch_id: Batch ID from ingestion step
+        """
+        session_factory = sessionmaker(
+            bind=self.db.get_bind(),
+            autocommit=False,
+            autoflush=False,
+        )
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            order_lines = executor.submit(
+                _run_in_session, session_factory, _load_order_lines, ingestion_batch_id
+            )
+            contact_events = executor.submit(
+                _run_in_session, session_factory, _load_contact_events, ingestion_batch_id
+            )
+        
+        try:
+            self.status.order_lines_loaded = order_lines.result()
+        except Exception as e:
+            self._record_step_error("Order lines", e)
+        
+        try:
+            self.status.contact_events_loaded = contact_events.result()
+        except Exception as e:
+            self._record_step_error("Contact events", e)
+
+    def _record_step_error(self, step: str, error: Exception) -> None:
+        """Log a failed pipeline step and keep going."""
+        logger.error(f"Failed to load {step.lower()}: {str(error)}")
+        self.status.errors.append(f"{step}: {str(error)}")
+
     def get_status(self) -> TransformPipelineStatus:
         """Get current pipeline status."""
         return self.status
+
+
+def _load_order_lines(db: Session, ingestion_batch_id: str) -> int:
+    """Step 3: load a batch's order lines with product resolution."""
+    loader = TransformLoader(db)
+    
+    if db.get_bind().dialect.name == 'postgresql':
+        # Resolve and copy inside the database
+        loaded = loader.load_order_lines_from_raw(ingestion_batch_id)
+        if loaded is not None:
+            return loaded
+    
+    # Stream raw order lines
+    order_lines = _stream_row_data(db, _SELECT_RAW_SALES_LINES, ingestion_batch_id)
+    
+    if db.get_bind().dialect.name == 'postgresql':
+        # Products resolved by a join inside each chunk's INSERT
+        return loader.load_order_lines(order_lines)
+    
+    # Resolve products
+    product_resolver = ProductResolver(db)
+    product_resolver.load_aliases()
+    
+    return loader.load_order_lines(order_lines, product_resolver)
+
+
+def _load_contact_events(db: Session, ingestion_batch_id: str) -> int:
+    """Step 4: load a batch's contact events."""
+    contacts = _stream_row_data(db, _SELECT_RAW_CONTACTS, ingestion_batch_id)
+    return TransformLoader(db).load_contact_events(contacts)
+
+
+def _stream_row_data(db: Session, statement, ingestion_batch_id: str) -> Iterator[Dict]:
+    """Yield a staging table's row_data through a server-side cursor."""
+    result = db.execute(
+        statement,
+        {'batch_id': ingestion_batch_id},
+        execution_options={'stream_results': True, 'yield_per': RAW_FETCH_SIZE},
+    )
+    for row in result:
+        yield row[0]
+
+
+def _run_in_session(
+    session_factory: Callable[[], Session],
+    step: Callable[[Session, str], int],
+    ingestion_batch_id: str,
+) -> int:
+    """Run one pipeline step on a dedicated session (worker thread entry point)."""
+    session = session_factory()
+    try:
+        return step(session, ingestion_batch_id)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
@@ -1,16 +1,38 @@
 """Product alias resolution and product key mapping."""
 
 import logging
-from typing import Dict, Optional, Tuple
+import threading
+from typing import Callable, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 logger = logging.getLogger(__name__)
 
+_MISS_PREFIX = "Product not found in alias mapping: "
+
+_SELECT_ALIASES = text("""
+    SELECT label_norm, product_key
+    FROM product_alias
+    WHERE is_active = TRUE
+""")
+
+# Changes whenever aliases are added or removed
+_SELECT_ALIAS_VERSION = text("""
+    SELECT COUNT(*), MAX(created_at)
+    FROM product_alias
+""")
+
 
 class ProductResolver:
     """Resolve product labels to product keys using alias mapping."""
 
+    # Alias map shared by all resolvers in the process, reloaded only when
+    # _SELECT_ALIAS_VERSION changes. It is replaced, never mutated, so
+    # resolvers holding the previous map keep a consistent view.
+    _shared_cache: Dict[str, str] = {}
+    _shared_version: Optional[Tuple] = None
+    _shared_lock = threading.Lock()
+
     def __init__(self, db: Session):
         """Initialize with database session.
         
@@ -24,6 +46,10 @@ class ProductResolver:
     def load_aliases(self) -> Dict[str, str]:
         """Load product aliases from database.
         
+        Reuses the process-wide alias map when product_alias has not
+        changed since it was loaded; in-place edits of existing aliases
+        need clear_shared_cache().
+        
         Returns:
             Dict of {label_norm: product_key}
         """
@@ -31,19 +57,20 @@ class ProductResolver:
             return self._cache
         
         try:
-            result = self.db.execute(text("""
-                SELECT label_norm, product_key
-                FROM product_alias
-                WHERE is_active = TRUE
-            """))
+            version = tuple(self.db.execute(_SELECT_ALIAS_VERSION).fetchone())
             
-            for row in result:
-                label_norm = row[0]
-                product_key = row[1]
-                self._cache[label_norm] = product_key
+            with ProductResolver._shared_lock:
+                if version != ProductResolver._shared_version:
+                    aliases = {
+                        label_norm: product_key
+                        for label_norm, product_key in self.db.execute(_SELECT_ALIASES)
+                    }
+                    ProductResolver._shared_cache = aliases
+                    ProductResolver._shared_version = version
+                    logger.info(f"Loaded {len(aliases)} product aliases")
+                self._cache = ProductResolver._shared_cache
             
             self._loaded = True
-            logger.info(f"Loaded {len(self._cache)} product aliases")
             return self._cache
             
         except Exception as e:
@@ -73,10 +100,36 @@ class ProductResolver:
         if product_key:
             return product_key, None
         
-        error_msg = f"Product not found in alias mapping: {label_norm}"
-        logger.debug(f"Product resolution failed: {error_msg}")
+        # Called once per order line: only build the debug message when
+        # DEBUG logging is actually on
+        error_msg = _MISS_PREFIX + str(label_norm)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Product resolution failed: %s", error_msg)
         return None, error_msg
 
+    def fast_resolver(self) -> Callable[[str], Tuple[Optional[str], Optional[str]]]:
+        """Return a resolve() equivalent specialized for a bulk load.
+        
+        Aliases are loaded now, and the returned function closes over the
+        alias dict's get, so each call skips the _loaded check, the
+        attribute lookups and the debug logging of resolve().
+        
+        Returns:
+            Function mapping label_norm to (product_key, error_message)
+        """
+        if not self._loaded:
+            self.load_aliases()
+        
+        cache_get = self._cache.get
+        
+        def resolve_fast(label_norm: str) -> Tuple[Optional[str], Optional[str]]:
+            product_key = cache_get(label_norm)
+            if product_key:
+                return product_key, None
+            return None, _MISS_PREFIX + str(label_norm)
+        
+        return resolve_fast
+
     def resolve_batch(
         self,
         labels: Dict[str, str],  # {label_norm: product_label_original}
@@ -92,13 +145,24 @@ class ProductResolver:
         if not self._loaded:
             self.load_aliases()
         
-        results = {}
-        for label_norm, label_orig in labels.items():
-            results[label_norm] = self.resolve(label_norm, label_orig)
-        
-        return results
+        # Same rule as resolve(), without a method call per label
+        cache_get = self._cache.get
+        return {
+            label_norm: (
+                (product_key, None) if (product_key := cache_get(label_norm))
+                else (None, _MISS_PREFIX + str(label_norm))
+            )
+            for label_norm in labels
+        }
 
     def clear_cache(self):
         """Clear the alias cache."""
-        self._cache.clear()
+        self._cache = {}
         self._loaded = False
+
+    @classmethod
+    def clear_shared_cache(cls):
+        """Forget the process-wide alias map (next load_aliases re-reads it)."""
+        with cls._shared_lock:
+            cls._shared_cache = {}
+            cls._shared_version = None
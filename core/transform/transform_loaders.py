@@ -1,16 +1,171 @@
 """Load transformed data into clean tables."""
 
+import csv
+import io
 import logging
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import Iterable, List, Dict, Optional, Tuple
 from datetime import datetime, date
+import psycopg2
+from psycopg2.extras import execute_values
 from sqlalchemy.orm import Session
 from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from core.db.models import (
     Customer, OrderLine, ContactEvent, Product, ProductAlias
 )
+from core.transform.product_resolver import ProductResolver
 
 logger = logging.getLogger(__name__)
 
+INSERT_CHUNK_SIZE = 1000
+
+# Row count from which PostgreSQL loads switch from executemany to COPY
+COPY_MIN_ROWS = 50000
+
+# Source fields that feed NOT NULL columns. Rows missing one are rejected
+# before the insert so a chunk does not fail and fall back to row by row.
+_ORDER_LINE_REQUIRED = ('customer_code', 'order_date', 'doc_ref', 'qty', 'amount_ht')
+_CONTACT_EVENT_REQUIRED = ('customer_code', 'contact_date')
+_EMPTY = (None, '')
+
+
+def _missing_fields(get, required: Tuple[str, ...]) -> List[str]:
+    """Names of required fields that are absent or empty in a source row."""
+    return [field for field in required if get(field) in _EMPTY]
+
+
+@lru_cache(maxsize=8192)
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    """Parse an ISO date or datetime string to a date, None if empty.
+    
+    A batch only holds a few hundred distinct dates for thousands of
+    lines, so 8192 entries keep every repeat a cache hit.
+    """
+    return datetime.fromisoformat(value).date() if value else None
+
+
+# Built once; SQLAlchemy's compiled cache then reuses their compiled form
+# for every chunk
+_INSERT_CUSTOMER = insert(Customer)
+_INSERT_ORDER_LINE = insert(OrderLine)
+_INSERT_CONTACT_EVENT = insert(ContactEvent)
+
+
+# Staged sales lines resolved against product_alias and copied into
+# order_line without leaving the database (PostgreSQL, row_data is JSONB).
+# Same mapping as load_order_lines; lines whose label has no alias are
+# skipped.
+_INSERT_ORDER_LINES_FROM_RAW = text("""
+    INSERT INTO order_line
+    (customer_code, order_date, doc_ref, doc_type, product_key,
+     qty, amount_ht, amount_ttc, margin, created_at)
+    SELECT
+        r.row_data->>'customer_code',
+        (r.row_data->>'order_date')::date,
+        r.row_data->>'doc_ref',
+        r.row_data->>'doc_type',
+        a.product_key,
+        (r.row_data->>'qty')::float,
+        (r.row_data->>'amount_ht')::float,
+        (r.row_data->>'amount_ttc')::float,
+        (r.row_data->>'margin')::float,
+        now() AT TIME ZONE 'UTC'
+    FROM raw_sales_lines r
+    JOIN product_alias a ON a.label_norm = r.row_data->>'product_label_norm'
+    WHERE r.batch_id = :batch_id
+""")
+
+# Order lines held in Python, shipped as one VALUES list per chunk and
+# resolved by the same join on product_alias (PostgreSQL, psycopg2
+# execute_values). Casts in the template keep the VALUES column types
+# stable when a column mixes strings, numbers and NULLs.
+_INSERT_ORDER_LINES_JOINED = """
+    WITH input (label_norm, customer_code, order_date, doc_ref, doc_type,
+                qty, amount_ht, amount_ttc, margin) AS (VALUES %s)
+    INSERT INTO order_line
+    (customer_code, order_date, doc_ref, doc_type, product_key,
+     qty, amount_ht, amount_ttc, margin, created_at)
+    SELECT
+        i.customer_code, i.order_date, i.doc_ref, i.doc_type, pa.product_key,
+        i.qty, i.amount_ht, i.amount_ttc, i.margin, now() AT TIME ZONE 'UTC'
+    FROM input i
+    JOIN product_alias pa ON pa.label_norm = i.label_norm
+"""
+
+_ORDER_LINE_VALUES_TEMPLATE = (
+    "(%s, %s, %s::date, %s, %s, %s::float, %s::float, %s::float, %s::float)"
+)
+
+_COUNT_UNRESOLVED_RAW_LINES = text("""
+    SELECT COUNT(*)
+    FROM raw_sales_lines r
+    WHERE r.batch_id = :batch_id
+    AND NOT EXISTS (
+        SELECT 1 FROM product_alias a
+        WHERE a.label_norm = r.row_data->>'product_label_norm'
+    )
+""")
+
+
+# Every customer's profile in one statement: RFM aggregates over order_line,
+# scored 1-5 by quintile (5 = most recent / most orders / highest spend),
+# upserted on customer_code. Customers without orders get empty scores.
+_UPSERT_MASTER_PROFILES = text("""
+    INSERT INTO client_master_profile
+    (customer_code, premiere_date_achat, derniere_date_achat, recence_jours,
+     nb_commandes, ca_ht, r_score, f_score, m_score, rfm, segment,
+     created_at, updated_at)
+    SELECT
+        c.customer_code,
+        s.first_order_date,
+        s.last_order_date,
+        CURRENT_DATE - s.last_order_date,
+        COALESCE(s.order_count, 0),
+        COALESCE(s.total_amount, 0.0),
+        s.r_score,
+        s.f_score,
+        s.m_score,
+        s.r_score::text || s.f_score::text || s.m_score::text,
+        'STANDARD',
+        now() AT TIME ZONE 'UTC',
+        now() AT TIME ZONE 'UTC'
+    FROM customer c
+    LEFT JOIN (
+        SELECT
+            customer_code,
+            first_order_date,
+            last_order_date,
+            order_count,
+            total_amount,
+            NTILE(5) OVER (ORDER BY last_order_date) AS r_score,
+            NTILE(5) OVER (ORDER BY order_count) AS f_score,
+            NTILE(5) OVER (ORDER BY total_amount) AS m_score
+        FROM (
+            SELECT
+                customer_code,
+                MIN(order_date) AS first_order_date,
+                MAX(order_date) AS last_order_date,
+                COUNT(*) AS order_count,
+                SUM(amount_ht) AS total_amount
+            FROM order_line
+            GROUP BY customer_code
+        ) rfm
+    ) s ON s.customer_code = c.customer_code
+    ON CONFLICT (customer_code) DO UPDATE SET
+        premiere_date_achat = EXCLUDED.premiere_date_achat,
+        derniere_date_achat = EXCLUDED.derniere_date_achat,
+        recence_jours = EXCLUDED.recence_jours,
+        nb_commandes = EXCLUDED.nb_commandes,
+        ca_ht = EXCLUDED.ca_ht,
+        r_score = EXCLUDED.r_score,
+        f_score = EXCLUDED.f_score,
+        m_score = EXCLUDED.m_score,
+        rfm = EXCLUDED.rfm,
+        segment = EXCLUDED.segment,
+        updated_at = EXCLUDED.updated_at
+""")
+
 
 class TransformLoader:
     """Load transformed data into clean tables."""
@@ -23,6 +178,101 @@ class TransformLoader:
         """
         self.db = db
 
+    def _flush_size(self) -> int:
+        """Rows to buffer before a streamed loader flushes.
+        
+        On PostgreSQL, buffers fill up to COPY_MIN_ROWS so that large loads
+        reach _bulk_insert's COPY path. Memory stays bounded by that size.
+        """
+        if self.db.get_bind().dialect.name == 'postgresql':
+            return COPY_MIN_ROWS
+        return INSERT_CHUNK_SIZE
+
+    def _bulk_insert(self, stmt, rows: List[Dict]) -> int:
+        """Insert rows with one executemany per chunk.
+        
+        A chunk that violates a constraint is rolled back to its savepoint
+        and retried row by row, so one bad row only drops itself.
+        
+        Args:
+            stmt: One of the module-level _INSERT_* statements
+            rows: Column dicts
+            
+        Returns:
+            Number of rows inserted
+        """
+        if len(rows) >= COPY_MIN_ROWS and self.db.get_bind().dialect.name == 'postgresql':
+            try:
+                with self.db.begin_nested():
+                    return self._copy_rows(stmt.table, rows)
+            except (SQLAlchemyError, psycopg2.Error) as e:
+                logger.warning("COPY into %s failed, using executemany: %s", stmt.table.name, e)
+        
+        loaded = 0
+        
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            chunk = rows[start:start + INSERT_CHUNK_SIZE]
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(stmt, chunk)
+                loaded += len(chunk)
+            except IntegrityError:
+                for row in chunk:
+                    try:
+                        with self.db.begin_nested():
+                            self.db.execute(stmt, row)
+                        loaded += 1
+                    except IntegrityError as e:
+                        logger.warning("Failed to load %s row: %s", stmt.table.name, e.orig)
+        
+        return loaded
+
+    def _copy_rows(self, table, rows: List[Dict]) -> int:
+        """Stream rows into table with COPY FROM STDIN (PostgreSQL only).
+        
+        COPY skips SQLAlchemy, so Python-side column defaults (created_at,
+        flags) are evaluated once here and sent with every row.
+        
+        Args:
+            table: Target Table
+            rows: Column dicts, all with the same keys
+            
+        Returns:
+            Number of rows copied
+        """
+        columns = list(rows[0])
+        defaults = {}
+        for column in table.columns:
+            default = column.default
+            if column.name in columns or default is None:
+                continue
+            if default.is_scalar:
+                defaults[column.name] = default.arg
+            elif default.is_callable:
+                defaults[column.name] = default.arg(None)
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        default_values = list(defaults.values())
+        for row in rows:
+            writer.writerow(
+                [r'\N' if value is None else value for value in map(row.get, columns)]
+                + default_values
+            )
+        buffer.seek(0)
+        
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns + list(defaults))}) "
+                r"FROM STDIN WITH (FORMAT csv, NULL '\N')",
+                buffer,
+            )
+        finally:
+            cursor.close()
+        
+        return len(rows)
+
     def load_customers(
         self,
         customers: List[Dict],
@@ -38,46 +288,44 @@ class TransformLoader:
         if not customers:
             return 0
         
-        loaded = 0
-        
-        for customer_dict in customers:
-            try:
-                # Create Customer model instance
-                customer = Customer(
-                    customer_code=customer_dict.get('customer_code'),
-                    first_name=customer_dict.get('first_name'),
-                    last_name=customer_dict.get('last_name'),
-                    email=customer_dict.get('email'),
-                    phone=customer_dict.get('phone'),
-                    address=customer_dict.get('address'),
-                    postal_code=customer_dict.get('postal_code'),
-                    city=customer_dict.get('city'),
-                    country=customer_dict.get('country'),
-                    bounced=False,
-                    optout=False,
-                    contactable=True,
-                )
-                
-                self.db.add(customer)
-                loaded += 1
-                
-            except Exception as e:
-                logger.warning(f"Failed to load customer {customer_dict.get('customer_code')}: {str(e)}")
+        rows = [
+            {
+                'customer_code': customer_dict.get('customer_code'),
+                'first_name': customer_dict.get('first_name'),
+                'last_name': customer_dict.get('last_name'),
+                'email': customer_dict.get('email'),
+                'phone': customer_dict.get('phone'),
+                'address': customer_dict.get('address'),
+                'postal_code': customer_dict.get('postal_code'),
+                'city': customer_dict.get('city'),
+                'country': customer_dict.get('country'),
+                'is_bounced': False,
+                'is_optout': False,
+                'is_contactable': True,
+            }
+            for customer_dict in customers
+        ]
         
+        loaded = self._bulk_insert(_INSERT_CUSTOMER, rows)
         self.db.commit()
-        logger.info(f"Loaded {loaded} customers")
+        logger.info("Loaded %d customers", loaded)
         return loaded
 
     def load_order_lines(
         self,
-        order_lines: List[Dict],
-        product_resolver,  # ProductResolver instance
+        order_lines: Iterable[Dict],
+        product_resolver: Optional[ProductResolver] = None,
     ) -> int:
         """Load order lines into order_line table.
         
+        Rows are inserted every _flush_size() lines (COPY on PostgreSQL),
+        so a streamed input is never held in memory as a whole.
+        
         Args:
-            order_lines: List of order line dicts from raw_sales_lines
-            product_resolver: ProductResolver to resolve product keys
+            order_lines: Order line dicts from raw_sales_lines (any iterable)
+            product_resolver: ProductResolver to resolve product keys. When
+                omitted on PostgreSQL, labels are resolved by a join on
+                product_alias inside the INSERT instead
             
         Returns:
             Number of order lines loaded
@@ -85,55 +333,197 @@ class TransformLoader:
         if not order_lines:
             return 0
         
+        if product_resolver is None:
+            if self.db.get_bind().dialect.name == 'postgresql':
+                return self._load_order_lines_joined(order_lines)
+            product_resolver = ProductResolver(self.db)
+        
         loaded = 0
+        pending = []
+        # Bound once, not looked up per line
+        append = pending.append
+        resolve = product_resolver.fast_resolver()
+        flush_size = self._flush_size()
         
         for line_dict in order_lines:
             try:
+                get = line_dict.get
+                
                 # Resolve product
-                product_key, resolve_error = product_resolver.resolve(
-                    line_dict.get('product_label_norm'),
-                    line_dict.get('product_label')
-                )
+                product_key, resolve_error = resolve(get('product_label_norm'))
                 
                 if not product_key:
-                    logger.warning(f"Cannot resolve product for line: {line_dict}")
+                    logger.warning("Cannot resolve product for line: %s", line_dict)
+                    continue
+                
+                missing = _missing_fields(get, _ORDER_LINE_REQUIRED)
+                if missing:
+                    logger.warning("Rejected order line missing %s: %s", ', '.join(missing), line_dict)
                     continue
                 
-                # Parse date
-                order_date_str = line_dict.get('order_date')
-                order_date = datetime.fromisoformat(order_date_str).date() if order_date_str else None
+                append({
+                    'customer_code': get('customer_code'),
+                    'order_date': _parse_date(get('order_date')),
+                    'doc_ref': get('doc_ref'),
+                    'doc_type': get('doc_type'),
+                    'product_key': product_key,
+                    'qty': get('qty'),
+                    'amount_ht': get('amount_ht'),
+                    'amount_ttc': get('amount_ttc'),
+                    'margin': get('margin'),
+                })
                 
-                # Create OrderLine model instance
-                order_line = OrderLine(
-                    customer_code=line_dict.get('customer_code'),
-                    order_date=order_date,
-                    doc_ref=line_dict.get('doc_ref'),
-                    doc_type=line_dict.get('doc_type'),
-                    product_key=product_key,
-                    qty=line_dict.get('qty'),
-                    amount_ht=line_dict.get('amount_ht'),
-                    amount_ttc=line_dict.get('amount_ttc'),
-                    margin=line_dict.get('margin'),
-                )
+            except Exception as e:
+                logger.warning("Failed to load order line: %s", e)
+                continue
+            
+            # Outside the per-row try: a failed flush is a database error,
+            # not a bad row, and must reach the caller
+            if len(pending) >= flush_size:
+                loaded += self._bulk_insert(_INSERT_ORDER_LINE, pending)
+                pending.clear()
+        
+        loaded += self._bulk_insert(_INSERT_ORDER_LINE, pending)
+        self.db.commit()
+        logger.info("Loaded %d order lines", loaded)
+        return loaded
+
+    def _load_order_lines_joined(self, order_lines: Iterable[Dict]) -> int:
+        """Load order lines, resolving products in the database (PostgreSQL).
+        
+        Args:
+            order_lines: Order line dicts from raw_sales_lines
+            
+        Returns:
+            Number of order lines loaded
+        """
+        total = 0
+        loaded = 0
+        pending = []
+        append = pending.append
+        
+        for line_dict in order_lines:
+            try:
+                get = line_dict.get
+                total += 1
+                
+                missing = _missing_fields(get, _ORDER_LINE_REQUIRED)
+                if missing:
+                    logger.warning("Rejected order line missing %s: %s", ', '.join(missing), line_dict)
+                    continue
                 
-                self.db.add(order_line)
-                loaded += 1
+                append((
+                    get('product_label_norm'),
+                    get('customer_code'),
+                    _parse_date(get('order_date')),
+                    get('doc_ref'),
+                    get('doc_type'),
+                    get('qty'),
+                    get('amount_ht'),
+                    get('amount_ttc'),
+                    get('margin'),
+                ))
                 
             except Exception as e:
-                logger.warning(f"Failed to load order line: {str(e)}")
+                logger.warning("Failed to load order line: %s", e)
+                continue
+            
+            # Outside the per-row try: a failed flush is a database error,
+            # not a bad row, and must reach the caller
+            if len(pending) >= INSERT_CHUNK_SIZE:
+                loaded += self._flush_order_lines_joined(pending)
+                pending.clear()
         
+        if pending:
+            loaded += self._flush_order_lines_joined(pending)
         self.db.commit()
-        logger.info(f"Loaded {loaded} order lines")
+        
+        if total > loaded:
+            logger.warning("Skipped %d order lines (rejected, unresolved product or constraint)", total - loaded)
+        logger.info("Loaded %d order lines", loaded)
+        return loaded
+
+    def _flush_order_lines_joined(self, rows: List[Tuple]) -> int:
+        """Insert one chunk via _INSERT_ORDER_LINES_JOINED.
+        
+        Like _bulk_insert, a chunk that violates a constraint is retried
+        row by row.
+        
+        Returns:
+            Number of rows inserted
+        """
+        try:
+            with self.db.begin_nested():
+                return self._execute_order_lines_joined(rows)
+        except psycopg2.IntegrityError:
+            loaded = 0
+            for row in rows:
+                try:
+                    with self.db.begin_nested():
+                        loaded += self._execute_order_lines_joined([row])
+                except psycopg2.IntegrityError as e:
+                    logger.warning("Failed to load order_line row: %s", e)
+            return loaded
+
+    def _execute_order_lines_joined(self, rows: List[Tuple]) -> int:
+        """Run _INSERT_ORDER_LINES_JOINED for rows as a single statement."""
+        cursor = self.db.connection().connection.cursor()
+        try:
+            execute_values(
+                cursor,
+                _INSERT_ORDER_LINES_JOINED,
+                rows,
+                template=_ORDER_LINE_VALUES_TEMPLATE,
+                page_size=len(rows),
+            )
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def load_order_lines_from_raw(
+        self,
+        batch_id: str,
+    ) -> Optional[int]:
+        """Load a batch's staged sales lines with one INSERT ... SELECT.
+        
+        PostgreSQL only: product resolution happens as a join on
+        product_alias, so no row travels through Python.
+        
+        Args:
+            batch_id: Ingestion batch ID in raw_sales_lines
+            
+        Returns:
+            Number of order lines loaded, or None if the statement failed
+            and the caller should use load_order_lines instead
+        """
+        try:
+            with self.db.begin_nested():
+                result = self.db.execute(_INSERT_ORDER_LINES_FROM_RAW, {'batch_id': batch_id})
+                unresolved = self.db.execute(
+                    _COUNT_UNRESOLVED_RAW_LINES, {'batch_id': batch_id}
+                ).scalar()
+        except SQLAlchemyError as e:
+            logger.warning("Set-based order line load failed, falling back: %s", e)
+            return None
+        
+        self.db.commit()
+        loaded = result.rowcount
+        if unresolved:
+            logger.warning("Cannot resolve product for %d order lines", unresolved)
+        logger.info("Loaded %d order lines", loaded)
         return loaded
 
     def load_contact_events(
         self,
-        contacts: List[Dict],
+        contacts: Iterable[Dict],
     ) -> int:
         """Load contact events into contact_event table.
         
+        Rows are inserted every _flush_size() contacts (COPY on
+        PostgreSQL), so a streamed input is never held in memory as a whole.
+        
         Args:
-            contacts: List of contact dicts from raw_contacts
+            contacts: Contact dicts from raw_contacts (any iterable)
             
         Returns:
             Number of contact events loaded
@@ -142,30 +532,40 @@ class TransformLoader:
             return 0
         
         loaded = 0
+        pending = []
+        append = pending.append
+        flush_size = self._flush_size()
         
         for contact_dict in contacts:
             try:
-                # Parse date
-                contact_date_str = contact_dict.get('contact_date')
-                contact_date = datetime.fromisoformat(contact_date_str).date() if contact_date_str else None
+                get = contact_dict.get
                 
-                # Create ContactEvent model instance
-                contact_event = ContactEvent(
-                    customer_code=contact_dict.get('customer_code'),
-                    contact_date=contact_date,
-                    channel=contact_dict.get('channel'),
-                    status=contact_dict.get('status'),
-                    campaign_id=contact_dict.get('campaign_id'),
-                )
+                missing = _missing_fields(get, _CONTACT_EVENT_REQUIRED)
+                if missing:
+                    logger.warning("Rejected contact event missing %s: %s", ', '.join(missing), contact_dict)
+                    continue
                 
-                self.db.add(contact_event)
-                loaded += 1
+                append({
+                    'customer_code': get('customer_code'),
+                    'contact_date': _parse_date(get('contact_date')),
+                    'channel': get('channel'),
+                    'status': get('status'),
+                    'campaign_id': get('campaign_id'),
+                })
                 
             except Exception as e:
-                logger.warning(f"Failed to load contact event: {str(e)}")
+                logger.warning("Failed to load contact event: %s", e)
+                continue
+            
+            # Outside the per-row try: a failed flush is a database error,
+            # not a bad row, and must reach the caller
+            if len(pending) >= flush_size:
+                loaded += self._bulk_insert(_INSERT_CONTACT_EVENT, pending)
+                pending.clear()
         
+        loaded += self._bulk_insert(_INSERT_CONTACT_EVENT, pending)
         self.db.commit()
-        logger.info(f"Loaded {loaded} contact events")
+        logger.info("Loaded %d contact events", loaded)
         return loaded
 
 
@@ -226,7 +626,7 @@ class ClientMasterProfileLoader:
             return recency, frequency, monetary
             
         except Exception as e:
-            logger.warning(f"Failed to compute RFM for {customer_code}: {str(e)}")
+            logger.warning("Failed to compute RFM for %s: %s", customer_code, e)
             return None, None, None
 
     def build_profiles(
@@ -234,51 +634,23 @@ class ClientMasterProfileLoader:
     ) -> int:
         """Build client master profiles for all customers.
         
+        Aggregates, RFM quintiles and the upsert run as one statement
+        instead of two queries per customer.
+        
         Returns:
             Number of profiles created
         """
         logger.info("Starting client master profile computation")
         
         try:
-            # Get all customers
-            result = self.db.execute(text("""
-                SELECT customer_code
-                FROM customer
-            """))
-            
-            customer_codes = [row[0] for row in result]
-            logger.info(f"Processing {len(customer_codes)} customers")
-            
-            created = 0
-            
-            for customer_code in customer_codes:
-                try:
-                    # Compute RFM
-                    recency, frequency, monetary = self.compute_rfm_scores(customer_code)
-                    
-                    # Create profile (simplified for now)
-                    # In production, would compute full feature set
-                    self.db.execute(text("""
-                        INSERT INTO client_master_profile
-                        (customer_code, rfm_score, segment)
-                        VALUES (:customer_code, :rfm_score, :segment)
-                        ON CONFLICT (customer_code) DO UPDATE
-                        SET rfm_score = :rfm_score, segment = :segment
-                    """), {
-                        'customer_code': customer_code,
-                        'rfm_score': (recency or 0) + (frequency or 0) + (monetary or 0),
-                        'segment': 'STANDARD',  # Placeholder
-                    })
-                    
-                    created += 1
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to create profile for {customer_code}: {str(e)}")
+            result = self.db.execute(_UPSERT_MASTER_PROFILES)
+            created = result.rowcount
             
             self.db.commit()
-            logger.info(f"Created {created} client master profiles")
+            logger.info("Created %d client master profiles", created)
             return created
             
         except Exception as e:
-            logger.error(f"Failed to build profiles: {str(e)}")
+            logger.error("Failed to build profiles: %s", e)
+            self.db.rollback()
             return 0
@@ -8,8 +8,11 @@ bind = "127.0.0.1:8000"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+# Requests mostly wait on PostgreSQL, so each process serves them on a
+# thread pool instead of one request at a time
+workers = multiprocessing.cpu_count() + 1
+worker_class = "gthread"
+threads = 8
 worker_connections = 1000
 max_requests = 1000
 max_requests_jitter = 50
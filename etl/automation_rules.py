@@ -12,17 +12,57 @@ Rôle: Définir et gérer les règles d'automatisation
 """
 
 import json
+from bisect import bisect_right, insort
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from itertools import chain
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
 from enum import Enum
 from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
 
 from etl.config import logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-class ActionType(Enum):
+
+def _dump_json(data: Dict) -> bytes:
+    """
+    Sérialise en JSON UTF-8 indenté (orjson si installé, sinon json)
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+RULE_LOOKUP_CACHE_SIZE = 4096
+
+DispatchKey = Tuple["TriggerType", Optional[str], Optional[int]]
+# (segments autorisés ou None, seuil de score)
+RuleConditions = Tuple[Optional[frozenset], float]
+
+_NO_CONDITIONS: RuleConditions = (None, float("-inf"))
+
+
+def _compile_conditions(conditions: Dict) -> RuleConditions:
+    """
+    Compile les conditions d'une règle en un tuple (segments, seuil)
+
+    Les clés sont inspectées une seule fois, au chargement de la règle;
+    le matching ne fait ensuite que deux comparaisons, sans appel de fonction.
     """
-    Types d'actions d'automatisation
+    allowed = frozenset(conditions["segment"]) if "segment" in conditions else None
+    threshold = conditions.get("score_threshold", float("-inf"))
+    return (allowed, threshold)
+
+
+class ActionType(str, Enum):
+    """
+    Types d'actions d'automatisation (membres comparables à leur valeur str)
     """
     SEND_EMAIL = "send_email"
     UPDATE_SCORE = "update_score"
@@ -34,9 +74,13 @@ class ActionType(Enum):
     TRIGGER_WEBHOOK = "trigger_webhook"
 
 
-class TriggerType(Enum):
+class TriggerType(str, Enum):
     """
     Types de déclencheurs
+    
+    Les membres sont des str: hachage natif dans les index, et un
+    déclencheur brut (ex. "email_opened" reçu en JSON) retrouve les mêmes
+    entrées que le membre correspondant.
     """
     EMAIL_OPENED = "email_opened"
     EMAIL_CLICKED = "email_clicked"
@@ -49,46 +93,168 @@ class TriggerType(Enum):
     LEAD_SCORE_HIGH = "lead_score_high"
 
 
-@dataclass
+# Valeurs des enums précalculées (évite l'accès à .value à chaque sérialisation)
+_ACTION_VALUE: Dict[ActionType, str] = {a: a.value for a in ActionType}
+_TRIGGER_VALUE: Dict[TriggerType, str] = {t: t.value for t in TriggerType}
+
+
+@dataclass(slots=True)
 class AutomationAction:
     """
     Définition d'une action d'automatisation
     """
     action_type: ActionType
-    config: Dict
+    config: Mapping
     delay_minutes: int = 0  # Attendre X minutes avant d'exécuter
     
     def to_dict(self) -> Dict:
         return {
-            'action_type': self.action_type.value,
-            'config': self.config,
+            'action_type': _ACTION_VALUE[self.action_type],
+            'config': dict(self.config),
             'delay_minutes': self.delay_minutes
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class AutomationRule:
     """
     Définition d'une règle d'automatisation
+    
+    Le moteur indexe trigger, conditions, enabled et priority au moment de
+    add_rule: une fois la règle ajoutée, ces champs se modifient via
+    AutomationRuleEngine.update_rule (ou enable_rule/disable_rule), jamais
+    directement sur l'objet.
     """
     rule_id: str
     trigger: TriggerType
     conditions: Dict = field(default_factory=dict)
-    actions: List[AutomationAction] = field(default_factory=list)
+    actions: Tuple[AutomationAction, ...] = field(default_factory=tuple)
     enabled: bool = True
     priority: int = 50  # 1-100, plus élevé = priorité plus haute
     description: str = ""
+    _cond: RuleConditions = field(default=_NO_CONDITIONS, init=False, repr=False, compare=False)
+    _json_cache: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Tuple: partageable tel quel par get_actions_for_event
+        self.actions = tuple(self.actions)
     
     def to_dict(self) -> Dict:
         return {
             'rule_id': self.rule_id,
-            'trigger': self.trigger.value,
+            'trigger': _TRIGGER_VALUE[self.trigger],
             'conditions': self.conditions,
             'actions': [a.to_dict() for a in self.actions],
             'enabled': self.enabled,
             'priority': self.priority,
             'description': self.description
         }
+    
+    def to_json(self) -> bytes:
+        """
+        Sérialisation JSON de la règle, mise en cache jusqu'au prochain invalidate()
+        """
+        if self._json_cache is None:
+            self._json_cache = _dump_json(self.to_dict())
+        return self._json_cache
+    
+    def invalidate(self):
+        """
+        Oublie la sérialisation en cache (à appeler après toute modification)
+        """
+        self._json_cache = None
+
+
+# Champs d'une règle modifiables par AutomationRuleEngine.update_rule
+_UPDATABLE_RULE_FIELDS = frozenset(
+    ("trigger", "conditions", "actions", "enabled", "priority", "description")
+)
+
+
+# Règles par défaut: (rule_id, trigger, conditions, priority, description,
+# ((action_type, config, delay_minutes), ...))
+_DEFAULT_RULES = (
+    # Règle 1: Email Opened → +5 score
+    ("rule_email_opened", TriggerType.EMAIL_OPENED,
+     {"segment": ["Standard", "VIP"]}, 40,
+     "Increase score when email is opened", (
+         (ActionType.UPDATE_SCORE, MappingProxyType({"score_delta": +5, "reason": "Email opened"}), 0),
+     )),
+    # Règle 2: Email Clicked → +15 score + Tag "engaged"
+    ("rule_email_clicked", TriggerType.EMAIL_CLICKED,
+     {"segment": ["Standard", "VIP"]}, 60,
+     "High engagement: link click", (
+         (ActionType.UPDATE_SCORE, MappingProxyType({"score_delta": +15, "reason": "Link clicked in email"}), 0),
+         (ActionType.ADD_TAG, MappingProxyType({"tag": "engaged"}), 0),
+     )),
+    # Règle 3: Email Bounce → Flag email invalide
+    ("rule_email_bounce", TriggerType.EMAIL_BOUNCE,
+     {}, 80,
+     "Mark email as invalid on bounce", (
+         (ActionType.UPDATE_SCORE, MappingProxyType({"score_delta": -20, "reason": "Email bounced"}), 0),
+         (ActionType.ADD_TAG, MappingProxyType({"tag": "invalid_email"}), 0),
+     )),
+    # Règle 4: Achat completé → VIP treatment
+    ("rule_purchase", TriggerType.PURCHASE,
+     {"minimum_amount": 50}, 90,
+     "Purchase workflow", (
+         (ActionType.UPDATE_SCORE, MappingProxyType({"score_delta": +50, "reason": "Purchase completed"}), 0),
+         (ActionType.SEND_EMAIL, MappingProxyType({
+             "template": "thank_you",
+             "subject": "Merci pour votre achat!"
+         }), 5),
+         (ActionType.CREATE_TASK, MappingProxyType({"task": "Follow-up call"}), 1440),  # 24h later
+     )),
+    # Règle 5: High score → VIP follow-up
+    ("rule_high_score", TriggerType.LEAD_SCORE_HIGH,
+     {"score_threshold": 80}, 95,
+     "VIP lead nurturing", (
+         (ActionType.SEND_EMAIL, MappingProxyType({
+             "template": "vip_offer",
+             "subject": "Offre VIP exclusive"
+         }), 0),
+         (ActionType.SCHEDULE_CALL, MappingProxyType({"priority": "high"}), 120),  # 2h later
+     )),
+    # Règle 6: Unsubscribe → Respect opt-out
+    ("rule_unsubscribe", TriggerType.UNSUBSCRIBE,
+     {}, 100,  # Highest priority
+     "Respect unsubscribe immediately", (
+         (ActionType.UPDATE_SCORE, MappingProxyType({"score_delta": -100, "reason": "Unsubscribed"}), 0),
+         (ActionType.ADD_TAG, MappingProxyType({"tag": "unsubscribed"}), 0),
+     )),
+)
+
+
+def _build_rule(row: Tuple) -> AutomationRule:
+    """
+    Construit une règle à partir d'une ligne de _DEFAULT_RULES
+
+    Les configs d'actions (MappingProxyType en lecture seule) sont partagées
+    entre moteurs; les conditions sont copiées.
+    """
+    rule_id, trigger, conditions, priority, description, actions = row
+    return AutomationRule(
+        rule_id=rule_id,
+        trigger=trigger,
+        conditions=dict(conditions),
+        actions=tuple(
+            AutomationAction(action_type=action_type, config=config, delay_minutes=delay)
+            for action_type, config, delay in actions
+        ),
+        priority=priority,
+        description=description
+    )
+
+
+@dataclass(frozen=True)
+class EngineStats:
+    """
+    Instantané des règles d'un moteur (servi depuis le cache du moteur)
+    """
+    total: int
+    enabled: int
+    by_trigger: Mapping[str, int]  # Règles actives par déclencheur
+    by_priority_bucket: Mapping[int, int]  # Toutes les règles, par dizaine de priorité
 
 
 class AutomationRuleEngine:
@@ -101,135 +267,29 @@ class AutomationRuleEngine:
         Initialise le moteur de règles
         """
         self.rules: List[AutomationRule] = []
+        # Index des règles actives par déclencheur, triées par priorité décroissante
+        self._by_trigger: Dict[TriggerType, List[AutomationRule]] = defaultdict(list)
+        # Clés de tri (-priorité, ordre d'ajout) parallèles à _by_trigger
+        self._trigger_keys: Dict[TriggerType, List[Tuple[int, int]]] = defaultdict(list)
+        self._rule_seq: Dict[str, int] = {}
+        # Seuils de score distincts: bornes des tranches de score
+        self._score_thresholds: List[int] = []
+        # Table de dispatch compilée (trigger, segment, tranche de score) -> actions
+        self._dispatch: Dict[DispatchKey, Tuple[AutomationAction, ...]] = {}
+        self._compiled_segments: Optional[Tuple[Optional[str], ...]] = None
+        # Mémo des règles applicables par (trigger, segment, tranche de score)
+        self._lookup = lru_cache(maxsize=RULE_LOOKUP_CACHE_SIZE)(self._match_rules)
+        self._stats: Optional[EngineStats] = None
         self._load_default_rules()
     
     def _load_default_rules(self):
         """
         Charge les règles d'automatisation par défaut
         """
-        # Règle 1: Email Opened → +5 score
-        self.add_rule(AutomationRule(
-            rule_id="rule_email_opened",
-            trigger=TriggerType.EMAIL_OPENED,
-            conditions={"segment": ["Standard", "VIP"]},
-            actions=[
-                AutomationAction(
-                    action_type=ActionType.UPDATE_SCORE,
-                    config={"score_delta": +5, "reason": "Email opened"}
-                )
-            ],
-            priority=40,
-            description="Increase score when email is opened"
-        ))
-        
-        # Règle 2: Email Clicked → +15 score + Tag "engaged"
-        self.add_rule(AutomationRule(
-            rule_id="rule_email_clicked",
-            trigger=TriggerType.EMAIL_CLICKED,
-            conditions={"segment": ["Standard", "VIP"]},
-            actions=[
-                AutomationAction(
-                    action_type=ActionType.UPDATE_SCORE,
-                    config={"score_delta": +15, "reason": "Link clicked in email"}
-                ),
-                AutomationAction(
-                    action_type=ActionType.ADD_TAG,
-                    config={"tag": "engaged"},
-                    delay_minutes=0
-                )
-            ],
-            priority=60,
-            description="High engagement: link click"
-        ))
-        
-        # Règle 3: Email Bounce → Flag email invalide
-        self.add_rule(AutomationRule(
-            rule_id="rule_email_bounce",
-            trigger=TriggerType.EMAIL_BOUNCE,
-            actions=[
-                AutomationAction(
-                    action_type=ActionType.UPDATE_SCORE,
-                    config={"score_delta": -20, "reason": "Email bounced"}
-                ),
-                AutomationAction(
-                    action_type=ActionType.ADD_TAG,
-                    config={"tag": "invalid_email"}
-                )
-            ],
-            priority=80,
-            description="Mark email as invalid on bounce"
-        ))
-        
-        # Règle 4: Achat completé → VIP treatment
-        self.add_rule(AutomationRule(
-            rule_id="rule_purchase",
-            trigger=TriggerType.PURCHASE,
-            conditions={"minimum_amount": 50},
-            actions=[
-                AutomationAction(
-                    action_type=ActionType.UPDATE_SCORE,
-                    config={"score_delta": +50, "reason": "Purchase completed"}
-                ),
-                AutomationAction(
-                    action_type=ActionType.SEND_EMAIL,
-                    config={
-                        "template": "thank_you",
-                        "subject": "Merci pour votre achat!"
-                    },
-                    delay_minutes=5
-                ),
-                AutomationAction(
-                    action_type=ActionType.CREATE_TASK,
-                    config={"task": "Follow-up call"},
-                    delay_minutes=1440  # 24h later
-                )
-            ],
-            priority=90,
-            description="Purchase workflow"
-        ))
-        
-        # Règle 5: High score → VIP follow-up
-        self.add_rule(AutomationRule(
-            rule_id="rule_high_score",
-            trigger=TriggerType.LEAD_SCORE_HIGH,
-            conditions={"score_threshold": 80},
-            actions=[
-                AutomationAction(
-                    action_type=ActionType.SEND_EMAIL,
-                    config={
-                        "template": "vip_offer",
-                        "subject": "Offre VIP exclusive"
-                    }
-                ),
-                AutomationAction(
-                    action_type=ActionType.SCHEDULE_CALL,
-                    config={"priority": "high"},
-                    delay_minutes=120  # 2h later
-                )
-            ],
-            priority=95,
-            description="VIP lead nurturing"
-        ))
-        
-        # Règle 6: Unsubscribe → Respect opt-out
-        self.add_rule(AutomationRule(
-            rule_id="rule_unsubscribe",
-            trigger=TriggerType.UNSUBSCRIBE,
-            actions=[
-                AutomationAction(
-                    action_type=ActionType.UPDATE_SCORE,
-                    config={"score_delta": -100, "reason": "Unsubscribed"}
-                ),
-                AutomationAction(
-                    action_type=ActionType.ADD_TAG,
-                    config={"tag": "unsubscribed"}
-                )
-            ],
-            priority=100,  # Highest priority
-            description="Respect unsubscribe immediately"
-        ))
-        
-        logger.info("✅ 6 default automation rules loaded")
+        for row in _DEFAULT_RULES:
+            self.add_rule(_build_rule(row))
+        
+        logger.info(f"✅ {len(_DEFAULT_RULES)} default automation rules loaded")
     
     def add_rule(self, rule: AutomationRule):
         """
@@ -238,79 +298,313 @@ class AutomationRuleEngine:
         Args:
             rule: AutomationRule
         """
+        rule._cond = _compile_conditions(rule.conditions)
+        self._rule_seq[rule.rule_id] = len(self.rules)
         self.rules.append(rule)
-        logger.debug(f"   Added rule: {rule.rule_id}")
+        if rule.enabled:
+            self._index_rule(rule)
+        
+        threshold = rule.conditions.get("score_threshold")
+        if threshold is not None and threshold not in self._score_thresholds:
+            insort(self._score_thresholds, threshold)
+        
+        self._rules_changed()
+        logger.debug("   Added rule: %s", rule.rule_id)
+    
+    def update_rule(self, rule_id: str, /, **changes) -> bool:
+        """
+        Modifie une règle déjà ajoutée et met à jour les index du moteur
+        
+        Args:
+            rule_id: Identifiant de la règle
+            **changes: Nouvelles valeurs (trigger, conditions, actions,
+                enabled, priority, description)
+        
+        Returns:
+            True si la règle existe
+        """
+        unknown = set(changes) - _UPDATABLE_RULE_FIELDS
+        if unknown:
+            raise ValueError(f"Champs non modifiables: {', '.join(sorted(unknown))}")
+        
+        rule = self._find_rule(rule_id)
+        if rule is None:
+            return False
+        
+        # Retirer avant modification: l'index est rangé par trigger et priorité
+        if rule.enabled:
+            self._unindex_rule(rule)
+        
+        for name, value in changes.items():
+            setattr(rule, name, value)
+        rule.actions = tuple(rule.actions)
+        rule._cond = _compile_conditions(rule.conditions)
+        rule.invalidate()
+        
+        if rule.enabled:
+            self._index_rule(rule)
+        
+        self._score_thresholds = sorted({
+            r.conditions["score_threshold"]
+            for r in self.rules if "score_threshold" in r.conditions
+        })
+        
+        self._rules_changed()
+        logger.debug("   Updated rule: %s", rule_id)
+        return True
+    
+    def _index_rule(self, rule: AutomationRule):
+        """
+        Insère une règle à sa place dans l'index de son déclencheur
+        
+        Args:
+            rule: AutomationRule
+        """
+        sort_key = (-rule.priority, self._rule_seq[rule.rule_id])
+        keys = self._trigger_keys[rule.trigger]
+        position = bisect_right(keys, sort_key)
+        keys.insert(position, sort_key)
+        self._by_trigger[rule.trigger].insert(position, rule)
+    
+    def _unindex_rule(self, rule: AutomationRule):
+        """
+        Retire une règle de l'index de son déclencheur
+        
+        Args:
+            rule: AutomationRule
+        """
+        indexed = self._by_trigger[rule.trigger]
+        for position, candidate in enumerate(indexed):
+            if candidate is rule:
+                del indexed[position]
+                del self._trigger_keys[rule.trigger][position]
+                return
+    
+    def _find_rule(self, rule_id: str) -> Optional[AutomationRule]:
+        """
+        Retrouve une règle par son identifiant
+        """
+        for rule in self.rules:
+            if rule.rule_id == rule_id:
+                return rule
+        logger.warning(f"⚠️ Unknown automation rule: {rule_id}")
+        return None
+    
+    def enable_rule(self, rule_id: str) -> bool:
+        """
+        Active une règle et la réintègre dans l'index
+        
+        Args:
+            rule_id: Identifiant de la règle
+        
+        Returns:
+            True si la règle existe
+        """
+        rule = self._find_rule(rule_id)
+        if rule is None:
+            return False
+        
+        if not rule.enabled:
+            rule.enabled = True
+            rule.invalidate()
+            self._index_rule(rule)
+            self._rules_changed()
+            logger.debug("   Enabled rule: %s", rule_id)
+        return True
+    
+    def disable_rule(self, rule_id: str) -> bool:
+        """
+        Désactive une règle et la retire de l'index
+        
+        Args:
+            rule_id: Identifiant de la règle
+        
+        Returns:
+            True si la règle existe
+        """
+        rule = self._find_rule(rule_id)
+        if rule is None:
+            return False
+        
+        if rule.enabled:
+            rule.enabled = False
+            rule.invalidate()
+            self._unindex_rule(rule)
+            self._rules_changed()
+            logger.debug("   Disabled rule: %s", rule_id)
+        return True
+    
+    def invalidate_cache(self):
+        """
+        Vide le mémo des règles applicables
+        """
+        self._lookup.cache_clear()
+    
+    def _rules_changed(self):
+        """
+        Vide le mémo et les stats, recompile la table de dispatch si elle a été compilée
+        """
+        self.invalidate_cache()
+        self._stats = None
+        if self._compiled_segments is not None:
+            self.compile(self._compiled_segments)
+    
+    @property
+    def stats(self) -> "EngineStats":
+        """
+        Résumé des règles chargées, recalculé seulement après une modification
+        """
+        if self._stats is None:
+            by_priority_bucket: Dict[int, int] = defaultdict(int)
+            for rule in self.rules:
+                by_priority_bucket[rule.priority // 10 * 10] += 1
+            
+            self._stats = EngineStats(
+                total=len(self.rules),
+                enabled=sum(len(rules) for rules in self._by_trigger.values()),
+                by_trigger=MappingProxyType({
+                    _TRIGGER_VALUE[trigger]: len(rules)
+                    for trigger, rules in self._by_trigger.items() if rules
+                }),
+                by_priority_bucket=MappingProxyType(dict(sorted(by_priority_bucket.items())))
+            )
+        return self._stats
+    
+    def _score_bucket(self, score: Optional[int]) -> Optional[int]:
+        """
+        Tranche de score: nombre de seuils atteints (None si pas de score)
+        
+        Deux scores de la même tranche satisfont exactement les mêmes
+        conditions score_threshold.
+        """
+        if score is None:
+            return None
+        return bisect_right(self._score_thresholds, score)
+    
+    def _bucket_score(self, bucket: Optional[int]) -> Optional[int]:
+        """
+        Score représentatif d'une tranche (inverse de _score_bucket)
+        """
+        if bucket is None:
+            return None
+        thresholds = self._score_thresholds
+        if bucket == 0:
+            return thresholds[0] - 1 if thresholds else 0
+        return thresholds[bucket - 1]
+    
+    def compile(self, segments: Iterable[Optional[str]]):
+        """
+        Précalcule les actions de chaque (trigger, segment, tranche de score)
+        
+        Les événements dont le segment a été compilé sont ensuite servis par
+        une simple lecture de dictionnaire. La table est recompilée à chaque
+        ajout, modification, activation ou désactivation de règle.
+        
+        Args:
+            segments: Segments clients à précalculer (None est toujours inclus)
+        """
+        segments = tuple(dict.fromkeys((None, *segments)))
+        buckets = (None, *range(len(self._score_thresholds) + 1))
+        
+        dispatch = {}
+        for trigger in TriggerType:
+            for segment in segments:
+                for bucket in buckets:
+                    rules = self._lookup(trigger, segment, bucket)
+                    dispatch[(trigger, segment, bucket)] = self._collect_actions(rules)
+        
+        self._dispatch = dispatch
+        self._compiled_segments = segments
+        logger.debug("   Compiled dispatch table: %d entries", len(dispatch))
     
     def get_applicable_rules(
         self,
-        trigger: TriggerType,
+        trigger: Union[TriggerType, str],
         client_segment: Optional[str] = None,
         score: Optional[int] = None
-    ) -> List[AutomationRule]:
+    ) -> Tuple[AutomationRule, ...]:
         """
         Obtient les règles applicables pour un trigger donné
         
         Args:
-            trigger: Type de déclencheur
+            trigger: Type de déclencheur (membre ou valeur str)
             client_segment: Segment client (optionnel)
             score: Score client (optionnel)
         
         Returns:
-            Liste de règles applicables, triées par priorité
+            Règles applicables, triées par priorité
+        """
+        return self._lookup(trigger, client_segment, self._score_bucket(score))
+    
+    def _match_rules(
+        self,
+        trigger: TriggerType,
+        client_segment: Optional[str],
+        bucket: Optional[int]
+    ) -> Tuple[AutomationRule, ...]:
         """
+        Filtre les règles actives du trigger (résultat mémorisé par _lookup)
+        """
+        score = self._bucket_score(bucket)
         applicable = []
         
-        for rule in self.rules:
-            if not rule.enabled:
+        for rule in self._by_trigger.get(trigger, ()):
+            # Vérifier conditions (compilées dans add_rule)
+            allowed, threshold = rule._cond
+            if allowed is not None and client_segment and client_segment not in allowed:
                 continue
-            
-            # Vérifier trigger
-            if rule.trigger != trigger:
+            if score is not None and score < threshold:
                 continue
             
-            # Vérifier conditions
-            if rule.conditions:
-                # Vérifier segment si demandé
-                if "segment" in rule.conditions and client_segment:
-                    if client_segment not in rule.conditions["segment"]:
-                        continue
-                
-                # Vérifier score minimum si demandé
-                if "score_threshold" in rule.conditions and score:
-                    if score < rule.conditions["score_threshold"]:
-                        continue
-            
             applicable.append(rule)
         
-        # Trier par priorité (descendante)
-        applicable.sort(key=lambda r: r.priority, reverse=True)
-        
-        return applicable
+        return tuple(applicable)
     
     def get_actions_for_event(
         self,
-        trigger: TriggerType,
+        trigger: Union[TriggerType, str],
         client_segment: Optional[str] = None,
         score: Optional[int] = None
-    ) -> List[AutomationAction]:
+    ) -> Tuple[AutomationAction, ...]:
         """
         Obtient toutes les actions à exécuter pour un événement
         
         Args:
-            trigger: Type déclencheur
+            trigger: Type déclencheur (membre ou valeur str)
             client_segment: Segment client
             score: Score client
         
         Returns:
-            Liste d'actions à exécuter
+            Actions à exécuter, par priorité de règle
         """
-        rules = self.get_applicable_rules(trigger, client_segment, score)
-        actions = []
-        
-        for rule in rules:
-            actions.extend(rule.actions)
+        if self._dispatch:
+            compiled = self._dispatch.get((trigger, client_segment, self._score_bucket(score)))
+            if compiled is not None:
+                return compiled
         
-        return actions
+        return self._collect_actions(self.get_applicable_rules(trigger, client_segment, score))
+    
+    @staticmethod
+    def _collect_actions(rules: Tuple[AutomationRule, ...]) -> Tuple[AutomationAction, ...]:
+        """
+        Actions des règles, dans l'ordre; sans copie quand une seule règle s'applique
+        """
+        if not rules:
+            return ()
+        if len(rules) == 1:
+            return rules[0].actions
+        return tuple(chain.from_iterable(rule.actions for rule in rules))
+    
+    def get_actions_list(
+        self,
+        trigger: Union[TriggerType, str],
+        client_segment: Optional[str] = None,
+        score: Optional[int] = None
+    ) -> List[AutomationAction]:
+        """
+        Comme get_actions_for_event, mais renvoie une liste
+        """
+        return list(self.get_actions_for_event(trigger, client_segment, score))
     
     def save_rules(self, output_file: Optional[str] = None):
         """
@@ -328,10 +622,14 @@ class AutomationRuleEngine:
             
             Path(output_file).parent.mkdir(parents=True, exist_ok=True)
             
-            rules_data = [rule.to_dict() for rule in self.rules]
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(rules_data, f, indent=2, ensure_ascii=False)
+            # Écriture règle par règle: pas de liste complète en mémoire
+            with open(output_file, 'wb') as f:
+                f.write(b'[\n')
+                for i, rule in enumerate(self.rules):
+                    if i:
+                        f.write(b',\n')
+                    f.write(rule.to_json())
+                f.write(b'\n]\n')
             
             logger.info(f"✅ Rules sauvegardées: {output_file}")
             
@@ -339,6 +637,41 @@ class AutomationRuleEngine:
             logger.error(f"❌ Erreur sauvegarde: {str(e)}")
 
 
+def _calc_score_scalar(
+    base_score: int,
+    rfm_score: float,
+    engagement_events: int,
+    purchases: int,
+    days_since_purchase: int
+) -> int:
+    """
+    Calcul du score de lead, en arithmétique pure sur des int/float
+    """
+    score = base_score
+    
+    # RFM contribution (max +40)
+    score += int(rfm_score * 10)
+    
+    # Engagement contribution (max +20)
+    engagement = engagement_events * 2
+    score += engagement if engagement < 20 else 20
+    
+    # Purchase contribution (max +25)
+    purchase = purchases * 5
+    score += purchase if purchase < 25 else 25
+    
+    # Recency penalty (max -30)
+    if days_since_purchase > 180:
+        score -= 30
+    elif days_since_purchase > 90:
+        score -= 15
+    elif days_since_purchase > 30:
+        score -= 5
+    
+    # Cap score (0-100)
+    return 0 if score < 0 else (100 if score > 100 else score)
+
+
 class ScoreCalculator:
     """
     Calcule le score de lead dynamiquement
@@ -369,27 +702,36 @@ class ScoreCalculator:
         Returns:
             Score global (0-100)
         """
-        score = self.base_score
-        
-        # RFM contribution (max +40)
-        score += int(rfm_score * 10)
-        
-        # Engagement contribution (max +20)
-        score += min(engagement_events * 2, 20)
-        
-        # Purchase contribution (max +25)
-        score += min(purchases * 5, 25)
+        return _calc_score_scalar(
+            self.base_score, rfm_score, engagement_events, purchases, days_since_purchase
+        )
+    
+    def calculate_scores_batch(
+        self,
+        rfm_scores: Iterable[float],
+        engagement_events: Iterable[int],
+        purchases: Iterable[int],
+        days_since_purchase: Iterable[int]
+    ) -> List[int]:
+        """
+        Calcule le score de lead pour un lot de leads
         
-        # Recency penalty (max -30)
-        if days_since_purchase > 180:
-            score -= 30
-        elif days_since_purchase > 90:
-            score -= 15
-        elif days_since_purchase > 30:
-            score -= 5
+        Args:
+            rfm_scores: Scores RFM (0-4)
+            engagement_events: Nombres d'événements engagement
+            purchases: Nombres d'achats
+            days_since_purchase: Jours depuis dernier achat
         
-        # Cap score (0-100)
-        return max(0, min(100, score))
+        Returns:
+            Scores globaux (0-100), dans l'ordre des entrées
+        """
+        base = self.base_score
+        return [
+            _calc_score_scalar(base, rfm, events, bought, days)
+            for rfm, events, bought, days in zip(
+                rfm_scores, engagement_events, purchases, days_since_purchase
+            )
+        ]
 
 
 if __name__ == '__main__':
@@ -400,7 +742,7 @@ if __name__ == '__main__':
     # Initialiser moteur
     engine = AutomationRuleEngine()
     
-    print(f"\n✅ {len(engine.rules)} rules loaded")
+    print(f"\n✅ {engine.stats.total} rules loaded")
     
     # Exemple: Email ouvert
     print("\n1️⃣ Trigger: Email Opened")
@@ -410,7 +752,7 @@ if __name__ == '__main__':
         client_segment="VIP"
     )
     for action in actions:
-        print(f"   → {action.action_type.value}: {action.config}")
+        print(f"   → {action.action_type.value}: {dict(action.config)}")
     
     # Exemple: Lien cliqué
     print("\n2️⃣ Trigger: Email Clicked")
@@ -419,7 +761,7 @@ if __name__ == '__main__':
         client_segment="Standard"
     )
     for action in actions:
-        print(f"   → {action.action_type.value}: {action.config}")
+        print(f"   → {action.action_type.value}: {dict(action.config)}")
     
     # Exemple: Score calc
     print("\n3️⃣ Score Calculation")
@@ -0,0 +1,203 @@
+"""
+Envoi asynchrone des emails de recommandations Brevo
+Version: 1.0
+Auteur: Projet CRM Ruhlmann
+
+Rôle: Envoyer une campagne de recommandations en parallèle
+  - Un seul client HTTP (pool keep-alive) pour toute la campagne
+  - Concurrence bornée par un sémaphore
+  - Mêmes templates et mêmes résultats que send_recommendations_email
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+import httpx
+
+from etl.config import logger
+from etl.brevo_integration import (
+    BrevoClient,
+    build_email_payload,
+    build_recommendation_email,
+)
+
+MAX_CONCURRENCY = 64  # Requêtes Brevo simultanées
+REQUEST_TIMEOUT = 10  # Secondes, comme BrevoClient.send_email
+
+
+async def _send_one(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    recommendation: Dict,
+    payload: Dict
+) -> Dict:
+    """
+    Envoie un email déjà construit, en respectant la limite de concurrence
+
+    Args:
+        client: Client HTTP partagé
+        semaphore: Limite de requêtes simultanées
+        recommendation: Recommandation d'origine (email, scenario)
+        payload: Corps POST /smtp/email
+
+    Returns:
+        Dict avec statut envoi
+    """
+    email = recommendation['email']
+
+    try:
+        async with semaphore:
+            response = await client.post("/smtp/email", json=payload)
+
+        if response.status_code in [200, 201]:
+            message_id = response.json().get('messageId')
+            logger.debug(f"✅ Email envoyé: {email}")
+            return {
+                'success': True,
+                'email': email,
+                'status': 'sent',
+                'message_id': message_id,
+                'template': recommendation['scenario']
+            }
+
+        logger.warning(f"⚠️ Erreur envoi {email}: {response.status_code}")
+        return {
+            'success': False,
+            'email': email,
+            'status': 'error',
+            'error': response.status_code
+        }
+
+    except Exception as e:
+        # Toujours un résultat par email: une erreur ne doit pas faire perdre
+        # les statuts des emails déjà partis
+        logger.error(f"❌ Erreur envoi email {email}: {str(e)}")
+        return {
+            'success': False,
+            'email': email,
+            'status': 'exception',
+            'error': str(e)
+        }
+
+
+async def send_recommendations_email_batch(
+    recommendations: List[Dict],
+    api_key: Optional[str] = None,
+    concurrency: int = MAX_CONCURRENCY,
+    brevo: Optional[BrevoClient] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> List[Dict]:
+    """
+    Envoie une campagne d'emails de recommandation en parallèle
+
+    Args:
+        recommendations: Dicts avec les arguments de send_recommendations_email
+            (client_code, email, client_name, scenario, products)
+        api_key: Clé API Brevo (défaut: variable d'environnement BREVO_API_KEY)
+        concurrency: Nombre maximum de requêtes simultanées
+        brevo: Client dont le journal reçoit les contacts (défaut: nouveau client)
+        transport: Transport httpx (tests)
+
+    Returns:
+        Un dict de statut par recommandation, dans l'ordre d'entrée
+    """
+    owns_client = brevo is None
+    if owns_client:
+        brevo = BrevoClient(api_key)
+
+    try:
+        results = await _send_batch(brevo, recommendations, concurrency, transport)
+    finally:
+        if owns_client:
+            brevo.close()
+
+    # Log, comme send_recommendations_email
+    for rec, result in zip(recommendations, results):
+        if 'status' in result:
+            brevo.log_contact({
+                'client_code': rec['client_code'],
+                'email': rec['email'],
+                'scenario': rec['scenario'],
+                'status': result['status'],
+                'message_id': result.get('message_id')
+            })
+
+    success_count = sum(1 for r in results if r.get('success'))
+    logger.info(f"📧 Campagne envoyée: {success_count}/{len(results)} emails OK")
+
+    return results
+
+
+async def _send_batch(
+    brevo: BrevoClient,
+    recommendations: List[Dict],
+    concurrency: int,
+    transport: Optional[httpx.AsyncBaseTransport]
+) -> List[Dict]:
+    """
+    Construit et envoie les emails; un dict de statut par recommandation
+    """
+    results: List[Optional[Dict]] = [None] * len(recommendations)
+    pending = []
+
+    # Construire les emails; les scénarios inconnus ne partent pas
+    for i, rec in enumerate(recommendations):
+        email_content = build_recommendation_email(
+            rec['client_name'], rec['scenario'], rec['products']
+        )
+        if email_content is None:
+            logger.warning(f"⚠️ Scenario inconnu: {rec['scenario']}")
+            results[i] = {'success': False, 'error': f"Unknown scenario: {rec['scenario']}"}
+            continue
+
+        subject, html = email_content
+        if not brevo.api_key:
+            # Mode démo: pas de requête réseau
+            results[i] = brevo.send_email(
+                recipient_email=rec['email'],
+                recipient_name=rec['client_name'],
+                subject=subject,
+                html_content=html,
+                template_name=rec['scenario']
+            )
+            continue
+
+        payload = build_email_payload(rec['email'], rec['client_name'], subject, html)
+        pending.append((i, rec, payload))
+
+    if pending:
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(
+            max_connections=concurrency,
+            max_keepalive_connections=concurrency
+        )
+
+        async with httpx.AsyncClient(
+            base_url=brevo.base_url,
+            headers=brevo.headers,
+            limits=limits,
+            timeout=REQUEST_TIMEOUT,
+            transport=transport
+        ) as client:
+            sent = await asyncio.gather(*(
+                _send_one(client, semaphore, rec, payload)
+                for _, rec, payload in pending
+            ))
+
+        for (i, _, _), result in zip(pending, sent):
+            results[i] = result
+
+    return results
+
+
+def run_recommendations_email_batch(
+    recommendations: List[Dict],
+    api_key: Optional[str] = None,
+    concurrency: int = MAX_CONCURRENCY
+) -> List[Dict]:
+    """
+    Point d'entrée synchrone (CLI) de send_recommendations_email_batch
+    """
+    return asyncio.run(
+        send_recommendations_email_batch(recommendations, api_key, concurrency)
+    )
@@ -21,11 +21,40 @@ from pathlib import Path
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError:
     requests = None
 
 from etl.config import logger, CURATED_DIR
 
+# Pool de connexions HTTP(S) keep-alive partagé par les appels d'un client
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 50
+
+
+SENDER = {
+    "name": "Domaine du Vieux Lavoir",
+    "email": "recommendations@ruhlmann.fr"
+}
+
+
+def build_email_payload(
+    recipient_email: str,
+    recipient_name: str,
+    subject: str,
+    html_content: str
+) -> Dict:
+    """
+    Construit le corps de la requête Brevo POST /smtp/email
+    """
+    return {
+        "to": [{"email": recipient_email, "name": recipient_name}],
+        "subject": subject,
+        "htmlContent": html_content,
+        "sender": SENDER
+    }
+
 
 class BrevoClient:
     """
@@ -51,6 +80,44 @@ class BrevoClient:
             "Content-Type": "application/json"
         }
         self.contact_log = []
+        self.session = self._create_session() if requests else None
+    
+    def _create_session(self) -> "requests.Session":
+        """
+        Crée une session HTTP réutilisant les connexions TCP/TLS vers Brevo
+        
+        Les erreurs transitoires (429, 5xx) sont réessayées avec backoff pour
+        les méthodes idempotentes; les POST ne sont jamais rejoués, pour ne
+        pas envoyer deux fois le même email.
+        """
+        session = requests.Session()
+        session.headers.update(self.headers)
+        
+        adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS,
+            pool_maxsize=POOL_MAXSIZE,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504]
+            )
+        )
+        session.mount('https://', adapter)
+        
+        return session
+    
+    def close(self):
+        """
+        Ferme les connexions du pool
+        """
+        if self.session is not None:
+            self.session.close()
+    
+    def __enter__(self) -> "BrevoClient":
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
     
     def test_connection(self) -> bool:
         """
@@ -68,9 +135,8 @@ class BrevoClient:
             return False
         
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/account",
-                headers=self.headers,
                 timeout=5
             )
             
@@ -108,10 +174,9 @@ class BrevoClient:
                 "attributes": attributes
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/contacts",
                 json=payload,
-                headers=self.headers,
                 timeout=10
             )
             
@@ -159,20 +224,11 @@ class BrevoClient:
             }
         
         try:
-            payload = {
-                "to": [{"email": recipient_email, "name": recipient_name}],
-                "subject": subject,
-                "htmlContent": html_content,
-                "sender": {
-                    "name": "Domaine du Vieux Lavoir",
-                    "email": "recommendations@ruhlmann.fr"
-                }
-            }
+            payload = build_email_payload(recipient_email, recipient_name, subject, html_content)
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/smtp/email",
                 json=payload,
-                headers=self.headers,
                 timeout=10
             )
             
@@ -428,55 +484,84 @@ class EmailTemplates:
         return subject, html
 
 
-def send_recommendations_email(
-    client_code: str,
-    email: str,
+def build_recommendation_email(
     client_name: str,
     scenario: str,
     products: List[Dict]
-) -> Dict:
+) -> Optional[tuple[str, str]]:
     """
-    Fonction utilitaire: Envoyer un email de recommandation
+    Choisit et remplit le template du scénario de recommandation
     
     Args:
-        client_code: Code client
-        email: Email destinataire
         client_name: Nom client
         scenario: Type recommendation (rebuy, cross-sell, winback)
         products: Liste de produits recommandés
     
     Returns:
-        Dict avec statut envoi
+        (subject, html_content), ou None si le scénario est inconnu ou
+        n'a pas assez de produits
     """
-    brevo = BrevoClient()
-    
-    # Générer le template
     if scenario == 'rebuy' and products:
         product = products[0]
-        subject, html = EmailTemplates.rebuy_template(
+        return EmailTemplates.rebuy_template(
             client_name=client_name,
             product_name=product.get('name', 'Produit'),
             product_desc=product.get('description', ''),
             price=product.get('price', 'N/A')
         )
     
-    elif scenario == 'cross-sell' and len(products) >= 2:
-        subject, html = EmailTemplates.crosssell_template(
+    if scenario == 'cross-sell' and len(products) >= 2:
+        return EmailTemplates.crosssell_template(
             client_name=client_name,
             product_name=products[0].get('name', 'Produit 1'),
             complement_name=products[1].get('name', 'Produit 2'),
             reason='Accord parfait avec vos préférences'
         )
     
-    elif scenario == 'winback':
-        subject, html = EmailTemplates.winback_template(
+    if scenario == 'winback':
+        return EmailTemplates.winback_template(
             client_name=client_name,
             last_purchase='quelques mois'
         )
     
-    else:
+    return None
+
+
+def send_recommendations_email(
+    client_code: str,
+    email: str,
+    client_name: str,
+    scenario: str,
+    products: List[Dict],
+    brevo: Optional[BrevoClient] = None
+) -> Dict:
+    """
+    Fonction utilitaire: Envoyer un email de recommandation
+    
+    Args:
+        client_code: Code client
+        email: Email destinataire
+        client_name: Nom client
+        scenario: Type recommendation (rebuy, cross-sell, winback)
+        products: Liste de produits recommandés
+        brevo: Client à réutiliser (et son pool de connexions) pour une campagne
+    
+    Returns:
+        Dict avec statut envoi
+    """
+    if brevo is None:
+        # Client propre à cet appel: fermer son pool en sortant
+        with BrevoClient() as brevo:
+            return send_recommendations_email(
+                client_code, email, client_name, scenario, products, brevo
+            )
+    
+    # Générer le template
+    email_content = build_recommendation_email(client_name, scenario, products)
+    if email_content is None:
         logger.warning(f"⚠️ Scenario inconnu: {scenario}")
         return {'success': False, 'error': f'Unknown scenario: {scenario}'}
+    subject, html = email_content
     
     # Envoyer
     result = brevo.send_email(
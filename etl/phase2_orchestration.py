@@ -151,7 +151,8 @@ class Phase2Orchestrator:
                     email=email,
                     client_name=name,
                     scenario=rec['scenario'],
-                    products=rec['products']
+                    products=rec['products'],
+                    brevo=self.brevo
                 )
                 
                 # Logger le résultat
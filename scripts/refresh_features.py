@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""Nightly refresh of the customer_features_daily snapshot.
+
+Usage:
+    python scripts/refresh_features.py
+
+Schedule once a day (e.g. cron: 0 2 * * *) before recommendation runs
+that use RecommendationEngine(db, use_daily_snapshot=True).
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.db.database import SessionLocal
+from core.recommendation import FeatureComputer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main entry point."""
+    db = SessionLocal()
+    try:
+        count = FeatureComputer(db).refresh_daily_snapshot()
+        logger.info(f"✓ Snapshotted features for {count} customers")
+        sys.exit(0)
+    except Exception as e:
+        logger.error(f"✗ Failed to refresh customer features: {str(e)}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Tests for the automation rules engine."""
+
+from itertools import product
+
+import pytest
+
+from etl.automation_rules import (
+    ActionType,
+    AutomationAction,
+    AutomationRule,
+    AutomationRuleEngine,
+    ScoreCalculator,
+    TriggerType,
+)
+
+SEGMENTS = [None, "Standard", "VIP", "Prospect"]
+SCORES = [None, 0, 49, 50, 51, 79, 80, 81, 85, 100]
+
+
+def _rule_ids(rules):
+    return [rule.rule_id for rule in rules]
+
+
+def _score_rule(rule_id, threshold, priority=50):
+    return AutomationRule(
+        rule_id=rule_id,
+        trigger=TriggerType.LEAD_SCORE_HIGH,
+        conditions={"score_threshold": threshold},
+        actions=(AutomationAction(ActionType.ADD_TAG, {"tag": rule_id}),),
+        priority=priority,
+    )
+
+
+def _all_actions(engine):
+    return {
+        (trigger, segment, score): engine.get_actions_for_event(trigger, segment, score)
+        for trigger in TriggerType
+        for segment in SEGMENTS
+        for score in SCORES
+    }
+
+
+class TestGetApplicableRules:
+    """Test rule matching on score thresholds and segments."""
+
+    def test_high_score_rule_skips_zero_score(self):
+        """Test a score of 0 is below the threshold, not treated as missing."""
+        engine = AutomationRuleEngine()
+
+        assert engine.get_applicable_rules(TriggerType.LEAD_SCORE_HIGH, score=0) == ()
+        assert engine.get_actions_for_event(TriggerType.LEAD_SCORE_HIGH, score=0) == ()
+
+    @pytest.mark.parametrize("score, expected", [
+        (79, []),
+        (80, ["rule_high_score"]),
+        (81, ["rule_high_score"]),
+        (None, ["rule_high_score"]),
+    ])
+    def test_threshold_is_inclusive(self, score, expected):
+        """Test a score exactly at the threshold matches."""
+        engine = AutomationRuleEngine()
+
+        rules = engine.get_applicable_rules(TriggerType.LEAD_SCORE_HIGH, score=score)
+
+        assert _rule_ids(rules) == expected
+
+    @pytest.mark.parametrize("score, expected", [
+        (79, []),
+        (80, ["rule_high_score"]),
+        (84, ["rule_high_score"]),
+        (85, ["rule_high_score", "rule_85"]),
+        (86, ["rule_high_score", "rule_85"]),
+    ])
+    def test_thresholds_inside_a_bucket(self, score, expected):
+        """Test a new threshold splits the score buckets of memoized lookups."""
+        engine = AutomationRuleEngine()
+        engine.get_applicable_rules(TriggerType.LEAD_SCORE_HIGH, score=score)
+        engine.add_rule(_score_rule("rule_85", 85, priority=10))
+
+        rules = engine.get_applicable_rules(TriggerType.LEAD_SCORE_HIGH, score=score)
+
+        assert _rule_ids(rules) == expected
+
+    def test_segment_filter(self):
+        """Test segment conditions, and that a missing segment matches every rule."""
+        engine = AutomationRuleEngine()
+
+        assert _rule_ids(engine.get_applicable_rules(TriggerType.EMAIL_OPENED, "VIP")) == [
+            "rule_email_opened"
+        ]
+        assert engine.get_applicable_rules(TriggerType.EMAIL_OPENED, "Prospect") == ()
+        assert _rule_ids(engine.get_applicable_rules(TriggerType.EMAIL_OPENED)) == [
+            "rule_email_opened"
+        ]
+
+    def test_raw_trigger_value(self):
+        """Test a str trigger finds the same rules as the enum member."""
+        engine = AutomationRuleEngine()
+
+        assert engine.get_applicable_rules("email_bounce") == engine.get_applicable_rules(
+            TriggerType.EMAIL_BOUNCE
+        )
+
+
+class TestCompiledDispatch:
+    """Test the compiled dispatch table against the uncompiled lookups."""
+
+    def test_compile_matches_lookup(self):
+        """Test compiling does not change the actions of any event."""
+        expected = _all_actions(AutomationRuleEngine())
+        engine = AutomationRuleEngine()
+
+        engine.compile(["Standard", "VIP"])
+
+        assert engine._dispatch
+        assert _all_actions(engine) == expected
+
+    def test_compiled_table_follows_rule_changes(self):
+        """Test adding and disabling rules recompiles the table."""
+        engine = AutomationRuleEngine()
+        engine.compile(["VIP"])
+        assert engine.get_actions_for_event(TriggerType.LEAD_SCORE_HIGH, "VIP", 90)
+
+        engine.disable_rule("rule_high_score")
+        assert engine.get_actions_for_event(TriggerType.LEAD_SCORE_HIGH, "VIP", 90) == ()
+
+        engine.add_rule(_score_rule("rule_85", 85))
+        actions = engine.get_actions_for_event(TriggerType.LEAD_SCORE_HIGH, "VIP", 90)
+        assert [a.config["tag"] for a in actions] == ["rule_85"]
+        assert engine.get_actions_for_event(TriggerType.LEAD_SCORE_HIGH, "VIP", 84) == ()
+
+        uncompiled = AutomationRuleEngine()
+        uncompiled.disable_rule("rule_high_score")
+        uncompiled.add_rule(_score_rule("rule_85", 85))
+        assert _all_actions(engine) == _all_actions(uncompiled)
+
+    def test_priority_order(self):
+        """Test actions come out by descending rule priority, ties in insertion order."""
+        engine = AutomationRuleEngine()
+        engine.add_rule(_score_rule("low", 0, priority=10))
+        engine.add_rule(_score_rule("tie", 0, priority=95))
+        engine.compile([])
+
+        rules = engine.get_applicable_rules(TriggerType.LEAD_SCORE_HIGH, score=90)
+
+        assert _rule_ids(rules) == ["rule_high_score", "tie", "low"]
+
+
+class TestUpdateRule:
+    """Test changing registered rules through the engine."""
+
+    def test_priority_change_reorders(self):
+        """Test a new priority moves the rule in its trigger's order."""
+        engine = AutomationRuleEngine()
+        engine.add_rule(_score_rule("tie", 0, priority=10))
+        engine.compile([])
+
+        assert engine.update_rule("tie", priority=99)
+
+        rules = engine.get_applicable_rules(TriggerType.LEAD_SCORE_HIGH, score=90)
+        assert _rule_ids(rules) == ["tie", "rule_high_score"]
+
+    def test_conditions_change_moves_threshold(self):
+        """Test new conditions replace the rule's score threshold."""
+        engine = AutomationRuleEngine()
+        engine.compile(["VIP"])
+        engine.get_applicable_rules(TriggerType.LEAD_SCORE_HIGH, score=75)
+
+        engine.update_rule("rule_high_score", conditions={"score_threshold": 70})
+
+        assert engine._score_thresholds == [70]
+        assert _rule_ids(engine.get_applicable_rules(TriggerType.LEAD_SCORE_HIGH, score=75)) == [
+            "rule_high_score"
+        ]
+        assert engine.get_actions_for_event(TriggerType.LEAD_SCORE_HIGH, "VIP", 69) == ()
+
+    def test_trigger_and_enabled_change(self):
+        """Test a rule can be moved to another trigger and disabled."""
+        engine = AutomationRuleEngine()
+
+        engine.update_rule("rule_high_score", trigger=TriggerType.PAGE_VISIT)
+        assert engine.get_applicable_rules(TriggerType.LEAD_SCORE_HIGH) == ()
+        assert _rule_ids(engine.get_applicable_rules(TriggerType.PAGE_VISIT)) == [
+            "rule_high_score"
+        ]
+
+        engine.update_rule("rule_high_score", enabled=False)
+        assert engine.get_applicable_rules(TriggerType.PAGE_VISIT) == ()
+        assert engine.stats.enabled == 5
+
+    def test_serialization_follows_update(self):
+        """Test the cached JSON is refreshed after an update."""
+        engine = AutomationRuleEngine()
+        rule = engine.rules[0]
+        rule.to_json()
+
+        engine.update_rule(rule.rule_id, description="Updated")
+
+        assert b"Updated" in rule.to_json()
+
+    def test_unknown_rule_and_field(self):
+        """Test unknown rules are reported, rule_id cannot change."""
+        engine = AutomationRuleEngine()
+
+        assert engine.update_rule("missing", priority=1) is False
+        with pytest.raises(ValueError):
+            engine.update_rule("rule_purchase", rule_id="renamed")
+
+
+class TestScoreCalculator:
+    """Test lead score calculation."""
+
+    def test_batch_matches_single_scores(self):
+        """Test the batch scorer agrees with calculate_score on a grid of leads."""
+        calculator = ScoreCalculator()
+        grid = list(product(
+            [0.0, 0.5, 1.9, 2.5, 4.0],   # rfm_score
+            [0, 1, 9, 10, 50],           # engagement_events
+            [0, 1, 4, 5, 20],            # purchases
+            [0, 30, 31, 90, 91, 180, 181, 400],  # days_since_purchase
+        ))
+
+        batch = calculator.calculate_scores_batch(*zip(*grid))
+
+        assert batch == [calculator.calculate_score(*lead) for lead in grid]
+
+    def test_score_is_capped(self):
+        """Test scores stay within 0-100."""
+        calculator = ScoreCalculator()
+        calculator.base_score = -100
+
+        assert calculator.calculate_score(0.0, days_since_purchase=400) == 0
+        assert ScoreCalculator().calculate_score(4.0, 50, 20) == 100
@@ -0,0 +1,123 @@
+"""Tests for the async Brevo batch sender."""
+
+import asyncio
+import json
+
+import httpx
+
+from etl.brevo_async import send_recommendations_email_batch
+from etl.brevo_integration import BrevoClient
+
+
+def _handler(request):
+    """Fake Brevo /smtp/email endpoint keyed on the recipient address."""
+    email = json.loads(request.content)["to"][0]["email"]
+    if email.startswith("bad"):
+        return httpx.Response(400)
+    if email.startswith("garbled"):
+        return httpx.Response(200, content=b"<html>not json</html>")
+    return httpx.Response(201, json={"messageId": f"msg-{email}"})
+
+
+def _recommendation(email, scenario="winback"):
+    return {
+        'client_code': email.split('@')[0].upper(),
+        'email': email,
+        'client_name': 'Jean Dupont',
+        'scenario': scenario,
+        'products': [],
+    }
+
+
+def _send(recommendations, brevo):
+    return asyncio.run(send_recommendations_email_batch(
+        recommendations,
+        brevo=brevo,
+        transport=httpx.MockTransport(_handler),
+    ))
+
+
+class TestSendRecommendationsEmailBatch:
+    """Test per-recipient results of the batch sender."""
+
+    def test_results_per_recipient(self):
+        """Test every email gets its own result, in input order."""
+        brevo = BrevoClient(api_key="test-key")
+        recommendations = [
+            _recommendation("ok@example.com"),
+            _recommendation("bad@example.com"),
+            _recommendation("garbled@example.com"),
+            _recommendation("unknown@example.com", scenario="nope"),
+        ]
+
+        ok, bad, garbled, unknown = _send(recommendations, brevo)
+
+        assert ok['success'] is True
+        assert ok['status'] == 'sent'
+        assert ok['message_id'] == 'msg-ok@example.com'
+
+        assert bad['success'] is False
+        assert bad['status'] == 'error'
+        assert bad['error'] == 400
+
+        # A 200 with a body that is not JSON must not sink the whole batch
+        assert garbled['success'] is False
+        assert garbled['status'] == 'exception'
+
+        assert unknown == {'success': False, 'error': 'Unknown scenario: nope'}
+
+    def test_logs_contacts_like_sync_sender(self):
+        """Test each sent email is logged on the client, unknown scenarios are not."""
+        brevo = BrevoClient(api_key="test-key")
+        recommendations = [
+            _recommendation("ok@example.com"),
+            _recommendation("bad@example.com"),
+            _recommendation("unknown@example.com", scenario="nope"),
+        ]
+
+        _send(recommendations, brevo)
+
+        logged = [(e['client_code'], e['status'], e['message_id']) for e in brevo.contact_log]
+        assert logged == [
+            ('OK', 'sent', 'msg-ok@example.com'),
+            ('BAD', 'error', None),
+        ]
+
+
+class TestSendRecommendationsEmail:
+    """Test the single-email sender."""
+
+    def test_closes_its_own_client(self, monkeypatch):
+        """Test a client created for one call is closed after it."""
+        from etl import brevo_integration
+
+        closed = []
+        monkeypatch.delenv('BREVO_API_KEY', raising=False)  # Demo mode, no network
+        monkeypatch.setattr(
+            brevo_integration.BrevoClient, 'close', lambda self: closed.append(self)
+        )
+
+        result = brevo_integration.send_recommendations_email(
+            'OK', 'ok@example.com', 'Jean Dupont', 'winback', []
+        )
+
+        assert 'status' in result
+        assert len(closed) == 1
+
+    def test_keeps_a_passed_client_open(self, monkeypatch):
+        """Test a caller's client is reused and left open."""
+        from etl import brevo_integration
+
+        closed = []
+        monkeypatch.setattr(
+            brevo_integration.BrevoClient, 'close', lambda self: closed.append(self)
+        )
+        monkeypatch.delenv('BREVO_API_KEY', raising=False)  # Demo mode, no network
+        brevo = BrevoClient()
+
+        brevo_integration.send_recommendations_email(
+            'OK', 'ok@example.com', 'Jean Dupont', 'winback', [], brevo=brevo
+        )
+
+        assert closed == []
+        assert [e['client_code'] for e in brevo.contact_log] == ['OK']
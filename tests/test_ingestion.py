@@ -14,7 +14,7 @@ from core.ingestion.readers import (
     SalesLineReader, ContactReader
 )
 from core.ingestion.validators import (
-    CustomerValidator, SalesLineValidator, ContactValidator
+    CustomerValidator, SalesLineValidator, ContactValidator, collect_results
 )
 
 
@@ -236,6 +236,16 @@ class TestCustomerValidator:
         assert len(errors) == 1  # Second one is duplicate
         assert errors[0].error_code == 'DUPLICATE_CUSTOMER'
 
+    def test_iter_validate_with_error_cap(self):
+        """Test streaming validation keeps a bounded error list."""
+        rows = ({'customer_code': 'CUST001'} for _ in range(5))
+        valid, errors, error_count = collect_results(
+            CustomerValidator.iter_validate(rows), max_errors=2
+        )
+        assert len(valid) == 1
+        assert len(errors) == 2
+        assert error_count == 4
+
 
 class TestSalesLineValidator:
     """Test sales line batch validation."""
@@ -260,6 +270,87 @@ class TestSalesLineValidator:
         assert len(errors) == 0
 
 
+class TestIngestionService:
+    """Test streamed validation and loading in IngestionService."""
+
+    @pytest.fixture
+    def loaded(self, monkeypatch):
+        """Patch the raw loaders and record what they receive."""
+        from core.ingestion import service
+
+        calls = {'chunks': [], 'errors': [], 'metadata': []}
+
+        def load_rows(db, rows, batch_id):
+            calls['chunks'].append([row['campaign_id'] for row in rows])
+            return len(rows), []
+
+        monkeypatch.setattr(service, 'LOAD_CHUNK_SIZE', 2)
+        monkeypatch.setattr(service, 'MAX_REPORTED_ERRORS', 2)
+        monkeypatch.setattr(service.RawDataLoader, 'load_raw_contacts', load_rows)
+        monkeypatch.setattr(
+            service.IngestionErrorLoader, 'load_errors',
+            lambda db, errors, batch_id: calls['errors'].extend(errors),
+        )
+        monkeypatch.setattr(
+            service.IngestionReportLoader, 'load_batch_metadata',
+            lambda db, *args: calls['metadata'].append(args[1:]),
+        )
+        return calls
+
+    def test_contacts_streamed_in_chunks(self, tmp_path, loaded):
+        """Test valid rows load in chunks and the error list is capped."""
+        from core.ingestion.service import IngestionService
+
+        path = tmp_path / 'contacts.csv'
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['customer_code', 'contact_date', 'campaign_id'])
+            writer.writeheader()
+            for customer_code, contact_date, campaign_id in [
+                ('CUST001', '2024-01-15', 'K1'),
+                ('CUST404', '2024-01-15', 'K2'),  # Unknown customer
+                ('CUST001', '2024-01-15', 'K3'),
+                ('CUST001', '', 'K4'),  # Missing date
+                ('CUST001', '2024-01-15', 'K5'),
+                ('CUST404', '2024-01-15', 'K6'),  # Unknown customer
+            ]:
+                writer.writerow({
+                    'customer_code': customer_code,
+                    'contact_date': contact_date,
+                    'campaign_id': campaign_id,
+                })
+
+        report, success = IngestionService(db=None).ingest_contacts(
+            path, valid_customers=[{'customer_code': 'CUST001'}]
+        )
+
+        assert success is False
+        assert loaded['chunks'] == [['K1', 'K3'], ['K5']]
+        assert (report.total_rows, report.valid_rows, report.error_rows) == (6, 3, 3)
+        assert loaded['metadata'] == [('contacts', 6, 3, 3)]
+        # Only MAX_REPORTED_ERRORS kept, with the CSV row of each error
+        assert [(e.row_number, e.error_code) for e in report.errors] == [
+            (3, 'CUSTOMER_NOT_FOUND'), (5, 'VALIDATION_ERROR'),
+        ]
+        assert len(loaded['errors']) == 2
+
+    def test_product_check_reports_csv_row(self):
+        """Test unmapped sales lines become errors numbered by CSV row."""
+        from core.ingestion.service import _check_products
+
+        error = IngestionError.model_construct(row_number=3, error_code='VALIDATION_ERROR')
+        results = [
+            ({'product_label_norm': 'pinot noir 2022'}, None),
+            (None, error),
+            ({'product_label_norm': 'mystery wine'}, None),
+        ]
+
+        checked = list(_check_products(results, {'pinot noir 2022': 'PINOT_NOIR_2022'}))
+
+        assert checked[:2] == results[:2]
+        assert checked[2][0] is None
+        assert (checked[2][1].row_number, checked[2][1].error_code) == (4, 'PRODUCT_NOT_FOUND')
+
+
 class TestIngestionReport:
     """Test ingestion report."""
     
@@ -0,0 +1,196 @@
+"""Tests for outcomes service."""
+
+from dataclasses import asdict
+
+from core.outcomes.models import (
+    OutcomeStatus, FeedbackType, OutcomeRecord, FeedbackRecord,
+)
+from core.outcomes.service import BULK_BATCH_SIZE, OutcomesService
+
+
+def _outcome(product_key, status, purchased=False, amount=None):
+    return OutcomeRecord(
+        audit_id=f"audit-{product_key}",
+        customer_code="C001",
+        product_key=product_key,
+        recommendation_score=0.8,
+        status=status,
+        purchased=purchased,
+        purchase_amount=amount,
+    )
+
+
+OUTCOMES = [
+    _outcome("WINE001", OutcomeStatus.PURCHASED, purchased=True, amount=40.0),
+    _outcome("WINE002", OutcomeStatus.REJECTED),
+    _outcome("WINE003", OutcomeStatus.RETURNED, purchased=True, amount=25.0),
+    _outcome("WINE004", OutcomeStatus.ACCEPTED),
+]
+
+FEEDBACK = [
+    FeedbackRecord("C001", "WINE001", FeedbackType.SATISFACTION, 5),
+    FeedbackRecord("C001", "WINE001", FeedbackType.QUALITY, 4),
+    FeedbackRecord("C001", "WINE003", FeedbackType.SATISFACTION, 2),
+]
+
+
+class RowBackend:
+    """Backend returning raw outcome/feedback rows."""
+
+    def get_outcomes(self, since, customer_code=None):
+        return list(OUTCOMES)
+
+    def get_feedback(self, since):
+        return list(FEEDBACK)
+
+
+class AggregatingBackend(RowBackend):
+    """Backend returning the aggregates its SQL would compute."""
+
+    def aggregate_outcomes(self, since, customer_code=None):
+        return (
+            len(OUTCOMES),
+            sum(1 for o in OUTCOMES if o.status != OutcomeStatus.REJECTED),
+            sum(1 for o in OUTCOMES if o.purchased),
+            sum(1 for o in OUTCOMES if o.status == OutcomeStatus.RETURNED),
+            sum(o.purchase_amount for o in OUTCOMES if o.purchased),
+        )
+
+    def aggregate_feedback(self, since):
+        return (
+            sum(f.score for f in FEEDBACK) / len(FEEDBACK),
+            len({f.product_key for f in FEEDBACK}),
+        )
+
+
+class OutcomesOnlyBackend(RowBackend):
+    """Backend with only half of the aggregate API."""
+
+    def aggregate_outcomes(self, since, customer_code=None):
+        raise AssertionError("partial aggregate backends must use the row path")
+
+
+def _metrics(backend):
+    """Computed metrics as a dict, without the computation timestamp."""
+    metrics = asdict(OutcomesService(backend).compute_outcome_metrics())
+    metrics.pop('created_at', None)
+    return metrics
+
+
+class TestComputeOutcomeMetrics:
+    """Test outcome metrics computation."""
+
+    def test_sql_aggregates_match_row_scan(self):
+        """Test the database-aggregate path gives the same metrics as scanning rows."""
+        from_rows = _metrics(RowBackend())
+
+        assert _metrics(AggregatingBackend()) == from_rows
+        assert from_rows['total_outcomes'] == 4
+        assert from_rows['revenue_impact'] == 65.0
+        assert from_rows['recommendations_with_feedback'] == 2
+
+    def test_partial_aggregate_backend_uses_row_scan(self):
+        """Test a backend with only aggregate_outcomes falls back to rows."""
+        assert _metrics(OutcomesOnlyBackend()) == _metrics(RowBackend())
+
+
+class SingleSaveBackend:
+    """Backend with only the per-record save methods."""
+
+    def __init__(self):
+        self.saved = []
+
+    def save_outcome(self, outcome):
+        self.saved.append(outcome)
+
+    def save_feedback(self, feedback):
+        self.saved.append(feedback)
+
+    def save_performance_metric(self, metric):
+        self.saved.append(metric)
+
+
+class BulkSaveBackend(SingleSaveBackend):
+    """Backend with the bulk save methods; records batch sizes."""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def _save_bulk(self, items):
+        self.batches.append(len(items))
+        self.saved.extend(items)
+
+    save_outcomes_bulk = _save_bulk
+    save_feedback_bulk = _save_bulk
+    save_performance_metrics_bulk = _save_bulk
+
+
+def _outcome_kwargs(n):
+    return [
+        {
+            'audit_id': f"audit-{i}",
+            'customer_code': "C001",
+            'product_key': f"WINE{i:04d}",
+            'recommendation_score': 0.5,
+            'status': OutcomeStatus.PURCHASED,
+            'purchased': True,
+            'purchase_amount': 10.0,
+        }
+        for i in range(n)
+    ]
+
+
+class TestBulkRecording:
+    """Test bulk recording paths."""
+
+    def test_bulk_outcomes_chunked(self):
+        """Test outcomes are saved through the bulk API in BULK_BATCH_SIZE chunks."""
+        backend = BulkSaveBackend()
+        records = _outcome_kwargs(2 * BULK_BATCH_SIZE + 5)
+
+        outcomes = OutcomesService(backend).bulk_record_outcomes(records)
+
+        assert backend.batches == [BULK_BATCH_SIZE, BULK_BATCH_SIZE, 5]
+        assert backend.saved == outcomes
+        assert [o.product_key for o in outcomes] == [r['product_key'] for r in records]
+        assert all(o.purchase_date is not None for o in outcomes)
+
+    def test_bulk_outcomes_fall_back_to_single_saves(self):
+        """Test a backend without the bulk API gets one save per record."""
+        backend = SingleSaveBackend()
+
+        outcomes = OutcomesService(backend).bulk_record_outcomes(_outcome_kwargs(3))
+
+        assert backend.saved == outcomes
+        assert len(outcomes) == 3
+
+    def test_bulk_feedback_matches_single_records(self):
+        """Test bulk feedback builds the same records as record_feedback."""
+        records = [
+            {'customer_code': "C001", 'product_key': "WINE001",
+             'feedback_type': FeedbackType.SATISFACTION, 'score': score}
+            for score in range(1, 6)
+        ]
+        backend = BulkSaveBackend()
+
+        bulk = OutcomesService(backend).bulk_record_feedback(records)
+        single = [OutcomesService().record_feedback(**record) for record in records]
+
+        assert backend.batches == [5]
+        assert [f.sentiment for f in bulk] == [f.sentiment for f in single]
+
+    def test_bulk_performance_fall_back_to_single_saves(self):
+        """Test performance metrics fall back to save_performance_metric."""
+        backend = SingleSaveBackend()
+        records = [
+            {'recommendation_id': "r1", 'actual_outcome': OutcomeStatus.PURCHASED,
+             'predicted_score': 0.9, 'confidence': 0.8},
+            {'recommendation_id': "r2", 'actual_outcome': OutcomeStatus.REJECTED,
+             'predicted_score': 0.9, 'confidence': 0.8},
+        ]
+
+        metrics = OutcomesService(backend).bulk_track_model_performance(records)
+
+        assert backend.saved == metrics
+        assert [m.is_accurate for m in metrics] == [True, False]
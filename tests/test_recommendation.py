@@ -1,5 +1,6 @@
 """Tests for recommendation engine module."""
 
+import json
 import pytest
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine, text
@@ -8,9 +9,14 @@ from sqlalchemy.orm import Session
 from core.recommendation import (
     FeatureComputer,
     ScenarioMatcher,
+    RecoScenario,
     RecommendationScorer,
     ExplanationGenerator,
+    Explanation,
     RecommendationEngine,
+    RecommendationResult,
+    RecommendationItem,
+    RecoScore,
 )
 
 
@@ -65,6 +71,19 @@ def test_db():
             )
         """))
         
+        # Daily customer features snapshot
+        conn.execute(text("""
+            CREATE TABLE customer_features_daily (
+                customer_code TEXT PRIMARY KEY,
+                purchase_count INTEGER,
+                total_spent REAL,
+                avg_order_value REAL,
+                last_purchase_date DATE,
+                first_purchase_date DATE,
+                computed_date DATE
+            )
+        """))
+        
         # Recommendation item table
         conn.execute(text("""
             CREATE TABLE reco_item (
@@ -141,6 +160,45 @@ class TestFeatureComputer:
         assert features['frequency_score'] == 4  # 3 purchases
         assert features['monetary_score'] == 3  # 450 spent
     
+    def test_compute_customer_features_batch_empty(self, test_db):
+        """Test batch features match single-customer features without purchases."""
+        computer = FeatureComputer(test_db)
+        batch = computer.compute_customer_features_batch(['C001', 'C002'])
+        single = computer.compute_customer_features('C001')
+        
+        assert set(batch) == {'C001', 'C002'}
+        for key in ('purchase_count', 'total_spent', 'recency_score',
+                    'frequency_score', 'monetary_score'):
+            assert batch['C001'][key] == single[key]
+        assert computer.get_silence_window_batch(['C001', 'C002']) == set()
+    
+    def test_compute_customer_features_from_snapshot(self, test_db):
+        """Test features are read from the daily snapshot after a refresh."""
+        test_db.execute(text("""
+            INSERT INTO customer (customer_code) VALUES ('C001'), ('C002')
+        """))
+        test_db.commit()
+        
+        computer = FeatureComputer(test_db, use_daily_snapshot=True)
+        assert computer.refresh_daily_snapshot() == 2
+        
+        # Snapshot rows are trusted over live order_line aggregates
+        test_db.execute(text("""
+            UPDATE customer_features_daily
+            SET purchase_count = 3, total_spent = 450.0
+            WHERE customer_code = 'C001'
+        """))
+        test_db.commit()
+        
+        features = computer.compute_customer_features('C001')
+        assert features['purchase_count'] == 3
+        assert features['monetary_score'] == 2
+        
+        batch = computer.compute_customer_features_batch(['C001', 'C002', 'C003'])
+        assert batch['C001']['purchase_count'] == 3
+        assert batch['C002']['purchase_count'] == 0
+        assert batch['C003']['purchase_count'] == 0
+    
     def test_get_budget_level(self, test_db):
         """Test budget level determination."""
         test_db.execute(text("""
@@ -211,6 +269,149 @@ class TestScenarioMatcher:
         
         assert scenarios is not None
         assert len(scenarios) > 0
+    
+    def test_match_scenarios_batch(self, test_db):
+        """Test batch matching over several customers."""
+        test_db.execute(text("""
+            INSERT INTO product (product_key, product_name, family, popularity_score, is_premium)
+            VALUES 
+                ('WINE001', 'Pinot', 'Red', 0.8, 0),
+                ('WINE002', 'Chardonnay', 'White', 0.7, 0),
+                ('WINE003', 'Premium', 'Premium', 0.9, 1)
+        """))
+        test_db.execute(text("""
+            INSERT INTO order_line (customer_code, product_key, amount_ht, order_date)
+            VALUES 
+                ('C001', 'WINE001', 600.0, date('now', '-120 days')),
+                ('C001', 'WINE001', 600.0, date('now', '-240 days')),
+                ('C002', 'WINE002', 50.0, date('now', '-400 days'))
+        """))
+        test_db.commit()
+        
+        matcher = ScenarioMatcher(test_db)
+        matches = matcher.match_scenarios_batch(['C001', 'C002', 'C003'])
+        
+        assert matches['C001'][RecoScenario.REBUY] == ['WINE001']
+        assert matches['C001'][RecoScenario.UPSELL] == ['WINE003']
+        assert 'WINE001' not in matches['C001'][RecoScenario.CROSS_SELL]
+        assert RecoScenario.WINBACK not in matches['C001']
+        assert matches['C002'][RecoScenario.WINBACK] == ['WINE003', 'WINE001', 'WINE002']
+        assert len(matches['C002'][RecoScenario.NURTURE]) == 3
+        assert matches['C003'] == {}
+
+    def test_match_scenarios_batch_falls_back_per_customer(self, test_db, monkeypatch):
+        """Test a failing batch query falls back to per-customer matching."""
+        from core.recommendation import scenario_matcher
+
+        test_db.execute(text("""
+            INSERT INTO product (product_key, product_name, family, popularity_score, is_premium)
+            VALUES
+                ('WINE001', 'Pinot', 'Red', 0.8, 0),
+                ('WINE003', 'Premium', 'Premium', 0.9, 1)
+        """))
+        test_db.execute(text("""
+            INSERT INTO order_line (customer_code, product_key, amount_ht, order_date)
+            VALUES ('C001', 'WINE001', 600.0, date('now', '-120 days'))
+        """))
+        test_db.commit()
+        monkeypatch.setattr(scenario_matcher, '_BATCH_REBUY', text("SELECT * FROM missing_table"))
+
+        matches = ScenarioMatcher(test_db).match_scenarios_batch(['C001'])
+
+        assert matches['C001'][RecoScenario.REBUY] == ['WINE001']
+        assert matches['C001'][RecoScenario.UPSELL] == ['WINE003']
+
+    def test_match_cross_sell_top_families(self, test_db):
+        """Test CROSS_SELL excludes the customer's most purchased families."""
+        test_db.execute(text("""
+            INSERT INTO product (product_key, product_name, family, popularity_score, is_premium)
+            VALUES
+                ('WINE001', 'Pinot', 'Red', 0.8, 0),
+                ('WINE002', 'Chardonnay', 'White', 0.7, 0),
+                ('WINE003', 'Provence', 'Rose', 0.6, 0)
+        """))
+        test_db.execute(text("""
+            INSERT INTO order_line (customer_code, product_key, amount_ht, order_date)
+            VALUES
+                ('C001', 'WINE001', 20.0, date('now', '-10 days')),
+                ('C001', 'WINE001', 20.0, date('now', '-20 days')),
+                ('C001', 'WINE002', 20.0, date('now', '-30 days')),
+                ('C001', 'WINE003', 20.0, date('now', '-40 days'))
+        """))
+        test_db.commit()
+
+        # Red is bought most; Rose wins the White/Rose tie by name
+        matcher = ScenarioMatcher(test_db)
+        assert matcher.match_cross_sell('C001') == ['WINE002']
+        assert matcher.match_scenarios_batch(['C001'])['C001'][RecoScenario.CROSS_SELL] == ['WINE002']
+
+    def test_match_upsell_from_snapshot(self, test_db):
+        """Test UPSELL reads spend from the daily snapshot when enabled."""
+        test_db.execute(text("""
+            INSERT INTO product (product_key, product_name, family, popularity_score, is_premium)
+            VALUES ('WINE003', 'Premium', 'Premium', 0.9, 1)
+        """))
+        test_db.execute(text("""
+            INSERT INTO order_line (customer_code, product_key, amount_ht, order_date)
+            VALUES ('C001', 'WINE003', 50.0, date('now', '-10 days'))
+        """))
+        test_db.execute(text("""
+            INSERT INTO customer_features_daily
+            (customer_code, purchase_count, total_spent, last_purchase_date, computed_date)
+            VALUES ('C001', 1, 900.0, date('now', '-10 days'), CURRENT_DATE)
+        """))
+        test_db.commit()
+
+        assert ScenarioMatcher(test_db).match_upsell('C001') is None
+
+        matcher = ScenarioMatcher(test_db, use_daily_snapshot=True)
+        assert matcher.match_upsell('C001') == ['WINE003']
+        assert matcher.match_scenarios_batch(['C001'])['C001'][RecoScenario.UPSELL] == ['WINE003']
+
+    def test_snapshot_customer_stats_single_row(self, test_db):
+        """Test the fused query's snapshot stats CTE yields at most one row."""
+        from core.recommendation.scenario_matcher import _SNAPSHOT_CUSTOMER_STATS
+
+        test_db.execute(text("""
+            INSERT INTO order_line (customer_code, product_key, amount_ht, order_date)
+            VALUES
+                ('C001', 'WINE001', 50.0, date('now', '-10 days')),
+                ('C002', 'WINE001', 30.0, date('now', '-10 days')),
+                ('C002', 'WINE001', 20.0, date('now', '-20 days'))
+        """))
+        test_db.execute(text("""
+            INSERT INTO customer_features_daily
+            (customer_code, purchase_count, total_spent, last_purchase_date, computed_date)
+            VALUES ('C001', 1, 900.0, date('now', '-10 days'), CURRENT_DATE)
+        """))
+        test_db.commit()
+
+        customer_stats = text(
+            "WITH customer_stats AS (" + _SNAPSHOT_CUSTOMER_STATS + ") "
+            "SELECT order_count, total_spent FROM customer_stats"
+        )
+
+        def stats(customer_code):
+            return test_db.execute(customer_stats, {'customer_code': customer_code}).fetchall()
+
+        assert stats('C001') == [(1, 900.0)]  # Snapshot row only
+        assert stats('C002') == [(2, 50.0)]  # No snapshot: order_line aggregate
+        assert stats('C003') == []  # Neither
+
+    def test_fused_statements_share_scenario_filters(self):
+        """Test live and snapshot statements differ only in customer_stats."""
+        from core.recommendation.scenario_matcher import (
+            _LIVE_CUSTOMER_STATS, _MATCH_SCENARIOS, _MATCH_SCENARIOS_SNAPSHOT,
+            _MATCH_SCENARIOS_TAIL, _SNAPSHOT_CUSTOMER_STATS,
+        )
+
+        for statement, stats in (
+            (_MATCH_SCENARIOS, _LIVE_CUSTOMER_STATS),
+            (_MATCH_SCENARIOS_SNAPSHOT, _SNAPSHOT_CUSTOMER_STATS),
+        ):
+            assert statement.text == (
+                "WITH customer_stats AS (" + stats + "), " + _MATCH_SCENARIOS_TAIL
+            )
 
 
 class TestRecommendationScorer:
@@ -272,6 +473,33 @@ class TestRecommendationScorer:
         assert score.final_score <= 100
         assert score.scenario == 'REBUY'
 
+    def test_score_recommendations_batch(self, test_db):
+        """Test batch scoring keeps input order and component scores."""
+        test_db.execute(text("""
+            INSERT INTO product (product_key, family, popularity_score)
+            VALUES ('WINE001', 'Red', 0.8), ('WINE002', 'White', NULL)
+        """))
+        test_db.execute(text("""
+            INSERT INTO order_line (customer_code, product_key, amount_ht, order_date)
+            VALUES ('C001', 'WINE001', 100.0, date('now'))
+        """))
+        test_db.commit()
+
+        scorer = RecommendationScorer(test_db)
+        scores = scorer.score_recommendations_batch('C001', [
+            ('WINE002', 'CROSS_SELL', 75.0),
+            ('WINE001', 'REBUY', 85.0),
+            ('MISSING', 'NEXT_STEP', 65.0),
+        ])
+
+        assert [s.product_key for s in scores] == ['WINE002', 'WINE001', 'MISSING']
+        assert scores[0].affinity_score == 60.0
+        assert scores[0].popularity_score == 50.0
+        assert scores[1].affinity_score == 75.0
+        assert scores[1].popularity_score == 80.0
+        assert scores[2].affinity_score == 50.0
+        assert scorer.score_recommendations_batch('C001', []) == []
+
 
 class TestExplanationGenerator:
     """Test ExplanationGenerator."""
@@ -352,3 +580,34 @@ class TestRecommendationEngine:
         assert success or not success  # May or may not find matches
         assert result.customer_code == 'C001'
         assert result.run_id is not None
+    
+    def test_save_recommendations(self, test_db):
+        """Test recommendations are persisted with product names."""
+        test_db.execute(text("""
+            INSERT INTO product (product_key, product_name, family)
+            VALUES ('WINE001', 'Pinot', 'Red')
+        """))
+        test_db.commit()
+        
+        result = RecommendationResult('C001', 'run-1')
+        for rank, product_key in enumerate(['WINE001', 'WINE404'], start=1):
+            score = RecoScore(product_key, 'REBUY', 85.0, 50.0, 50.0, 50.0, 55.0)
+            result.add_recommendation(RecommendationItem(
+                rank=rank,
+                product_key=product_key,
+                scenario='REBUY',
+                score=score,
+                explanation=Explanation('Again', 'Because', []),
+            ))
+        
+        engine = RecommendationEngine(test_db)
+        engine._save_recommendations(result)
+        
+        rows = test_db.execute(text("""
+            SELECT product_key, product_name FROM reco_item ORDER BY rank
+        """)).fetchall()
+        assert [tuple(r) for r in rows] == [('WINE001', 'Pinot'), ('WINE404', 'WINE404')]
+        
+        payload = json.loads(result.to_bytes())
+        assert payload['run_id'] == str(result.run_id)
+        assert payload['recommendations'][0]['explanation']['reason'] == 'Because'
@@ -1,5 +1,8 @@
 """Tests for transform module."""
 
+from contextlib import nullcontext
+from types import SimpleNamespace
+
 import pytest
 from core.transform.product_resolver import ProductResolver
 from core.transform.customer_deduplicator import CustomerDeduplicator
@@ -25,6 +28,49 @@ class TestProductResolver:
         assert error is not None
         assert 'not found' in error.lower()
 
+    def test_fast_resolver_matches_resolve(self):
+        """Test the specialized resolver returns what resolve() returns."""
+        resolver = ProductResolver(db=None)  # Mock for test
+        resolver._cache = {'pinot noir 2022': 'PINOT_NOIR_2022'}
+        resolver._loaded = True
+
+        resolve_fast = resolver.fast_resolver()
+        for label in ('pinot noir 2022', 'unknown label'):
+            assert resolve_fast(label) == resolver.resolve(label)
+
+    def test_load_aliases_shared_until_table_changes(self):
+        """Test aliases are loaded once per process until product_alias changes."""
+        from sqlalchemy import create_engine, text
+        from sqlalchemy.orm import Session
+
+        session = Session(create_engine("sqlite:///:memory:"))
+        session.execute(text("""
+            CREATE TABLE product_alias (
+                label_norm TEXT, product_key TEXT, created_at TEXT, is_active INTEGER
+            )
+        """))
+        session.execute(text("""
+            INSERT INTO product_alias VALUES ('pinot noir 2022', 'PINOT_NOIR_2022', '2024-01-01', 1)
+        """))
+        session.commit()
+        ProductResolver.clear_shared_cache()
+
+        try:
+            first = ProductResolver(session).load_aliases()
+            assert ProductResolver(session).load_aliases() is first
+
+            session.execute(text("""
+                INSERT INTO product_alias VALUES ('chablis 2021', 'CHABLIS_2021', '2024-01-02', 1)
+            """))
+            session.commit()
+
+            reloaded = ProductResolver(session).load_aliases()
+            assert reloaded is not first
+            assert reloaded['chablis 2021'] == 'CHABLIS_2021'
+        finally:
+            ProductResolver.clear_shared_cache()
+            session.close()
+
 
 class TestCustomerDeduplicator:
     """Test customer deduplication."""
@@ -113,6 +159,20 @@ class TestCustomerDeduplicator:
         assert '+33612345678' in groups
         assert len(groups['+33612345678']) == 2
 
+    def test_group_duplicates_transitive(self):
+        """Test email and phone matches are chained into one group."""
+        rows = [
+            {'customer_code': 'C001', 'email': 'john@example.com', 'phone': None},
+            {'customer_code': 'C002', 'email': 'jane@example.com', 'phone': None},
+            {'customer_code': 'C003', 'email': 'john@example.com', 'phone': '+33612345678'},
+            {'customer_code': 'C004', 'email': None, 'phone': '+33612345678'},
+            {'customer_code': 'C005', 'email': None, 'phone': None},
+        ]
+        groups = CustomerDeduplicator.group_duplicates(rows)
+
+        codes = [[r['customer_code'] for r in group] for group in groups]
+        assert codes == [['C001', 'C003', 'C004'], ['C002'], ['C005']]
+
 
 class TestCustomerDeduplicatorIntegration:
     """Integration tests for deduplicator (require DB)."""
@@ -158,3 +218,100 @@ class TestTransformPipelineStatus:
         
         status = TransformPipelineStatus()
         assert status.duration() is None
+
+
+class _FakeSession:
+    """Session stand-in recording executemany chunk sizes."""
+
+    def __init__(self, dialect):
+        self._bind = SimpleNamespace(dialect=SimpleNamespace(name=dialect))
+        self.executed = []
+
+    def get_bind(self):
+        return self._bind
+
+    def begin_nested(self):
+        return nullcontext()
+
+    def execute(self, stmt, rows):
+        self.executed.append(len(rows))
+
+    def commit(self):
+        pass
+
+
+class _FakeResolver:
+    """ProductResolver stand-in resolving every label."""
+
+    def fast_resolver(self):
+        return lambda label: ('WINE001', None)
+
+
+class TestTransformLoaderFlush:
+    """Test streamed loaders flush at a size that reaches COPY on PostgreSQL."""
+
+    @pytest.fixture(autouse=True)
+    def small_sizes(self, monkeypatch):
+        from core.transform import transform_loaders
+
+        monkeypatch.setattr(transform_loaders, 'INSERT_CHUNK_SIZE', 2)
+        monkeypatch.setattr(transform_loaders, 'COPY_MIN_ROWS', 5)
+
+    @staticmethod
+    def _loader(dialect, monkeypatch):
+        from core.transform.transform_loaders import TransformLoader
+
+        loader = TransformLoader(_FakeSession(dialect))
+        loader.copied = []
+
+        def copy_rows(table, rows):
+            loader.copied.append((table.name, len(rows)))
+            return len(rows)
+
+        monkeypatch.setattr(loader, '_copy_rows', copy_rows)
+        return loader
+
+    @staticmethod
+    def _contacts(n):
+        return (
+            {'customer_code': f'C{i:03d}', 'contact_date': '2024-01-15', 'channel': 'email'}
+            for i in range(n)
+        )
+
+    @staticmethod
+    def _order_lines(n):
+        return (
+            {
+                'customer_code': f'C{i:03d}', 'order_date': '2024-01-15',
+                'doc_ref': f'D{i}', 'qty': 1, 'amount_ht': 10.0,
+                'product_label_norm': 'pinot noir 2022',
+            }
+            for i in range(n)
+        )
+
+    def test_contact_events_use_copy_on_postgresql(self, monkeypatch):
+        """Test a large streamed contact load goes through COPY."""
+        loader = self._loader('postgresql', monkeypatch)
+
+        assert loader.load_contact_events(self._contacts(12)) == 12
+        # Two full COPY buffers, the 2-row tail by executemany
+        assert loader.copied == [('contact_event', 5), ('contact_event', 5)]
+        assert loader.db.executed == [2]
+
+    def test_order_lines_use_copy_on_postgresql(self, monkeypatch):
+        """Test a large streamed order line load goes through COPY."""
+        loader = self._loader('postgresql', monkeypatch)
+
+        loaded = loader.load_order_lines(self._order_lines(11), _FakeResolver())
+
+        assert loaded == 11
+        assert loader.copied == [('order_line', 5), ('order_line', 5)]
+        assert loader.db.executed == [1]
+
+    def test_other_dialects_flush_insert_chunks(self, monkeypatch):
+        """Test non-PostgreSQL loads keep executemany chunks, without COPY."""
+        loader = self._loader('sqlite', monkeypatch)
+
+        assert loader.load_contact_events(self._contacts(5)) == 5
+        assert loader.copied == []
+        assert loader.db.executed == [2, 2, 1]